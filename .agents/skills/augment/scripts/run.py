@@ -12,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.pare
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
 
+from shared.manifest import list_frames
 from shared.utils import load_config
 
 
@@ -56,7 +57,7 @@ def main() -> int:
     aug_dir = output_dir / "augmented"
     aug_dir.mkdir(parents=True, exist_ok=True)
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     labeled = [f for f in frames if f.with_suffix(".txt").exists()]
 
     if not labeled:
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark single-process vs segmented frame extraction on a synthetic testsrc video.
+
+Usage: uv run .agents/skills/collect/scripts/bench_extract.py --duration 1800 --fps 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run import extract_frames, extract_frames_segmented
+from shared.utils import run_command
+
+
+def make_testsrc(path: Path, duration: int, size: str, rate: int) -> None:
+    run_command([
+        "ffmpeg",
+        "-y",
+        "-v",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc=duration={duration}:size={size}:rate={rate}",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-pix_fmt",
+        "yuv420p",
+        str(path),
+    ])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Segmented extraction speedup benchmark")
+    parser.add_argument("--duration", type=int, default=1800, help="Synthetic video length in seconds (default: 1800)")
+    parser.add_argument("--size", default="1280x720", help="Video size (default: 1280x720)")
+    parser.add_argument("--rate", type=int, default=30, help="Video frame rate (default: 30)")
+    parser.add_argument("--fps", type=float, default=1, help="Extraction rate (default: 1)")
+    parser.add_argument(
+        "--workers",
+        default="",
+        help="Comma-separated worker counts (default: 2, 4, ... up to the core count)",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        print("ffmpeg/ffprobe not found.", file=sys.stderr)
+        return 1
+    cores = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(v) for v in args.workers.split(",") if v.strip()]
+    else:
+        counts = [n for n in (2, 4, 8, 16, 32, 64) if n <= cores] or [2]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "testsrc.mp4"
+        print(f"Encoding {args.duration}s {args.size}@{args.rate} testsrc video...")
+        make_testsrc(video, args.duration, args.size, args.rate)
+
+        frames_dir = Path(tmp) / "frames"
+        start = time.perf_counter()
+        reference = extract_frames(video, frames_dir, fps=args.fps)
+        baseline = time.perf_counter() - start
+        expected = [frame.name for frame in reference]
+        print(f"{cores} cores, {len(expected)} frames at {args.fps} FPS")
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8} {'frames':>7}")
+        print(f"{1:>8} {baseline:>9.2f} {1.0:>7.2f}x {len(expected):>7}")
+
+        for workers in counts:
+            shutil.rmtree(frames_dir)
+            start = time.perf_counter()
+            frames, _ = extract_frames_segmented(video, frames_dir, fps=args.fps, workers=workers)
+            elapsed = time.perf_counter() - start
+            note = "" if [frame.name for frame in frames] == expected else "  (frame count differs)"
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(frames):>7}{note}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
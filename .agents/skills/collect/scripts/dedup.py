@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Optional dedup stage: mark near-duplicate frames so labeling and training skip them.
+
+Run after collect (or set `dedup: true` so collect runs it). Re-running after new
+frames were extracted only hashes the frames that are new or changed.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Ensure repo root is importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+
+from shared.dedup import dedup_from_config
+from shared.utils import PipelineError, load_config
+
+
+def main() -> int:
+    config = load_config()
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = output_dir / "frames"
+    if not frames_dir.exists():
+        print(f"Error: Frames directory not found: {frames_dir}. Run collect first.", file=sys.stderr)
+        return 1
+
+    try:
+        stats = dedup_from_config(config, frames_dir)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    print(
+        f"[dedup] {stats['frames']} frames, {stats['hashed']} newly hashed, "
+        f"{stats['duplicates']} near-duplicates excluded from labeling and training"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
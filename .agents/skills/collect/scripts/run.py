@@ -1,15 +1,38 @@
 #!/usr/bin/env python3
-"""Collect skill: download YouTube video and extract frames."""
+"""Collect skill: download YouTube video and extract frames.
+
+`sampling` in config.json picks how frames are taken from the video:
+- `fixed` (default): a constant `fps`.
+- `scene`: only when ffmpeg's scene-change score exceeds `scene_threshold`,
+  bounded by `min_fps` (a floor for static stretches) and `max_fps` (a cap for
+  fast action).
+`frame_budget` caps the frames kept per video in either mode, dropping the frames
+that differ least from their predecessor.
+`extract_workers` > 1 splits fixed-rate extraction of long videos into that many
+time ranges, each decoded by its own ffmpeg process; frames are renumbered into
+one contiguous `frame_%06d` sequence afterwards.
+`dedup: true` then marks near-duplicate frames (see scripts/dedup.py) so labeling
+and training skip them.
+"""
 
 from __future__ import annotations
 
+import json
+import re
 import shutil
+import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+from PIL import Image
+
 # Ensure repo root is importable
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
+from shared.dedup import dedup_from_config
+from shared.manifest import build_record, write_manifest
 from shared.utils import PipelineError, load_config, run_command
 
 
@@ -64,6 +87,186 @@ def extract_frames(video_path: Path, frames_dir: Path, fps: int = 1) -> list[Pat
     return frames
 
 
+def probe_duration(video_path: Path) -> float:
+    """Container duration in seconds, via ffprobe."""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", str(video_path)]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except FileNotFoundError as exc:
+        raise PipelineError("Required executable not found: ffprobe") from exc
+    except (subprocess.CalledProcessError, KeyError, ValueError) as exc:
+        raise PipelineError(f"Failed to read duration for {video_path}") from exc
+
+
+def plan_segments(duration: float, fps: float, segments: int) -> list[tuple[int, int | None]]:
+    """Split the output frame slots into `segments` contiguous (first_slot, count) ranges.
+
+    Slot k is the frame at k / fps, so every boundary falls exactly on a frame
+    time. The last range has no count and runs to the end of the video.
+    """
+    total = max(1, int(duration * fps))
+    segments = max(1, min(segments, total))
+    bounds = [round(i * total / segments) for i in range(segments + 1)]
+    ranges: list[tuple[int, int | None]] = [
+        (bounds[i], bounds[i + 1] - bounds[i]) for i in range(segments - 1)
+    ]
+    ranges.append((bounds[segments - 1], None))
+    return ranges
+
+
+def _extract_segment(
+    video_path: Path, segment_dir: Path, fps: float, first_slot: int, count: int | None
+) -> list[Path]:
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    start = first_slot / fps
+    # -ss before -i seeks on input, which is frame-accurate when decoding; -to bounds
+    # the decode and -frames:v pins the exact frame count at the seam.
+    cmd = ["ffmpeg", "-y", "-v", "error", "-ss", f"{start:.6f}"]
+    if count is not None:
+        cmd += ["-to", f"{(first_slot + count) / fps:.6f}"]
+    cmd += ["-i", str(video_path), "-vf", f"fps={fps}"]
+    if count is not None:
+        cmd += ["-frames:v", str(count)]
+    cmd.append(str(segment_dir / "frame_%06d.jpg"))
+    run_command(cmd)
+    return sorted(segment_dir.glob("*.jpg"))
+
+
+def extract_frames_segmented(
+    video_path: Path, frames_dir: Path, fps: float = 1, workers: int = 4
+) -> tuple[list[Path], list[float]]:
+    """Extract at a fixed rate with one ffmpeg process per time range, in parallel.
+
+    Returns frames numbered contiguously across segments and their source timestamps.
+    """
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    ranges = plan_segments(probe_duration(video_path), fps, workers)
+    staging = frames_dir / ".segments"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    # Threads are enough here: each one just waits on its own ffmpeg process.
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        jobs = [
+            pool.submit(_extract_segment, video_path, staging / f"seg_{i:04d}", fps, first, count)
+            for i, (first, count) in enumerate(ranges)
+        ]
+        segment_frames = [job.result() for job in jobs]
+
+    frames: list[Path] = []
+    timestamps: list[float] = []
+    for (first_slot, _), seg in zip(ranges, segment_frames):
+        for offset, frame in enumerate(seg):
+            target = frames_dir / f"frame_{len(frames) + 1:06d}.jpg"
+            frame.replace(target)
+            frames.append(target)
+            timestamps.append((first_slot + offset) / float(fps))
+    shutil.rmtree(staging, ignore_errors=True)
+    if not frames:
+        raise PipelineError("No frames extracted. Check video input and ffmpeg installation.")
+    return frames, timestamps
+
+
+SHOWINFO_PTS_RE = re.compile(r"Parsed_showinfo.*?\bpts_time:\s*([-0-9.]+)")
+DIFF_THUMB_SIZE = (64, 36)
+
+
+def scene_select_expr(scene_threshold: float, min_fps: float, max_fps: float) -> str:
+    """ffmpeg select expression: first frame, any frame after 1/min_fps without a pick,
+    or a scene change at least 1/max_fps after the previous pick."""
+    min_gap = 1.0 / max_fps
+    max_gap = 1.0 / min_fps
+    return (
+        "isnan(prev_selected_t)"
+        f"+gte(t-prev_selected_t,{max_gap:.6f})"
+        f"+gt(scene,{scene_threshold})*gte(t-prev_selected_t,{min_gap:.6f})"
+    )
+
+
+def extract_frames_scene(
+    video_path: Path,
+    frames_dir: Path,
+    scene_threshold: float = 0.3,
+    min_fps: float = 0.2,
+    max_fps: float = 4.0,
+) -> tuple[list[Path], list[float]]:
+    """Extract frames only on content change; returns frames and their source timestamps."""
+    frames_dir.mkdir(parents=True, exist_ok=True)
+    frame_pattern = frames_dir / "frame_%06d.jpg"
+    expr = scene_select_expr(scene_threshold, min_fps, max_fps)
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(video_path),
+        "-vf",
+        f"select='{expr}',showinfo",
+        "-vsync",
+        "vfr",
+        str(frame_pattern),
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    except FileNotFoundError as exc:
+        raise PipelineError("Required executable not found: ffmpeg") from exc
+    except subprocess.CalledProcessError as exc:
+        tail = "\n".join((exc.stderr or "").strip().splitlines()[-5:])
+        raise PipelineError(f"Command failed ({exc.returncode}): {' '.join(cmd)}\n{tail}") from exc
+
+    # showinfo logs one line per frame that reaches the encoder, in output order.
+    timestamps = [float(m.group(1)) for m in SHOWINFO_PTS_RE.finditer(result.stderr)]
+    frames = [frames_dir / f"frame_{i:06d}.jpg" for i in range(1, len(timestamps) + 1)]
+    if not frames:
+        raise PipelineError("No frames extracted. Check video input and ffmpeg installation.")
+    return frames, timestamps
+
+
+def frame_difference_scores(frames: list[Path]) -> np.ndarray:
+    """Mean absolute grayscale difference of each frame to the previous one (first frame = inf)."""
+    thumbs = np.stack([
+        np.asarray(Image.open(frame).convert("L").resize(DIFF_THUMB_SIZE), dtype=np.float32)
+        for frame in frames
+    ])
+    scores = np.empty(len(frames), dtype=np.float64)
+    scores[0] = np.inf
+    scores[1:] = np.abs(np.diff(thumbs, axis=0)).mean(axis=(1, 2))
+    return scores
+
+
+def apply_frame_budget(
+    frames: list[Path], timestamps: list[float], budget: int
+) -> tuple[list[Path], list[float]]:
+    """Keep the `budget` most-changed frames, delete the rest and renumber contiguously."""
+    if budget <= 0 or len(frames) <= budget:
+        return frames, timestamps
+    scores = frame_difference_scores(frames)
+    keep = np.sort(np.argsort(-scores, kind="stable")[:budget])
+    keep_set = set(keep.tolist())
+    for idx, frame in enumerate(frames):
+        if idx not in keep_set:
+            frame.unlink()
+
+    kept_frames: list[Path] = []
+    kept_timestamps: list[float] = []
+    # New index never exceeds the old one, so renaming in ascending order cannot clobber.
+    for new_index, old_idx in enumerate(keep.tolist(), start=1):
+        target = frames[old_idx].with_name(f"frame_{new_index:06d}.jpg")
+        if frames[old_idx] != target:
+            frames[old_idx].replace(target)
+        kept_frames.append(target)
+        kept_timestamps.append(timestamps[old_idx])
+    return kept_frames, kept_timestamps
+
+
+def write_frame_manifest(frames: list[Path], frames_dir: Path, timestamps: list[float]) -> Path:
+    """Record index, timestamp, size and hash for every frame so later stages skip re-deriving them."""
+    records = [
+        build_record(frame_path, index, timestamp)
+        for index, (frame_path, timestamp) in enumerate(zip(frames, timestamps), start=1)
+    ]
+    return write_manifest(frames_dir, records)
+
+
 def main() -> int:
     config = load_config()
     video_url = config["video_url"]
@@ -73,6 +276,12 @@ def main() -> int:
 
     output_dir = Path(config.get("output_dir", "output"))
     fps = config.get("fps", 1)
+    sampling = str(config.get("sampling", "fixed")).strip().lower()
+    if sampling not in ("fixed", "scene"):
+        print(f"Error: Unsupported sampling mode: {sampling}", file=sys.stderr)
+        return 1
+
+    workers = int(config.get("extract_workers", 1) or 1)
 
     video_path = output_dir / "video.mp4"
     frames_dir = output_dir / "frames"
@@ -85,9 +294,40 @@ def main() -> int:
             print("[collect] Downloading video with yt-dlp...")
             download_video(video_url, video_path)
 
-        print(f"[collect] Extracting frames at {fps} FPS with ffmpeg...")
-        frames = extract_frames(video_path, frames_dir, fps=fps)
+        if sampling == "scene":
+            scene_threshold = float(config.get("scene_threshold", 0.3))
+            min_fps = float(config.get("min_fps", 0.2))
+            max_fps = float(config.get("max_fps", 4.0))
+            print(
+                f"[collect] Extracting frames on scene change > {scene_threshold} "
+                f"({min_fps}-{max_fps} FPS) with ffmpeg..."
+            )
+            frames, timestamps = extract_frames_scene(
+                video_path, frames_dir, scene_threshold, min_fps, max_fps
+            )
+        elif workers > 1:
+            print(f"[collect] Extracting frames at {fps} FPS with {workers} parallel ffmpeg segments...")
+            frames, timestamps = extract_frames_segmented(video_path, frames_dir, fps=fps, workers=workers)
+        else:
+            print(f"[collect] Extracting frames at {fps} FPS with ffmpeg...")
+            frames = extract_frames(video_path, frames_dir, fps=fps)
+            timestamps = [(index - 1) / float(fps) for index in range(1, len(frames) + 1)]
         print(f"[collect] Extracted {len(frames)} frames to {frames_dir}")
+
+        budget = int(config.get("frame_budget", 0) or 0)
+        if budget and len(frames) > budget:
+            frames, timestamps = apply_frame_budget(frames, timestamps, budget)
+            print(f"[collect] Frame budget: kept the {len(frames)} most-changed frames")
+
+        manifest_path = write_frame_manifest(frames, frames_dir, timestamps)
+        print(f"[collect] Manifest written to {manifest_path}")
+
+        if config.get("dedup", False):
+            stats = dedup_from_config(config, frames_dir)
+            print(
+                f"[collect] Dedup: {stats['duplicates']} of {stats['frames']} frames are near-duplicates "
+                f"({stats['hashed']} newly hashed)"
+            )
     except PipelineError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         return 1
@@ -5,10 +5,15 @@ from __future__ import annotations
 
 import argparse
 import subprocess
+import sys
 from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+
+from shared.manifest import load_manifest
+
 
 def clamp(value: int, low: int, high: int) -> int:
     return max(low, min(value, high))
@@ -32,7 +37,13 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def draw_image(img_path: Path, label_path: Path, out_path: Path, class_names: list[str]) -> None:
+def draw_image(
+    img_path: Path,
+    label_path: Path,
+    out_path: Path,
+    class_names: list[str],
+    caption: str = "",
+) -> None:
     image = Image.open(img_path).convert("RGB")
     width, height = image.size
     draw = ImageDraw.Draw(image)
@@ -83,6 +94,13 @@ def draw_image(img_path: Path, label_path: Path, out_path: Path, class_names: li
             )
             draw.text((text_x, text_y), label, fill=color, font=font)
 
+    if caption:
+        # Source video position, so a bad label can be found in the video.
+        text_bbox = draw.textbbox((0, 0), caption, font=font)
+        text_y = height - (text_bbox[3] - text_bbox[1]) - 8
+        draw.rectangle([(0, text_y - 4), (text_bbox[2] + 8, height)], fill=(0, 0, 0))
+        draw.text((4, text_y), caption, fill=(255, 255, 255), font=font)
+
     image.save(out_path)
 
 
@@ -94,12 +112,24 @@ def main() -> int:
     out_dir = Path(args.out_dir) if args.out_dir else frames_dir / "preview"
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    images = sorted(frames_dir.glob("*.jpg")) + sorted(frames_dir.glob("*.jpeg")) + sorted(frames_dir.glob("*.png"))
+    records = load_manifest(frames_dir)
+    captions: dict[str, str] = {}
+    if records is not None:
+        images = [frames_dir / record.file for record in records]
+        captions = {record.file: f"t={record.timestamp:.2f}s" for record in records}
+    else:
+        images = sorted(frames_dir.glob("*.jpg")) + sorted(frames_dir.glob("*.jpeg")) + sorted(frames_dir.glob("*.png"))
     if args.limit > 0:
         images = images[: args.limit]
 
     for image_path in images:
-        draw_image(image_path, image_path.with_suffix(".txt"), out_dir / image_path.name, classes)
+        draw_image(
+            image_path,
+            image_path.with_suffix(".txt"),
+            out_dir / image_path.name,
+            classes,
+            captions.get(image_path.name, ""),
+        )
 
         print(f"Rendered {len(images)} preview images to: {out_dir}")
         if args.video_out and images:
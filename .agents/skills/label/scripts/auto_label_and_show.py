@@ -13,13 +13,16 @@ from PIL import Image, ImageDraw
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
+from shared.manifest import list_frames
 from shared.utils import load_config
 
 
 MODE_TO_SCRIPT = {
+    "cascade": "label_cascade.py",
     "cua+sam": "label_cua_sam.py",
     "gemini": "label_gemini.py",
     "gpt": "run.py",
+    "gpt-batch": "label_gpt_batch.py",
 }
 
 
@@ -41,7 +44,7 @@ def maybe_run_labeler(config: dict[str, object], frames_dir: Path, skip_label: b
         print("[show] Skipping labeling step by request.")
         return
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     if not frames:
         raise RuntimeError("No frames found. Run collect first.")
 
@@ -50,6 +53,14 @@ def maybe_run_labeler(config: dict[str, object], frames_dir: Path, skip_label: b
         print("[show] All frames already labeled.")
         return
 
+    # Confident frames are labeled by last iteration's YOLO model; the VLM gets the rest.
+    prelabel_script = Path(__file__).resolve().parent / "prelabel.py"
+    subprocess.run([sys.executable, str(prelabel_script)], check=True)
+    unlabeled = [frame for frame in unlabeled if not frame.with_suffix(".txt").exists()]
+    if not unlabeled:
+        print("[show] All frames labeled by the pre-label pass.")
+        return
+
     mode = str(config.get("label_mode", "gpt")).strip().lower()
     script_name = MODE_TO_SCRIPT.get(mode)
     if not script_name:
@@ -101,7 +112,7 @@ def print_summary(
     samples: int,
     configured_classes: list[str],
 ) -> list[Path]:
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     labels = sorted(frames_dir.glob("*.txt"))
     class_names = load_class_names(output_dir, configured_classes)
     counts: Counter[str] = Counter()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Benchmark async labeling throughput against a local stub Responses API server.
+
+The stub sleeps for a fixed latency per request and returns one fixed box, so the
+measured frames/sec isolates the concurrency of the labeling engine from the model.
+
+Usage: uv run .agents/skills/label/scripts/bench_async.py --frames 40 --latency 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import AsyncOpenAI
+from PIL import Image
+
+from run import LabelPlan, label_frame_async
+
+STUB_OBJECTS = {"objects": [{"class_name": "stub", "x": 10, "y": 10, "width": 20, "height": 20}]}
+
+
+def write_stub_frame(path: Path, size: tuple[int, int] = (64, 64)) -> Path:
+    """A small real JPEG; uploads read the frame's header for its dimensions."""
+    Image.new("RGB", size, (64, 96, 128)).save(path, format="JPEG")
+    return path
+
+
+def make_handler(
+    latency: float, spike_rate: float = 0.0, spike_latency: float = 0.0, bytes_per_second: float = 0.0
+) -> type[BaseHTTPRequestHandler]:
+    """Stub handler; a `spike_rate` fraction of requests take `spike_latency` instead.
+
+    With `bytes_per_second`, each request also waits for its body to "transfer" at that rate.
+    """
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            transfer = length / bytes_per_second if bytes_per_second > 0 else 0.0
+            time.sleep(transfer + (spike_latency if random.random() < spike_rate else latency))
+            body = json.dumps({
+                "id": "resp_stub",
+                "object": "response",
+                "created_at": int(time.time()),
+                "model": "stub",
+                "status": "completed",
+                "output": [
+                    {
+                        "type": "message",
+                        "id": "msg_stub",
+                        "role": "assistant",
+                        "status": "completed",
+                        "content": [
+                            {"type": "output_text", "text": json.dumps(STUB_OBJECTS), "annotations": []}
+                        ],
+                    }
+                ],
+                "parallel_tool_calls": False,
+                "tool_choice": "auto",
+                "tools": [],
+            }).encode("utf-8")
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled this call (e.g. a hedge won the race).
+                return
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            return
+
+    return StubHandler
+
+
+async def run_once(base_url: str, frames: list[Path], plan: LabelPlan, max_in_flight: int) -> float:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    start = time.perf_counter()
+    async with AsyncOpenAI(api_key="stub", base_url=base_url, max_retries=0) as client:
+        await asyncio.gather(*[
+            label_frame_async(client, "stub", frame, plan, "", semaphore) for frame in frames
+        ])
+    return time.perf_counter() - start
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Async labeling throughput benchmark (local stub server)")
+    parser.add_argument("--frames", type=int, default=40, help="Number of synthetic frames (default: 40)")
+    parser.add_argument("--classes", type=int, default=3, help="Classes per frame (default: 3)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency in seconds (default: 0.2)")
+    parser.add_argument("--strategy", default="per_class", choices=["per_class", "joint"], help="Label strategy")
+    parser.add_argument("--in-flight", default="1,2,4,8,16", help="Comma-separated max_in_flight values")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    classes = [f"class_{i}" for i in range(args.classes)]
+    plan = LabelPlan(joint=classes) if args.strategy == "joint" else LabelPlan(per_class=classes)
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = []
+        for i in range(args.frames):
+            frames.append(write_stub_frame(Path(tmp) / f"frame_{i + 1:06d}.jpg"))
+
+        requests = args.frames * max(plan.requests_per_frame, 1)
+        print(f"{requests} requests at {args.latency:.3f}s stub latency")
+        print(f"{'in_flight':>10} {'seconds':>9} {'frames/s':>9} {'speedup':>8}")
+        baseline = None
+        for max_in_flight in [int(v) for v in args.in_flight.split(",") if v.strip()]:
+            elapsed = asyncio.run(run_once(base_url, frames, plan, max_in_flight))
+            baseline = baseline or elapsed
+            print(
+                f"{max_in_flight:>10} {elapsed:>9.2f} {args.frames / elapsed:>9.2f} "
+                f"{baseline / elapsed:>7.2f}x"
+            )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark image dimension reads: in-process header parser vs one ffprobe per frame.
+
+Usage: uv run .agents/skills/label/scripts/bench_dimensions.py --frames 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+
+from PIL import Image
+
+from shared.utils import _probe_dimensions, parse_image_header, read_image_dimensions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Header parser vs ffprobe dimension benchmark")
+    parser.add_argument("--frames", type=int, default=10000, help="Synthetic frames to read (default: 10000)")
+    parser.add_argument("--width", type=int, default=1280, help="Frame width (default: 1280)")
+    parser.add_argument("--height", type=int, default=720, help="Frame height (default: 720)")
+    parser.add_argument(
+        "--ffprobe-limit",
+        type=int,
+        default=0,
+        help="Only probe this many frames with ffprobe and extrapolate (default: 0 = all)",
+    )
+    return parser.parse_args()
+
+
+def report(name: str, elapsed: float, count: int, total: int) -> float:
+    per_frame = elapsed / max(count, 1)
+    projected = per_frame * total
+    print(f"{name:>14}: {per_frame * 1e6:>10.1f} us/frame  {projected:>8.2f} s per {total} frames")
+    return per_frame
+
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        # One encoded JPEG copied N times keeps setup fast; reads still hit N distinct files.
+        template = Path(tmp) / "template.jpg"
+        Image.new("RGB", (args.width, args.height), (40, 90, 160)).save(template, quality=90)
+        frames = []
+        for i in range(args.frames):
+            frame = Path(tmp) / f"frame_{i + 1:06d}.jpg"
+            shutil.copyfile(template, frame)
+            frames.append(frame)
+
+        print(f"{args.frames} frames at {args.width}x{args.height}")
+
+        start = time.perf_counter()
+        for frame in frames:
+            assert parse_image_header(frame) == (args.width, args.height)
+        header = report("header parse", time.perf_counter() - start, len(frames), args.frames)
+
+        for label in ("memoized cold", "memoized warm"):
+            start = time.perf_counter()
+            for frame in frames:
+                read_image_dimensions(frame)
+            report(label, time.perf_counter() - start, len(frames), args.frames)
+
+        if shutil.which("ffprobe") is None:
+            print("ffprobe not found; skipping the subprocess baseline.")
+            return 0
+        sample = frames[: args.ffprobe_limit] if args.ffprobe_limit > 0 else frames
+        start = time.perf_counter()
+        for frame in sample:
+            _probe_dimensions(frame)
+        probe = report("ffprobe", time.perf_counter() - start, len(sample), args.frames)
+        print(f"header parse speedup: {probe / header:.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Benchmark hedged requests against a local stub server that injects latency spikes.
+
+Each frame's latency is measured with and without hedging; the hedger needs
+`--min-samples` calls before it starts hedging, so those warm-up frames are
+excluded from the percentiles.
+
+Usage: uv run .agents/skills/label/scripts/bench_hedge.py --frames 300 --spike-rate 0.03
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import AsyncOpenAI
+
+from bench_async import make_handler, write_stub_frame
+from run import LabelPlan, RequestOptions, label_frame_async
+from shared.hedge import Hedger
+
+
+async def run_once(
+    base_url: str,
+    frames: list[Path],
+    plan: LabelPlan,
+    max_in_flight: int,
+    hedger: Hedger | None,
+) -> list[float]:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    options = RequestOptions(hedger=hedger)
+    # Indexed by start order so warm-up frames can be excluded even if they finish late.
+    latencies = [0.0] * len(frames)
+    queue: asyncio.Queue[tuple[int, Path]] = asyncio.Queue()
+    for item in enumerate(frames):
+        queue.put_nowait(item)
+
+    async with AsyncOpenAI(api_key="stub", base_url=base_url, max_retries=0) as client:
+
+        async def worker() -> None:
+            while not queue.empty():
+                index, frame = queue.get_nowait()
+                start = time.perf_counter()
+                await label_frame_async(client, "stub", frame, plan, "", semaphore, options)
+                latencies[index] = time.perf_counter() - start
+
+        await asyncio.gather(*[worker() for _ in range(max_in_flight)])
+    return latencies
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Hedged request tail-latency benchmark (local stub server)")
+    parser.add_argument("--frames", type=int, default=300, help="Number of synthetic frames (default: 300)")
+    parser.add_argument("--classes", type=int, default=1, help="Per-class requests per frame (default: 1)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal stub latency in seconds (default: 0.05)")
+    parser.add_argument("--spike-rate", type=float, default=0.03, help="Fraction of slow requests (default: 0.03)")
+    parser.add_argument("--spike-latency", type=float, default=2.0, help="Slow request latency (default: 2.0)")
+    parser.add_argument("--in-flight", type=int, default=8, help="max_in_flight (default: 8)")
+    parser.add_argument("--min-samples", type=int, default=20, help="Calls before hedging starts (default: 20)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Hard per-request timeout (default: 30)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    handler = make_handler(args.latency, args.spike_rate, args.spike_latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    plan = LabelPlan(per_class=[f"class_{i}" for i in range(args.classes)])
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = []
+        for i in range(args.frames):
+            frames.append(write_stub_frame(Path(tmp) / f"frame_{i + 1:06d}.jpg"))
+
+        print(
+            f"{args.frames} frames, {args.spike_rate:.0%} of requests spike to {args.spike_latency:.2f}s "
+            f"(normal {args.latency:.3f}s), {args.in_flight} in flight"
+        )
+        print(f"{'mode':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for mode in ("plain", "hedged"):
+            hedger = Hedger(min_samples=args.min_samples, timeout=args.timeout) if mode == "hedged" else None
+            latencies = asyncio.run(run_once(base_url, frames, plan, args.in_flight, hedger))
+            measured = latencies[args.min_samples:] or latencies
+            print(
+                f"{mode:>8} {percentile(measured, 0.5) * 1000:>8.0f} {percentile(measured, 0.95) * 1000:>8.0f} "
+                f"{percentile(measured, 0.99) * 1000:>8.0f} {max(measured) * 1000:>8.0f}"
+            )
+            if hedger is not None:
+                print(f"  hedger: {hedger.summary()}")
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
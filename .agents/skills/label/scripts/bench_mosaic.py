@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Accuracy vs throughput of mosaic labeling for several K on a held-out labeled set.
+
+Labels the same held-out frames once per K (K=1 is plain per-frame labeling) with the
+configured labeler and compares the boxes against the frames' existing .txt labels
+at IoU 0.5. Predictions stay in memory; no label file is touched. Pick the largest
+K whose recall/precision is acceptable and set `mosaic_frames` to it.
+
+Usage: uv run .agents/skills/label/scripts/bench_mosaic.py --k 1,2,4,9 --limit 24
+Writes <output_dir>/mosaic_report.json.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run import RequestOptions, build_prompt, label_frame, plan_for_strategy
+from shared.cropgrid import read_yolo_boxes
+from shared.geometry import count_matches
+from shared.manifest import list_frames
+from shared.mosaic import MosaicSettings, group_frames, mosaic_settings_from_config
+from shared.ratelimit import limiter_from_config
+from shared.utils import BoundingBox, PipelineError, load_config, read_image_dimensions
+
+MOSAIC_REPORT_NAME = "mosaic_report.json"
+
+# (frame or mosaic path, prompt note) -> boxes in that image's pixels
+Detector = Callable[[Path, str], list[BoundingBox]]
+
+
+def held_out_frames(frames_dir: Path, limit: int) -> list[Path]:
+    labeled = [f for f in list_frames(frames_dir) if f.with_suffix(".txt").exists()]
+    step = max(1, len(labeled) // max(1, limit))
+    return labeled[::step][:limit]
+
+
+def load_reference(frames: list[Path], class_map_path: Path) -> dict[Path, list[BoundingBox]]:
+    names = [n for n in class_map_path.read_text(encoding="utf-8").splitlines() if n]
+    id_to_class = dict(enumerate(names))
+    reference: dict[Path, list[BoundingBox]] = {}
+    for frame_path in frames:
+        img_w, img_h = read_image_dimensions(frame_path)
+        boxes = read_yolo_boxes(frame_path.with_suffix(".txt"), id_to_class, img_w, img_h)
+        reference[frame_path] = [b for b in boxes if b is not None]
+    return reference
+
+
+def gpt_detector(config: dict[str, Any], model: str) -> tuple[Detector, int]:
+    from openai import OpenAI
+
+    classes = [str(c) for c in config.get("classes", [])]
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    # auto needs a calibration run; compare K under its per-class plan instead.
+    plan = plan_for_strategy("per_class" if strategy == "auto" else strategy, classes)
+    fallback_prompt = build_prompt(classes) if not classes else ""
+    client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+    options = RequestOptions(limiter=limiter_from_config(config, model))
+
+    def detect(image_path: Path, note: str) -> list[BoundingBox]:
+        return label_frame(client, model, image_path, replace(plan, note=note), fallback_prompt, options)
+
+    return detect, max(1, plan.requests_per_frame)
+
+
+def gemini_detector(config: dict[str, Any], model_name: str) -> tuple[Detector, int]:
+    import google.generativeai as genai
+
+    from label_gemini import detect_objects_gemini
+
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+    model = genai.GenerativeModel(model_name)
+    classes = config.get("classes", [])
+    limiter = limiter_from_config(config, model_name)
+
+    def detect(image_path: Path, note: str) -> list[BoundingBox]:
+        return detect_objects_gemini(model, image_path, classes, limiter, None, None, note)
+
+    return detect, 1
+
+
+def evaluate_k(
+    detect: Detector,
+    frames: list[Path],
+    reference: dict[Path, list[BoundingBox]],
+    k: int,
+    settings: MosaicSettings,
+    requests_per_image: int,
+) -> dict[str, Any]:
+    predicted: dict[Path, list[BoundingBox]] = {}
+    dropped = 0
+    start = time.perf_counter()
+    for group in group_frames(frames, k):
+        if k == 1:
+            predicted[group[0]] = detect(group[0], "")
+            continue
+        mosaic = replace(settings, frames=k).build(group)
+        try:
+            per_frame, seam = mosaic.split(detect(mosaic.path, mosaic.note))
+        finally:
+            mosaic.path.unlink(missing_ok=True)
+        predicted.update(per_frame)
+        dropped += seam
+    elapsed = time.perf_counter() - start
+
+    ref_total = sum(len(reference[f]) for f in frames)
+    pred_total = sum(len(predicted.get(f, [])) for f in frames)
+    matched = sum(count_matches(reference[f], predicted.get(f, [])) for f in frames)
+    requests = len(group_frames(frames, k)) * requests_per_image
+    return {
+        "k": k,
+        "frames": len(frames),
+        "requests": requests,
+        "requests_per_frame": round(requests / len(frames), 3),
+        "seconds": round(elapsed, 2),
+        "frames_per_second": round(len(frames) / elapsed, 3) if elapsed else None,
+        "recall": round(matched / ref_total, 4) if ref_total else None,
+        "precision": round(matched / pred_total, 4) if pred_total else None,
+        "seam_dropped": dropped,
+    }
+
+
+def _fmt(value: float | None) -> str:
+    return "n/a" if value is None else f"{value:.3f}"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mosaic K accuracy/throughput report on held-out labeled frames")
+    parser.add_argument("--k", default="1,2,4,9", help="Comma-separated frames-per-request values (default: 1,2,4,9)")
+    parser.add_argument("--limit", type=int, default=24, help="Held-out frames to evaluate (default: 24)")
+    parser.add_argument("--frames-dir", default="", help="Labeled frames (default: <output_dir>/frames)")
+    parser.add_argument("--labeler", choices=["gpt", "gemini"], default="", help="Default: from label_mode")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config()
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = Path(args.frames_dir) if args.frames_dir else output_dir / "frames"
+    class_map_path = frames_dir.parent / "classes.txt"
+    if not class_map_path.exists():
+        class_map_path = output_dir / "classes.txt"
+
+    labeler = args.labeler or ("gemini" if config.get("label_mode") == "gemini" else "gpt")
+    key_env = ("GEMINI_API_KEY", "GOOGLE_API_KEY") if labeler == "gemini" else ("OPENAI_API_KEY",)
+    if not any(os.getenv(name) for name in key_env):
+        print(f"Error: {' or '.join(key_env)} is not set.", file=sys.stderr)
+        return 1
+
+    frames = held_out_frames(frames_dir, args.limit)
+    if not frames or not class_map_path.exists():
+        print(f"Error: No labeled frames (and classes.txt) found in {frames_dir}.", file=sys.stderr)
+        return 1
+
+    if labeler == "gemini":
+        model = str(config.get("gemini_model", "gemini-2.5-flash"))
+        detect, requests_per_image = gemini_detector(config, model)
+    else:
+        model = str(config.get("model", "gpt-5-nano"))
+        detect, requests_per_image = gpt_detector(config, model)
+
+    reference = load_reference(frames, class_map_path)
+    settings = mosaic_settings_from_config(config, output_dir)
+    print(f"[mosaic] {len(frames)} held-out frames from {frames_dir}, {labeler} ({model})")
+    print(f"{'K':>3} {'req/frame':>10} {'frames/s':>9} {'recall':>7} {'precision':>10} {'seam drops':>11}")
+    rows: list[dict[str, Any]] = []
+    try:
+        for k in [int(v) for v in args.k.split(",") if v.strip()]:
+            row = evaluate_k(detect, frames, reference, max(1, k), settings, requests_per_image)
+            rows.append(row)
+            print(
+                f"{row['k']:>3} {row['requests_per_frame']:>10.3f} {_fmt(row['frames_per_second']):>9} "
+                f"{_fmt(row['recall']):>7} {_fmt(row['precision']):>10} {row['seam_dropped']:>11}"
+            )
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    report_path = output_dir / MOSAIC_REPORT_NAME
+    report_path.write_text(
+        json.dumps({"labeler": labeler, "model": model, "frames_dir": str(frames_dir), "results": rows}, indent=2),
+        encoding="utf-8",
+    )
+    print(f"[mosaic] Report: {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""CPU benchmark: SAM frames/minute with one call per click vs one batched call per frame.
+
+Synthesizes busy frames with `--objects` sprites each (default 12) and prompts SAM
+with one click per sprite center, as label_cua_sam.py does after CUA returns.
+"per-point" re-reads and re-encodes the frame for every click (the old path);
+"batched" encodes it once and decodes every click in one prompt call; "roi"
+segments a `--roi-window` crop around each click (label_cua_sam.py's `sam_roi`).
+
+Usage: uv run .agents/skills/label/scripts/bench_sam.py --frames 3 --objects 12 --model mobile_sam.pt
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+
+from PIL import Image, ImageDraw
+
+from shared.sam import DEFAULT_ROI_WINDOW, DEFAULT_SAM_MODEL, SamSegmenter, mask_to_bbox
+from shared.utils import BoundingBox
+
+
+def synth_frame(path: Path, seed: int, objects: int, size: tuple[int, int] = (1280, 720)) -> list[tuple[int, int]]:
+    """Write a frame with `objects` non-overlapping sprites; returns their centers."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (40, 90, 40))
+    draw = ImageDraw.Draw(image)
+    columns = 4
+    cell_w, cell_h = size[0] // columns, size[1] // ((objects + columns - 1) // columns)
+    centers: list[tuple[int, int]] = []
+    for i in range(objects):
+        cx = (i % columns) * cell_w + cell_w // 2 + rng.randrange(-cell_w // 6, cell_w // 6 + 1)
+        cy = (i // columns) * cell_h + cell_h // 2 + rng.randrange(-cell_h // 6, cell_h // 6 + 1)
+        w, h = rng.randrange(30, cell_w // 2), rng.randrange(30, cell_h // 2)
+        color = tuple(rng.randrange(120, 256) for _ in range(3))
+        draw.ellipse((cx - w // 2, cy - h // 2, cx + w // 2, cy + h // 2), fill=color, outline=(0, 0, 0), width=2)
+        centers.append((cx, cy))
+    image.save(path, format="JPEG", quality=92)
+    return centers
+
+
+def per_point(segmenter: SamSegmenter, frame_path: Path, points: list[tuple[int, int]]) -> list[BoundingBox | None]:
+    """The previous path: one SAM call (and one image encode) per click."""
+    boxes: list[BoundingBox | None] = []
+    for point in points:
+        results = segmenter.model(str(frame_path), points=[list(point)], labels=[1], verbose=False)
+        if not results or results[0].masks is None or len(results[0].masks.data) == 0:
+            boxes.append(None)
+            continue
+        boxes.append(mask_to_bbox(results[0].masks.data[0].cpu().numpy()))
+    return boxes
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SAM per-point vs batched prompt benchmark (CPU)")
+    parser.add_argument("--frames", type=int, default=3, help="Synthetic frames (default: 3)")
+    parser.add_argument("--objects", type=int, default=12, help="Objects (clicks) per frame (default: 12)")
+    parser.add_argument("--model", default=DEFAULT_SAM_MODEL, help=f"SAM weights (default: {DEFAULT_SAM_MODEL})")
+    parser.add_argument(
+        "--roi-window", type=int, default=DEFAULT_ROI_WINDOW, help=f"ROI crop size (default: {DEFAULT_ROI_WINDOW})"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    segmenter = SamSegmenter(args.model)
+    roi = SamSegmenter(args.model, model=segmenter.model, roi_window=args.roi_window)
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = []
+        for i in range(args.frames):
+            frame_path = Path(tmp) / f"frame_{i + 1:06d}.jpg"
+            frames.append((frame_path, synth_frame(frame_path, i, args.objects)))
+
+        # Warm-up: model load and first-call setup are not per-frame costs.
+        segmenter.segment_points(frames[0][0], frames[0][1][:1])
+
+        print(f"{args.frames} frames x {args.objects} clicks, {args.model} on CPU")
+        print(f"{'mode':>10} {'seconds':>9} {'frames/min':>11} {'boxes':>6} {'speedup':>8}")
+        baseline = None
+        modes = (
+            ("per-point", segmenter, per_point),
+            ("batched", segmenter, SamSegmenter.segment_points),
+            ("roi", roi, SamSegmenter.segment_points),
+        )
+        for name, seg, run in modes:
+            start = time.perf_counter()
+            boxes = sum(sum(b is not None for b in run(seg, path, points)) for path, points in frames)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"{name:>10} {elapsed:>9.2f} {args.frames / elapsed * 60.0:>11.2f} {boxes:>6} "
+                f"{baseline / elapsed:>7.2f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Parity check and CPU latency benchmark: SAM through PyTorch vs exported ONNX.
+
+Runs the same synthetic frames and clicks (bench_sam.py's sprites) through both
+backends and compares the box each click gets. A click passes when both boxes
+overlap at `--min-iou` or both backends find nothing. Exits 1 when fewer than
+`--min-pass` of the clicks pass, so the script can gate switching `sam_backend`.
+Also reports model start-up time and per-frame latency for each backend.
+
+The first run exports the ONNX graphs next to the weights, so that run's ONNX
+start-up includes the export. Needs the `onnx` extra: `uv sync --extra onnx`.
+
+Usage: uv run .agents/skills/label/scripts/bench_sam_onnx.py --model mobile_sam.pt --threads 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_sam import synth_frame
+from shared.geometry import boxes_to_xyxy, iou_matrix
+from shared.sam import DEFAULT_ONNX_SAM_MODEL, SamSegmenter
+from shared.sam_onnx import OnnxSamSegmenter
+from shared.utils import BoundingBox
+
+DEFAULT_MODEL = DEFAULT_ONNX_SAM_MODEL
+
+
+def click_iou(a: BoundingBox | None, b: BoundingBox | None) -> float:
+    """IoU of two per-click boxes; 1.0 when both are missing, 0.0 when only one is."""
+    if a is None or b is None:
+        return 1.0 if a is b else 0.0
+    return float(iou_matrix(boxes_to_xyxy([a]), boxes_to_xyxy([b]))[0, 0])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SAM PyTorch vs ONNX parity and latency (CPU)")
+    parser.add_argument("--frames", type=int, default=3, help="Synthetic frames (default: 3)")
+    parser.add_argument("--objects", type=int, default=12, help="Objects (clicks) per frame (default: 12)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"SAM/MobileSAM weights (default: {DEFAULT_MODEL})")
+    parser.add_argument("--threads", type=int, default=0, help="onnxruntime threads, 0 = its default (default: 0)")
+    parser.add_argument("--min-iou", type=float, default=0.9, help="Per-click match IoU (default: 0.9)")
+    parser.add_argument("--min-pass", type=float, default=0.95, help="Share of clicks that must match (default: 0.95)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    start = time.perf_counter()
+    torch_segmenter = SamSegmenter(args.model)
+    torch_startup = time.perf_counter() - start
+    start = time.perf_counter()
+    onnx_segmenter = OnnxSamSegmenter(args.model, threads=args.threads)
+    onnx_startup = time.perf_counter() - start
+    if onnx_segmenter.exported:
+        print(f"[sam-onnx] Exported {args.model} to ONNX; the onnx start-up below includes the export")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = []
+        for i in range(args.frames):
+            frame_path = Path(tmp) / f"frame_{i + 1:06d}.jpg"
+            frames.append((frame_path, synth_frame(frame_path, i, args.objects)))
+
+        # Warm-up: first-call setup is not a per-frame cost.
+        for segmenter in (torch_segmenter, onnx_segmenter):
+            segmenter.segment_points(frames[0][0], frames[0][1][:1])
+
+        elapsed = {"torch": 0.0, "onnx": 0.0}
+        ious: list[float] = []
+        for frame_path, points in frames:
+            start = time.perf_counter()
+            expected = torch_segmenter.segment_points(frame_path, points)
+            elapsed["torch"] += time.perf_counter() - start
+            start = time.perf_counter()
+            actual = onnx_segmenter.segment_points(frame_path, points)
+            elapsed["onnx"] += time.perf_counter() - start
+            ious.extend(click_iou(a, b) for a, b in zip(expected, actual))
+
+    threads = args.threads or "default"
+    print(f"{args.frames} frames x {args.objects} clicks, {args.model} on CPU (onnxruntime threads: {threads})")
+    print(f"{'backend':>8} {'startup s':>10} {'ms/frame':>9} {'frames/min':>11} {'speedup':>8}")
+    for name, startup in (("torch", torch_startup), ("onnx", onnx_startup)):
+        per_frame = elapsed[name] / args.frames
+        print(
+            f"{name:>8} {startup:>10.2f} {per_frame * 1000.0:>9.1f} {60.0 / per_frame:>11.2f} "
+            f"{elapsed['torch'] / elapsed[name]:>7.2f}x"
+        )
+
+    passed = sum(iou >= args.min_iou for iou in ious)
+    rate = passed / len(ious) if ious else 1.0
+    mean_iou = sum(ious) / len(ious) if ious else 1.0
+    print(
+        f"[sam-onnx] Parity: {passed}/{len(ious)} clicks at IoU >= {args.min_iou} "
+        f"({rate:.1%}), mean IoU {mean_iou:.3f}, worst {min(ious, default=1.0):.3f}"
+    )
+    if rate < args.min_pass:
+        print(f"Error: ONNX boxes diverge from PyTorch on {len(ious) - passed} clicks.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
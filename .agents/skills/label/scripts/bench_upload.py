@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Benchmark upload profiles: bytes sent, encode cost and request latency per profile.
+
+Frames come from `--frames-dir` (e.g. output/frames) or are synthesized at 1920x1080.
+Each profile labels the same frames through `label_frame_async` against a local stub
+server that charges `--mbps` of simulated uplink per request body, so the latency
+column shows what the smaller payloads buy on a constrained connection.
+
+Usage: uv run .agents/skills/label/scripts/bench_upload.py --frames 20 --mbps 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import AsyncOpenAI
+from PIL import Image, ImageDraw
+
+from bench_async import make_handler
+from run import LabelPlan, RequestOptions, label_frame_async
+from shared.manifest import list_frames
+from shared.upload import PROFILES, UploadEncoder, encode_frame
+
+
+def synth_frame(path: Path, seed: int, size: tuple[int, int] = (1920, 1080)) -> Path:
+    """A busy game-like frame: gradient background, noise and scattered sprites."""
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    noise = Image.effect_noise(size, 40).convert("RGB")
+    image = Image.blend(image, noise, 0.35)
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        w, h = rng.randrange(20, 160), rng.randrange(20, 160)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + w, y + h), fill=color, outline=(0, 0, 0), width=2)
+    image.save(path, format="JPEG", quality=92)
+    return path
+
+
+async def run_profile(
+    base_url: str, frames: list[Path], plan: LabelPlan, encoder: UploadEncoder, max_in_flight: int
+) -> float:
+    semaphore = asyncio.Semaphore(max_in_flight)
+    options = RequestOptions(upload=encoder)
+    start = time.perf_counter()
+    async with AsyncOpenAI(api_key="stub", base_url=base_url, max_retries=0) as client:
+        await asyncio.gather(*[
+            label_frame_async(client, "stub", frame, plan, "", semaphore, options) for frame in frames
+        ])
+    return time.perf_counter() - start
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Upload profile benchmark (local stub server)")
+    parser.add_argument("--frames-dir", default="", help="Benchmark these frames instead of synthetic ones")
+    parser.add_argument("--frames", type=int, default=20, help="Number of frames (default: 20)")
+    parser.add_argument("--classes", type=int, default=3, help="Per-class requests per frame (default: 3)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub model latency in seconds (default: 0.1)")
+    parser.add_argument("--mbps", type=float, default=20.0, help="Simulated uplink in Mbit/s (default: 20)")
+    parser.add_argument("--in-flight", type=int, default=4, help="max_in_flight (default: 4)")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profiles to compare")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    bytes_per_second = args.mbps * 1e6 / 8.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, bytes_per_second=bytes_per_second))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    plan = LabelPlan(per_class=[f"class_{i}" for i in range(args.classes)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.frames_dir:
+            frames = list_frames(Path(args.frames_dir))[: args.frames]
+        else:
+            frames = [synth_frame(Path(tmp) / f"frame_{i + 1:06d}.jpg", i) for i in range(args.frames)]
+        if not frames:
+            print(f"No frames found in {args.frames_dir}")
+            return 1
+
+        print(
+            f"{len(frames)} frames x {args.classes} per-class requests, "
+            f"{args.latency:.3f}s model latency, {args.mbps:g} Mbit/s uplink, {args.in_flight} in flight"
+        )
+        print(f"{'profile':>10} {'size':>11} {'KB/frame':>9} {'of orig':>8} {'encode ms':>10} {'seconds':>8} {'speedup':>8}")
+        baseline = None
+        for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            profile = PROFILES[name]
+            start = time.perf_counter()
+            encoded = [encode_frame(frame, profile) for frame in frames]
+            encode_ms = (time.perf_counter() - start) * 1000.0 / len(frames)
+
+            encoder = UploadEncoder(profile, name)
+            elapsed = asyncio.run(run_profile(base_url, frames, plan, encoder, args.in_flight))
+            baseline = baseline or elapsed
+            sent = sum(len(image.data) for image in encoded)
+            original = sum(frame.stat().st_size for frame in frames)
+            print(
+                f"{name:>10} {encoded[0].width:>5}x{encoded[0].height:<5} {sent / len(frames) / 1024:>9.1f} "
+                f"{sent / original:>7.0%} {encode_ms:>10.1f} {elapsed:>8.2f} {baseline / elapsed:>7.2f}x"
+            )
+            print(f"{'':>10} {encoder.summary()}")
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
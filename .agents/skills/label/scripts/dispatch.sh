@@ -78,12 +78,36 @@ if [ "$LABEL_MODE" != "gpt" ] && [ "$LABEL_MODE" != "codex" ]; then
   exit 1
 fi
 
-# Count frames
-shopt -s nullglob
-FRAMES=("${FRAMES_DIR}"/frame_*.jpg)
+# Auto-label confident frames with last iteration's YOLO weights (no-op before the first train)
+uv run .agents/skills/label/scripts/prelabel.py
+
+# Count unlabeled frames (manifest order, minus near-duplicates marked by the dedup stage)
+FRAMES=()
+while IFS= read -r frame; do
+  FRAMES+=("$frame")
+done < <(
+  REPO_ROOT="$REPO_ROOT" FRAMES_DIR="$FRAMES_DIR" uv run python - <<'PY'
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, os.environ["REPO_ROOT"])
+from shared.manifest import list_frames
+
+frames_dir = Path(os.environ["FRAMES_DIR"])
+if frames_dir.is_dir():
+    for frame in list_frames(frames_dir):
+        if not frame.with_suffix(".txt").exists():
+            print(frame)
+PY
+)
 TOTAL=${#FRAMES[@]}
 
 if [ "$TOTAL" -eq 0 ]; then
+  if compgen -G "${FRAMES_DIR}/*.txt" >/dev/null; then
+    echo "All frames already labeled."
+    exit 0
+  fi
   echo "Error: No frames found in ${FRAMES_DIR}. Run collect first."
   exit 1
 fi
@@ -94,6 +118,9 @@ echo "Dispatching ${NUM_AGENTS} subagents for ${TOTAL} frames (${BATCH_SIZE} eac
 
 mkdir -p "$WORKTREE_BASE"
 
+# Subagents share the main run's response cache instead of one per worktree
+export YOLODEX_CACHE_DIR="${REPO_ROOT}/${OUTPUT_DIR}/.cache"
+
 pids=()
 for i in $(seq 1 $NUM_AGENTS); do
   BRANCH="yolodex/labeler-${i}"
@@ -114,6 +141,10 @@ for i in $(seq 1 $NUM_AGENTS); do
   for j in $(seq $START $(( END - 1 ))); do
     cp "${FRAMES[$j]}" "${DIR}/${OUTPUT_DIR}/frames/"
   done
+  # Share run.py's auto-strategy calibration so subagents skip calibrating
+  if [ -f "${REPO_ROOT}/${OUTPUT_DIR}/label_strategy.json" ]; then
+    cp "${REPO_ROOT}/${OUTPUT_DIR}/label_strategy.json" "${DIR}/${OUTPUT_DIR}/"
+  fi
 
   # Launch Codex subagent in the worktree
   echo "  Agent ${i}: frames ${START}-${END} in ${DIR}"
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Cascade labeling: cheapest backend first, escalating frames to stronger models on a trigger.
+
+`cascade_tiers` lists tiers cheapest first. A tier is one model, or two cheap backends
+(GPT or Gemini) cross-checked with the IoU matcher. Escalation rules live in
+shared/cascade.py. Frames are labeled in order, so the `count` trigger compares a
+frame against the frames just before it.
+
+GPT models use run.py's request plan (`label_strategy`), response cache and upload
+profile. Gemini models (names starting with "gemini") use label_gemini.py. A failed
+call escalates instead of being retried. Frames that fail on the last tier go to
+`dead_letter.json`.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import OpenAI
+
+from run import (
+    LABEL_STRATEGIES,
+    RequestOptions,
+    build_prompt,
+    label_frame,
+    load_class_map,
+    plan_for_strategy,
+    write_class_map,
+    write_yolo_labels,
+)
+from shared.cache import ResponseCache, cache_from_config
+from shared.cascade import CascadeSettings, CascadeStats, CountHistory, cascade_from_config, escalation_reason
+from shared.manifest import list_frames
+from shared.ratelimit import limiter_from_config
+from shared.retry import DEAD_LETTER_NAME, DeadLetter, FatalAPIError
+from shared.upload import UploadEncoder, upload_encoder_from_config
+from shared.utils import BoundingBox, PipelineError, load_config
+
+Backend = Callable[[Path], list[BoundingBox]]
+
+
+def is_gemini(model: str) -> bool:
+    return model.strip().lower().startswith("gemini")
+
+
+class Backends:
+    """One labeling callable per model, plus how many API calls each invocation made."""
+
+    def __init__(
+        self, config: dict[str, Any], cache: ResponseCache | None, encoder: UploadEncoder, stats: CascadeStats
+    ) -> None:
+        self.config = config
+        self.cache = cache
+        self.encoder = encoder
+        self.stats = stats
+        self._backends: dict[str, tuple[Backend, int]] = {}
+        self._openai: OpenAI | None = None
+
+    def _build(self, model: str) -> tuple[Backend, int]:
+        classes = [str(c) for c in self.config.get("classes", [])]
+        if is_gemini(model):
+            import google.generativeai as genai
+
+            from label_gemini import detect_objects_gemini
+
+            genai.configure(api_key=os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
+            gemini = genai.GenerativeModel(model)
+            limiter = limiter_from_config(self.config, model)
+
+            def detect_gemini(frame: Path) -> list[BoundingBox]:
+                return detect_objects_gemini(gemini, frame, classes, limiter, self.cache, self.encoder, strict=True)
+
+            return detect_gemini, 1
+
+        if self._openai is None:
+            self._openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        client = self._openai
+        strategy = str(self.config.get("label_strategy", "per_class")).strip().lower()
+        # auto needs a per-model calibration run; per_class is its safe superset.
+        plan = plan_for_strategy("per_class" if strategy == "auto" else strategy, classes)
+        fallback_prompt = build_prompt(classes) if not classes else ""
+        options = RequestOptions(
+            limiter=limiter_from_config(self.config, model), cache=self.cache, upload=self.encoder
+        )
+
+        def detect(frame: Path) -> list[BoundingBox]:
+            return label_frame(client, model, frame, plan, fallback_prompt, options)
+
+        return detect, max(1, plan.requests_per_frame)
+
+    def run(self, model: str, frame_path: Path) -> list[BoundingBox]:
+        if model not in self._backends:
+            self._backends[model] = self._build(model)
+        backend, requests = self._backends[model]
+        misses = self.cache.misses if self.cache is not None else 0
+        try:
+            return backend(frame_path)
+        finally:
+            # Cache hits cost nothing; every miss is a request that went out.
+            self.stats.calls[model] += self.cache.misses - misses if self.cache is not None else requests
+
+
+def label_frame_cascade(
+    frame_path: Path,
+    settings: CascadeSettings,
+    backends: Backends,
+    history: CountHistory,
+) -> tuple[list[BoundingBox], int]:
+    """Boxes from the first tier that triggers nothing, and that tier's index.
+
+    Raises the last tier's error when even the last tier fails.
+    """
+    stats = backends.stats
+    last = len(settings.tiers) - 1
+    for index, models in enumerate(settings.tiers):
+        try:
+            results = [backends.run(model, frame_path) for model in models]
+        except FatalAPIError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            if index == last:
+                raise
+            stats.escalated[index]["malformed" if isinstance(exc, PipelineError) else "error"] += 1
+            continue
+        reason = escalation_reason(settings, results, history) if index < last else None
+        if reason is None:
+            stats.accepted[index] += 1
+            history.add(len(results[0]))
+            return results[0], index
+        stats.escalated[index][reason] += 1
+    raise AssertionError("unreachable")
+
+
+def main() -> int:
+    config = load_config()
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = output_dir / "frames"
+    classes = config.get("classes", [])
+
+    try:
+        settings = cascade_from_config(config)
+        encoder = upload_encoder_from_config(config)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    models = [m for tier in settings.tiers for m in tier]
+    if any(not is_gemini(m) for m in models) and not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY is not set.", file=sys.stderr)
+        return 1
+    if any(is_gemini(m) for m in models) and not (os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")):
+        print("Error: GEMINI_API_KEY or GOOGLE_API_KEY is not set.", file=sys.stderr)
+        return 1
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    if strategy not in LABEL_STRATEGIES:
+        print(f"Error: Unsupported label_strategy: {strategy}", file=sys.stderr)
+        return 1
+
+    frames = list_frames(frames_dir)
+    if not frames:
+        print("Error: No frames found. Run the collect skill first.", file=sys.stderr)
+        return 1
+    unlabeled = [f for f in frames if not f.with_suffix(".txt").exists()]
+    if not unlabeled:
+        print("[cascade] All frames already labeled.")
+        return 0
+
+    class_map_path = output_dir / "classes.txt"
+    class_to_id = load_class_map(class_map_path, classes)
+    cache = cache_from_config(config, output_dir)
+    dead_letter = DeadLetter(output_dir / DEAD_LETTER_NAME)
+    stats = CascadeStats(settings)
+    backends = Backends(config, cache, encoder, stats)
+    history = CountHistory(settings.neighbors)
+
+    tiers = " -> ".join(" + ".join(tier) for tier in settings.tiers)
+    print(f"[cascade] Labeling {len(unlabeled)} frames through {tiers}...")
+    try:
+        for idx, frame_path in enumerate(unlabeled, start=1):
+            try:
+                boxes, tier = label_frame_cascade(frame_path, settings, backends, history)
+            except FatalAPIError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                dead_letter.add(frame_path.name, exc, len(settings.tiers))
+                print(f"  ! {frame_path.name}: failed on every tier ({exc}); added to dead letter", file=sys.stderr)
+                continue
+            dead_letter.discard(frame_path.name)
+            write_yolo_labels(frame_path, boxes, class_to_id)
+            print(f"  - Frame {idx}/{len(unlabeled)}: {frame_path.name} (tier {tier + 1}, {len(boxes)} boxes)")
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        # Labels written so far reference these ids, so keep the class map in sync.
+        write_class_map(class_to_id, class_map_path)
+        for line in stats.summary_lines():
+            print(f"[cascade] {line}")
+        if cache is not None:
+            print(f"[cascade] Response cache: {cache.summary()}")
+        print(f"[cascade] Uploads: {encoder.summary()}")
+
+    if dead_letter.added:
+        print(f"[cascade] {dead_letter.added} frames failed and were added to {dead_letter.path}; re-run to retry them.")
+    print(f"[cascade] Done. {len(unlabeled) - dead_letter.added} frames labeled. Classes: {class_map_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
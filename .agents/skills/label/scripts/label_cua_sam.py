@@ -1,37 +1,89 @@
 #!/usr/bin/env python3
-"""CUA + SAM labeling: CUA clicks on objects for coordinates, SAM segments for precise bboxes."""
+"""CUA + SAM labeling: CUA clicks on objects for coordinates, SAM segments for precise bboxes.
+
+Clicks for every class are collected first, then SAM encodes the frame once and
+decodes all of them in one batched prompt call (shared/sam.py).
+
+The run is a producer/consumer pipeline: `cua_workers` threads gather CUA clicks
+for (frame, class) pairs concurrently and hand each frame's complete click set to
+a bounded queue (`sam_queue_size`); the main thread owns the SAM model and drains
+it. Network-bound clicking and CPU-bound segmentation overlap, so throughput is
+set by the slower side instead of their sum.
+"""
 
 from __future__ import annotations
 
 import os
+import queue
 import sys
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 
-import numpy as np
-
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
 from openai import OpenAI
-from ultralytics import SAM
 
+from shared.manifest import list_frames
+from shared.ratelimit import (
+    RateLimiter,
+    RateLimitExceeded,
+    estimate_image_tokens,
+    estimate_request_tokens,
+    limiter_from_config,
+)
+from shared.geometry import per_class_nms
+from shared.sam import DEFAULT_NMS_IOU, SamSegmenter, sam_segmenter_from_config
+from shared.upload import EncodedImage, UploadEncoder, encode_for_upload, upload_encoder_from_config
 from shared.utils import (
     BoundingBox,
     PipelineError,
-    encode_image_base64,
     load_config,
     read_image_dimensions,
 )
 
 
+CUA_MODEL = "computer-use-preview"
+DEFAULT_CUA_WORKERS = 4
+DEFAULT_SAM_QUEUE_SIZE = 4
+
+
+def create_cua_response(client: OpenAI, limiter: RateLimiter | None, tokens: int, **kwargs):
+    if limiter is None:
+        return client.responses.create(**kwargs)
+    raw = limiter.call(lambda: client.responses.with_raw_response.create(**kwargs), tokens)
+    limiter.update_from_headers(raw.headers)
+    return raw.parse()
+
+
 def get_cua_clicks(
-    client: OpenAI, frame_path: Path, class_name: str, img_w: int, img_h: int
+    client: OpenAI,
+    image: EncodedImage,
+    class_name: str,
+    limiter: RateLimiter | None = None,
 ) -> list[tuple[int, int]]:
-    """Use CUA to click on all instances of a class in the frame."""
-    image_b64 = encode_image_base64(frame_path)
+    """Use CUA to click on all instances of a class in the frame.
+
+    The uploaded image is the CUA display, so clicks come back in its pixels and
+    are mapped to original-frame pixels for SAM.
+    """
+    image_b64 = image.b64
+    img_w, img_h = image.width, image.height
     clicks: list[tuple[int, int]] = []
+    prompt = (
+        f"This is a game screenshot. Click on every '{class_name}' "
+        f"you can see, one at a time. Start with the first one."
+    )
+    tokens = estimate_request_tokens(prompt, estimate_image_tokens(img_w, img_h))
 
-    response = client.responses.create(
-        model="computer-use-preview",
+    response = create_cua_response(
+        client,
+        limiter,
+        tokens,
+        model=CUA_MODEL,
         tools=[
             {
                 "type": "computer_use_preview",
@@ -44,13 +96,7 @@ def get_cua_clicks(
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "input_text",
-                        "text": (
-                            f"This is a game screenshot. Click on every '{class_name}' "
-                            f"you can see, one at a time. Start with the first one."
-                        ),
-                    },
+                    {"type": "input_text", "text": prompt},
                     {
                         "type": "input_image",
                         "image_url": f"data:image/jpeg;base64,{image_b64}",
@@ -88,8 +134,11 @@ def get_cua_clicks(
                 break
 
             call_id = pending_calls[-1].call_id
-            response = client.responses.create(
-                model="computer-use-preview",
+            response = create_cua_response(
+                client,
+                limiter,
+                tokens,
+                model=CUA_MODEL,
                 previous_response_id=response_id,
                 tools=[
                     {
@@ -125,59 +174,101 @@ def get_cua_clicks(
                                 found_new = True
             if not found_new:
                 break
+        except RateLimitExceeded:
+            raise
         except Exception:
             break
 
-    return clicks
-
-
-def sam_point_to_bbox(
-    sam_model: SAM, frame_path: Path, point: tuple[int, int], img_w: int, img_h: int
-) -> BoundingBox | None:
-    """Use SAM to segment from a point prompt, return bounding box."""
-    results = sam_model(str(frame_path), points=[list(point)], labels=[1])
+    return [image.point_to_original(x, y) for x, y in clicks]
 
-    if not results or not results[0].masks or len(results[0].masks.data) == 0:
-        return None
 
-    mask = results[0].masks.data[0].cpu().numpy()
-    coords = np.where(mask > 0)
-    if len(coords[0]) == 0:
-        return None
+@dataclass
+class FrameClicks:
+    """One frame's CUA clicks, per class in config order once every class is in."""
 
-    y_min, y_max = int(coords[0].min()), int(coords[0].max())
-    x_min, x_max = int(coords[1].min()), int(coords[1].max())
+    frame_path: Path
+    clicks: dict[str, list[tuple[int, int]]] = field(default_factory=dict)
+    error: Exception | None = None
+    remaining: int = 0
 
-    return BoundingBox(
-        class_name="",  # filled in by caller
-        x=float(x_min),
-        y=float(y_min),
-        width=float(x_max - x_min),
-        height=float(y_max - y_min),
-    )
+    @property
+    def prompts(self) -> list[tuple[str, tuple[int, int]]]:
+        return [
+            (class_name.strip().lower().replace(" ", "_"), point)
+            for class_name, points in self.clicks.items()
+            for point in points
+        ]
 
 
-def label_frame_cua_sam(
+def segment_clicks(
+    segmenter: SamSegmenter, frame: FrameClicks, nms_iou: float = DEFAULT_NMS_IOU
+) -> list[BoundingBox]:
+    """All of a frame's clicks through SAM; repeated clicks on one object collapse under per-class NMS."""
+    prompts = frame.prompts
+    boxes = segmenter.segment_points(frame.frame_path, [point for _, point in prompts])
+    named = [
+        replace(box, class_name=name)
+        for (name, _), box in zip(prompts, boxes)
+        if box is not None
+    ]
+    return per_class_nms(named, nms_iou)
+
+
+def collect_clicks_pipelined(
     client: OpenAI,
-    sam_model: SAM,
-    frame_path: Path,
+    frames: list[Path],
     classes: list[str],
-) -> list[BoundingBox]:
-    """Label a single frame using CUA for clicks + SAM for segmentation."""
-    img_w, img_h = read_image_dimensions(frame_path)
-    all_boxes: list[BoundingBox] = []
-
-    for class_name in classes:
-        clicks = get_cua_clicks(client, frame_path, class_name, img_w, img_h)
-        print(f"    CUA found {len(clicks)} '{class_name}' instances")
-
-        for point in clicks:
-            box = sam_point_to_bbox(sam_model, frame_path, point, img_w, img_h)
-            if box is not None:
-                box.class_name = class_name.strip().lower().replace(" ", "_")
-                all_boxes.append(box)
-
-    return all_boxes
+    limiter: RateLimiter | None = None,
+    encoder: UploadEncoder | None = None,
+    workers: int = DEFAULT_CUA_WORKERS,
+    queue_size: int = DEFAULT_SAM_QUEUE_SIZE,
+) -> Iterator[FrameClicks]:
+    """Yield each frame's clicks as soon as all its classes are in, in completion order.
+
+    (frame, class) CUA calls run on `workers` threads. At most `queue_size` finished
+    frames wait for the consumer; beyond that, producer threads block, so clicking
+    never runs far ahead of segmentation.
+    """
+    done: queue.Queue[FrameClicks] = queue.Queue(maxsize=max(1, queue_size))
+    lock = threading.Lock()
+    pending = {
+        frame_path: FrameClicks(frame_path, dict.fromkeys(classes, []), remaining=len(classes))
+        for frame_path in frames
+    }
+
+    def gather(frame_path: Path, class_name: str) -> None:
+        entry = pending[frame_path]
+        clicks: list[tuple[int, int]] = []
+        error: Exception | None = None
+        try:
+            clicks = get_cua_clicks(client, encode_for_upload(frame_path, encoder), class_name, limiter)
+        except Exception as exc:  # noqa: BLE001
+            error = exc
+        with lock:
+            entry.clicks[class_name] = clicks
+            # A rate-limit error wins: it means "retry the frame later", not "frame has no objects".
+            if error is not None and not isinstance(entry.error, RateLimitExceeded):
+                entry.error = error
+            entry.remaining -= 1
+            complete = entry.remaining == 0
+        if complete:
+            # Blocks while the queue is full; this is the pipeline's backpressure.
+            done.put(entry)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cua")
+    futures: list[Future[None]] = []
+    try:
+        futures = [pool.submit(gather, f, c) for f in frames for c in classes]
+        for _ in frames:
+            yield done.get()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        # If the consumer stopped early, keep draining so blocked producers can exit.
+        while not all(future.done() for future in futures):
+            try:
+                done.get(timeout=0.1)
+            except queue.Empty:
+                pass
 
 
 def main() -> int:
@@ -194,9 +285,8 @@ def main() -> int:
 
     output_dir = Path(config.get("output_dir", "output"))
     frames_dir = output_dir / "frames"
-    sam_model_name = config.get("sam_model", "sam2_b.pt")
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     if not frames:
         print("Error: No frames found. Run the collect skill first.", file=sys.stderr)
         return 1
@@ -207,8 +297,17 @@ def main() -> int:
         return 0
 
     client = OpenAI(api_key=api_key)
-    print(f"[cua+sam] Loading SAM model: {sam_model_name}...")
-    sam_model = SAM(sam_model_name)
+    limiter = limiter_from_config(config, CUA_MODEL)
+    try:
+        encoder = upload_encoder_from_config(config)
+        segmenter = sam_segmenter_from_config(config)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    if getattr(segmenter, "exported", False):
+        print(f"[cua+sam] Exported {segmenter.model_name} to ONNX (cached for later runs)")
+    print(f"[cua+sam] Loaded SAM model: {segmenter.model_name} ({segmenter.backend})")
+    nms_iou = float(config.get("sam_nms_iou", DEFAULT_NMS_IOU))
 
     # Build class map
     from shared.utils import clamp
@@ -225,34 +324,57 @@ def main() -> int:
         if key not in class_to_id:
             class_to_id[key] = len(class_to_id)
 
-    print(f"[cua+sam] Labeling {len(unlabeled)} frames with CUA + SAM...")
-    for idx, frame_path in enumerate(unlabeled, start=1):
-        print(f"  Frame {idx}/{len(unlabeled)}: {frame_path.name}")
-        try:
-            boxes = label_frame_cua_sam(client, sam_model, frame_path, classes)
-        except Exception as exc:
-            print(f"    Warning: {exc}")
-            boxes = []
-
-        img_w, img_h = read_image_dimensions(frame_path)
-        lines: list[str] = []
-        for box in boxes:
-            if box.class_name not in class_to_id:
-                class_to_id[box.class_name] = len(class_to_id)
-            cid = class_to_id[box.class_name]
-            cx = clamp((box.x + box.width / 2.0) / img_w, 0.0, 1.0)
-            cy = clamp((box.y + box.height / 2.0) / img_h, 0.0, 1.0)
-            nw = clamp(box.width / img_w, 0.0, 1.0)
-            nh = clamp(box.height / img_h, 0.0, 1.0)
-            lines.append(f"{cid} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
-
-        label_path = frame_path.with_suffix(".txt")
-        label_path.write_text("\n".join(lines), encoding="utf-8")
+    workers = max(1, int(config.get("cua_workers", DEFAULT_CUA_WORKERS)))
+    queue_size = max(1, int(config.get("sam_queue_size", DEFAULT_SAM_QUEUE_SIZE)))
+    print(f"[cua+sam] Labeling {len(unlabeled)} frames with CUA + SAM ({workers} CUA workers)...")
+    rate_limited = 0
+    # closing() drains and shuts down the click workers even when this loop raises;
+    # otherwise they block on the full queue and the interpreter never exits.
+    with closing(
+        collect_clicks_pipelined(client, unlabeled, classes, limiter, encoder, workers, queue_size)
+    ) as frames_clicked:
+        for idx, frame in enumerate(frames_clicked, start=1):
+            frame_path = frame.frame_path
+            counts = ", ".join(f"{len(points)} '{name}'" for name, points in frame.clicks.items())
+            print(f"  Frame {idx}/{len(unlabeled)}: {frame_path.name} (CUA found {counts})")
+            if isinstance(frame.error, RateLimitExceeded):
+                # Leave the frame unlabeled so the next run retries it instead of writing empty labels.
+                print(f"    Warning: {frame.error} Skipping frame.")
+                rate_limited += 1
+                continue
+            if frame.error is not None:
+                print(f"    Warning: {frame.error}")
+                boxes = []
+            else:
+                try:
+                    boxes = segment_clicks(segmenter, frame, nms_iou)
+                except Exception as exc:
+                    print(f"    Warning: {exc}")
+                    boxes = []
+
+            img_w, img_h = read_image_dimensions(frame_path)
+            lines: list[str] = []
+            for box in boxes:
+                if box.class_name not in class_to_id:
+                    class_to_id[box.class_name] = len(class_to_id)
+                cid = class_to_id[box.class_name]
+                cx = clamp((box.x + box.width / 2.0) / img_w, 0.0, 1.0)
+                cy = clamp((box.y + box.height / 2.0) / img_h, 0.0, 1.0)
+                nw = clamp(box.width / img_w, 0.0, 1.0)
+                nh = clamp(box.height / img_h, 0.0, 1.0)
+                lines.append(f"{cid} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
+
+            label_path = frame_path.with_suffix(".txt")
+            label_path.write_text("\n".join(lines), encoding="utf-8")
 
     # Write class map
     names = [n for n, _ in sorted(class_to_id.items(), key=lambda x: x[1])]
     class_map_path.write_text("\n".join(names), encoding="utf-8")
-    print(f"[cua+sam] Done. {len(unlabeled)} frames labeled.")
+    print(f"[cua+sam] SAM: {segmenter.summary()}")
+    print(f"[cua+sam] Uploads: {encoder.summary()}")
+    if rate_limited:
+        print(f"[cua+sam] {rate_limited} frames skipped after repeated rate limits; re-run to label them.")
+    print(f"[cua+sam] Done. {len(unlabeled) - rate_limited} frames labeled.")
     return 0
 
 
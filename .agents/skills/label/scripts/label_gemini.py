@@ -1,15 +1,45 @@
 #!/usr/bin/env python3
-"""Gemini labeling: uses Gemini's native bounding box detection for precise object localization."""
+"""Gemini labeling: uses Gemini's native bounding box detection for precise object localization.
+
+Frames are labeled by a bounded async pool: at most `max_in_flight` requests (default 1)
+are outstanding. `gemini_images_per_request: K` sends K frames as separate images in
+one request and asks for one answer per image, keyed by its index. A frame the answer
+leaves out stays unlabeled, so the next run retries it; a frame whose upload or request
+fails is also recorded in `dead_letter.json`.
+
+With `mosaic_frames: K` (K > 1), K frames share one request as a grid image and the
+boxes are split back per frame (shared/mosaic.py). Mosaics are labeled one at a time.
+
+Frames are sent as the upload encoder's bytes, so the encoder does the only decode (none
+for the `original` profile) and label files use the frame size it read.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import re
 import sys
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
+from shared.cache import ResponseCache, cache_from_config, cache_key
+from shared.manifest import list_frames
+from shared.mosaic import MosaicSettings, MosaicStats, group_frames, mosaic_settings_from_config
+from shared.ratelimit import (
+    DEFAULT_OUTPUT_TOKENS,
+    RateLimiter,
+    RateLimitExceeded,
+    estimate_gemini_image_tokens,
+    estimate_request_tokens,
+    limiter_from_config,
+)
+from shared.retry import DEAD_LETTER_NAME, DeadLetter
+from shared.upload import EncodedImage, UploadEncoder, encode_for_upload, upload_encoder_from_config
 from shared.utils import (
     BoundingBox,
     PipelineError,
@@ -18,54 +48,80 @@ from shared.utils import (
     read_image_dimensions,
 )
 
+# Each image's answer lengthens the response; past this the JSON risks being cut off.
+MAX_IMAGES_PER_REQUEST = 16
 
-def detect_objects_gemini(
-    model, frame_path: Path, classes: list[str],
-) -> list[BoundingBox]:
-    """Use Gemini's native bounding box detection."""
-    import google.generativeai as genai
-    from PIL import Image
+BOX_FORMAT = '{"label": "class_name", "box_2d": [y_min, x_min, y_max, x_max]}'
 
-    img = Image.open(frame_path)
-    img_w, img_h = img.size
 
+def _class_hint(classes: list[str]) -> str:
     if classes:
-        class_hint = f"Focus on detecting: {', '.join(classes)}."
-    else:
-        class_hint = "Detect all visible objects."
+        return f"Focus on detecting: {', '.join(classes)}."
+    return "Detect all visible objects."
+
 
+def build_gemini_prompt(classes: list[str], note: str = "") -> str:
     prompt = (
         f"Detect objects in this game screenshot and return bounding boxes. "
-        f"{class_hint}\n\n"
+        f"{_class_hint(classes)}\n\n"
         f"Return JSON with this format:\n"
-        f'{{"objects": [{{"label": "class_name", "box_2d": [y_min, x_min, y_max, x_max]}}]}}\n'
+        f'{{"objects": [{BOX_FORMAT}]}}\n'
         f"Coordinates should be in the 0-1000 normalized scale."
     )
+    if note:
+        prompt = f"{prompt}\n{note}"
+    return prompt
 
-    response = model.generate_content([prompt, img])
-    text = response.text
 
-    # Parse response — Gemini returns bounding boxes in [y0, x0, y1, x1] format, 0-1000 scale
+def build_multi_image_prompt(classes: list[str], count: int) -> str:
+    return (
+        f"Detect objects in each of these {count} game screenshots and return bounding boxes. "
+        f"{_class_hint(classes)}\n\n"
+        f"The images are numbered 0 to {count - 1} in the order given. Answer every image; "
+        f"use an empty objects list for an image with nothing to detect.\n"
+        f"Return JSON with this format:\n"
+        f'{{"images": [{{"index": 0, "objects": [{BOX_FORMAT}]}}]}}\n'
+        f"Coordinates should be in the 0-1000 normalized scale of each image."
+    )
+
+
+def image_part(image: EncodedImage) -> dict[str, Any]:
+    """The upload bytes as an inline blob, so the SDK sends them without decoding or re-encoding."""
+    return {"mime_type": image.mime_type, "data": image.data}
+
+
+def parse_gemini_json(text: str, strict: bool = False) -> dict[str, Any] | None:
+    """The JSON object in a Gemini reply, bare or inside a code block.
+
+    None for unparseable output, or PipelineError with `strict`.
+    """
     try:
         # Try direct JSON parse
         data = json.loads(text)
     except json.JSONDecodeError:
         # Try extracting from markdown code blocks
-        import re
         match = re.search(r"\{.*\}", text, flags=re.DOTALL)
         if not match:
+            if strict:
+                raise PipelineError("Gemini did not return valid JSON")
             print(f"    Warning: Gemini did not return valid JSON")
-            return []
+            return None
         try:
             data = json.loads(match.group(0))
         except json.JSONDecodeError:
-            print(f"    Warning: Gemini returned malformed JSON")
-            return []
+            data = None
+    if not isinstance(data, dict):
+        if strict:
+            raise PipelineError("Gemini returned malformed JSON")
+        print(f"    Warning: Gemini returned malformed JSON")
+        return None
+    return data
 
-    objects = data.get("objects", [])
-    boxes: list[BoundingBox] = []
 
-    for obj in objects:
+def boxes_from_objects(objects: Any, img_w: int, img_h: int) -> list[BoundingBox]:
+    """Pixel boxes from Gemini's objects list ([y0, x0, y1, x1] on a 0-1000 scale)."""
+    boxes: list[BoundingBox] = []
+    for obj in objects if isinstance(objects, list) else []:
         if not isinstance(obj, dict):
             continue
         try:
@@ -87,10 +143,284 @@ def detect_objects_gemini(
             ))
         except (KeyError, TypeError, ValueError, IndexError):
             continue
-
     return boxes
 
 
+def detect_objects_gemini(
+    model,
+    frame_path: Path,
+    classes: list[str],
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    encoder: UploadEncoder | None = None,
+    note: str = "",
+    strict: bool = False,
+) -> list[BoundingBox]:
+    """Use Gemini's native bounding box detection; `note` is appended to the prompt.
+
+    With `strict`, unparseable output raises PipelineError instead of returning no boxes.
+    """
+    image = encode_for_upload(frame_path, encoder)
+    # box_2d is normalized, so it maps onto the original frame regardless of the upload size.
+    img_w, img_h = image.original_width, image.original_height
+    prompt = build_gemini_prompt(classes, note)
+    contents = [prompt, image_part(image)]
+
+    key = ""
+    text = None
+    if cache is not None:
+        key = cache_key("gemini", model.model_name, prompt, image.data)
+        text = cache.get(key)
+    from_cache = text is not None
+
+    if text is None:
+        if limiter is None:
+            response = model.generate_content(contents)
+        else:
+            tokens = estimate_request_tokens(prompt, estimate_gemini_image_tokens(image.width, image.height))
+            response = limiter.call(lambda: model.generate_content(contents), tokens)
+        text = response.text
+
+    data = parse_gemini_json(text, strict)
+    if data is None:
+        return []
+    if cache is not None and not from_cache:
+        cache.put(key, text)
+    return boxes_from_objects(data.get("objects", []), img_w, img_h)
+
+
+@dataclass
+class FrameLabels:
+    frame_path: Path
+    size: tuple[int, int] | None = None  # original frame pixels, read once by the upload encoder
+    boxes: list[BoundingBox] | None = None  # None: the answer left this frame out
+    error: Exception | None = None  # the frame could not be encoded or its request failed
+
+
+async def detect_frames_gemini_async(
+    model,
+    frames: list[Path],
+    classes: list[str],
+    semaphore: asyncio.Semaphore,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    encoder: UploadEncoder | None = None,
+) -> list[FrameLabels]:
+    """Label one or more frames in a single request; images are numbered in `frames` order.
+
+    Frames are encoded on worker threads so decoding and resizing do not block the event
+    loop; a frame that fails to encode gets its `error` set and is left out of the request.
+    A single frame uses detect_objects_gemini's prompt, so both share cached responses.
+    An unreadable single-frame answer gives no boxes, as in the sequential path; an
+    unreadable multi-image answer leaves every frame of the request out.
+    """
+    encoded = await asyncio.gather(
+        *(asyncio.to_thread(encode_for_upload, frame_path, encoder) for frame_path in frames),
+        return_exceptions=True,
+    )
+    results: list[FrameLabels] = []
+    images: list[EncodedImage] = []
+    failed: list[FrameLabels] = []
+    for frame_path, image in zip(frames, encoded):
+        if isinstance(image, Exception):
+            failed.append(FrameLabels(frame_path, error=image))
+        elif isinstance(image, BaseException):
+            raise image
+        else:
+            results.append(FrameLabels(frame_path, (image.original_width, image.original_height)))
+            images.append(image)
+    if not images:
+        return failed
+    if len(images) == 1:
+        prompt = build_gemini_prompt(classes)
+        contents: list[Any] = [prompt, image_part(images[0])]
+    else:
+        prompt = build_multi_image_prompt(classes, len(images))
+        contents = [prompt]
+        for index, image in enumerate(images):
+            contents += [f"Image {index}:", image_part(image)]
+
+    key = ""
+    text = None
+    if cache is not None:
+        key = cache_key("gemini", model.model_name, prompt, *(image.data for image in images))
+        text = cache.get(key)
+    from_cache = text is not None
+
+    if text is None:
+        async with semaphore:
+            if limiter is None:
+                response = await model.generate_content_async(contents)
+            else:
+                image_tokens = sum(estimate_gemini_image_tokens(image.width, image.height) for image in images)
+                tokens = estimate_request_tokens(prompt, image_tokens, DEFAULT_OUTPUT_TOKENS * len(images))
+                response = await limiter.call_async(lambda: model.generate_content_async(contents), tokens)
+        text = response.text
+
+    data = parse_gemini_json(text)
+    if data is None:
+        if len(results) == 1:
+            results[0].boxes = []
+        return results + failed
+    if cache is not None and not from_cache:
+        cache.put(key, text)
+
+    if len(results) == 1:
+        results[0].boxes = boxes_from_objects(data.get("objects", []), *results[0].size)
+        return results + failed
+    answers = data.get("images", [])
+    for answer in answers if isinstance(answers, list) else []:
+        if not isinstance(answer, dict):
+            continue
+        try:
+            index = int(answer["index"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < len(results) and results[index].boxes is None:
+            results[index].boxes = boxes_from_objects(answer.get("objects", []), *results[index].size)
+    return results + failed
+
+
+async def label_frames_gemini_async(
+    model,
+    frames: list[Path],
+    classes: list[str],
+    class_to_id: dict[str, int],
+    max_in_flight: int,
+    images_per_request: int,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    encoder: UploadEncoder | None = None,
+    dead_letter: DeadLetter | None = None,
+) -> tuple[int, int, int]:
+    """Label frames `images_per_request` at a time with at most `max_in_flight` requests outstanding.
+
+    Returns (labeled, rate limited, left out of the answer); failed frames go to
+    `dead_letter`. Label files are written from the event loop thread, so `class_to_id`
+    needs no extra locking.
+    """
+    queue: asyncio.Queue[list[Path]] = asyncio.Queue()
+    groups = group_frames(frames, images_per_request)
+    for group in groups:
+        queue.put_nowait(group)
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+    labeled = rate_limited = missing = 0
+
+    async def worker() -> None:
+        nonlocal labeled, rate_limited, missing
+        while True:
+            try:
+                group = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                results = await detect_frames_gemini_async(model, group, classes, semaphore, limiter, cache, encoder)
+            except RateLimitExceeded as exc:
+                # Leave the frames unlabeled so the next run retries them instead of writing empty labels.
+                print(f"  ! {', '.join(f.name for f in group)}: {exc} Skipping.")
+                rate_limited += len(group)
+                continue
+            except Exception as exc:  # noqa: BLE001
+                results = [FrameLabels(f, error=exc) for f in group]
+            for frame in results:
+                if frame.error is not None:
+                    # Leave the frame unlabeled; the next run retries it.
+                    print(f"  ! {frame.frame_path.name}: {frame.error}", file=sys.stderr)
+                    if dead_letter is not None:
+                        dead_letter.add(frame.frame_path.name, frame.error, 1)
+                    continue
+                if frame.boxes is None:
+                    missing += 1
+                    print(f"  ! {frame.frame_path.name}: missing from the answer; left for the next run")
+                    continue
+                write_labels(frame.frame_path, frame.boxes, class_to_id, frame.size)
+                if dead_letter is not None:
+                    dead_letter.discard(frame.frame_path.name)
+                labeled += 1
+                print(f"  - Frame {labeled}/{len(frames)}: {frame.frame_path.name} ({len(frame.boxes)} boxes)")
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max_in_flight, len(groups)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return labeled, rate_limited, missing
+
+
+def label_mosaics(
+    model,
+    frames: list[Path],
+    classes: list[str],
+    class_to_id: dict[str, int],
+    mosaic: MosaicSettings,
+    mosaic_stats: MosaicStats,
+    limiter: RateLimiter | None = None,
+    cache: ResponseCache | None = None,
+    encoder: UploadEncoder | None = None,
+    dead_letter: DeadLetter | None = None,
+) -> int:
+    """Label frames `mosaic.frames` per grid image, one request at a time; returns frames rate limited.
+
+    Frames of a grid that fails to build or whose request fails go to `dead_letter`.
+    """
+    groups = group_frames(frames, mosaic.frames)
+    rate_limited = 0
+    for idx, group in enumerate(groups, start=1):
+        print(f"  Mosaic {idx}/{len(groups)}: {', '.join(f.name for f in group)}")
+        grid = None
+        try:
+            grid = mosaic.build(group)
+            boxes = detect_objects_gemini(model, grid.path, classes, limiter, cache, encoder, grid.note)
+        except RateLimitExceeded as exc:
+            # Leave the frames unlabeled so the next run retries them instead of writing empty labels.
+            print(f"    Warning: {exc} Skipping.")
+            rate_limited += len(group)
+            continue
+        except Exception as exc:  # noqa: BLE001
+            # Empty labels would pass for "nothing here"; leave the frames for the next run.
+            print(f"    ! {exc}", file=sys.stderr)
+            if dead_letter is not None:
+                for frame_path in group:
+                    dead_letter.add(frame_path.name, exc, 1)
+            continue
+        finally:
+            if grid is not None:
+                grid.path.unlink(missing_ok=True)
+
+        per_frame, dropped = grid.split(boxes)
+        mosaic_stats.record(grid, sum(len(b) for b in per_frame.values()), dropped)
+        for frame_path, frame_boxes in per_frame.items():
+            write_labels(frame_path, frame_boxes, class_to_id)
+            if dead_letter is not None:
+                dead_letter.discard(frame_path.name)
+    return rate_limited
+
+
+def write_labels(
+    frame_path: Path,
+    boxes: list[BoundingBox],
+    class_to_id: dict[str, int],
+    size: tuple[int, int] | None = None,
+) -> None:
+    """Write YOLO labels; `size` is the frame's (width, height) when the caller already has it."""
+    img_w, img_h = size or read_image_dimensions(frame_path)
+    lines: list[str] = []
+    for box in boxes:
+        if box.class_name not in class_to_id:
+            class_to_id[box.class_name] = len(class_to_id)
+        cid = class_to_id[box.class_name]
+        cx = clamp((box.x + box.width / 2.0) / img_w, 0.0, 1.0)
+        cy = clamp((box.y + box.height / 2.0) / img_h, 0.0, 1.0)
+        nw = clamp(box.width / img_w, 0.0, 1.0)
+        nh = clamp(box.height / img_h, 0.0, 1.0)
+        lines.append(f"{cid} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
+
+    label_path = frame_path.with_suffix(".txt")
+    label_path.write_text("\n".join(lines), encoding="utf-8")
+
+
 def main() -> int:
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     if not api_key:
@@ -109,7 +439,7 @@ def main() -> int:
     output_dir = Path(config.get("output_dir", "output"))
     frames_dir = output_dir / "frames"
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     if not frames:
         print("Error: No frames found. Run the collect skill first.", file=sys.stderr)
         return 1
@@ -121,6 +451,13 @@ def main() -> int:
 
     genai.configure(api_key=api_key)
     model = genai.GenerativeModel(gemini_model)
+    limiter = limiter_from_config(config, gemini_model)
+    cache = cache_from_config(config, output_dir)
+    try:
+        encoder = upload_encoder_from_config(config)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
 
     class_to_id: dict[str, int] = {}
     class_map_path = output_dir / "classes.txt"
@@ -129,33 +466,52 @@ def main() -> int:
             if name:
                 class_to_id[name] = idx
 
-    print(f"[gemini] Labeling {len(unlabeled)} frames with {gemini_model}...")
-    for idx, frame_path in enumerate(unlabeled, start=1):
-        print(f"  Frame {idx}/{len(unlabeled)}: {frame_path.name}")
-        try:
-            boxes = detect_objects_gemini(model, frame_path, classes)
-        except Exception as exc:
-            print(f"    Warning: {exc}")
-            boxes = []
-
-        img_w, img_h = read_image_dimensions(frame_path)
-        lines: list[str] = []
-        for box in boxes:
-            if box.class_name not in class_to_id:
-                class_to_id[box.class_name] = len(class_to_id)
-            cid = class_to_id[box.class_name]
-            cx = clamp((box.x + box.width / 2.0) / img_w, 0.0, 1.0)
-            cy = clamp((box.y + box.height / 2.0) / img_h, 0.0, 1.0)
-            nw = clamp(box.width / img_w, 0.0, 1.0)
-            nh = clamp(box.height / img_h, 0.0, 1.0)
-            lines.append(f"{cid} {cx:.6f} {cy:.6f} {nw:.6f} {nh:.6f}")
-
-        label_path = frame_path.with_suffix(".txt")
-        label_path.write_text("\n".join(lines), encoding="utf-8")
+    mosaic = mosaic_settings_from_config(config, output_dir)
+    mosaic_stats = MosaicStats()
+    max_in_flight = max(1, int(config.get("max_in_flight", 1)))
+    images_per_request = min(max(1, int(config.get("gemini_images_per_request", 1))), MAX_IMAGES_PER_REQUEST)
+    dead_letter = DeadLetter(output_dir / DEAD_LETTER_NAME)
+    missing = 0
+    if mosaic.enabled:
+        print(f"[gemini] Labeling {len(unlabeled)} frames with {gemini_model}, {mosaic.frames} frames per request...")
+        if images_per_request > 1 or max_in_flight > 1:
+            print("[gemini] mosaic_frames is set; gemini_images_per_request and max_in_flight are ignored.")
+        rate_limited = label_mosaics(
+            model, unlabeled, classes, class_to_id, mosaic, mosaic_stats, limiter, cache, encoder, dead_letter
+        )
+    else:
+        per_request = f", {images_per_request} images per request" if images_per_request > 1 else ""
+        in_flight = f", {max_in_flight} requests in flight" if max_in_flight > 1 else ""
+        print(f"[gemini] Labeling {len(unlabeled)} frames with {gemini_model}{per_request}{in_flight}...")
+        _, rate_limited, missing = asyncio.run(
+            label_frames_gemini_async(
+                model,
+                unlabeled,
+                classes,
+                class_to_id,
+                max_in_flight,
+                images_per_request,
+                limiter,
+                cache,
+                encoder,
+                dead_letter,
+            )
+        )
 
     names = [n for n, _ in sorted(class_to_id.items(), key=lambda x: x[1])]
     class_map_path.write_text("\n".join(names), encoding="utf-8")
-    print(f"[gemini] Done. {len(unlabeled)} frames labeled.")
+    if cache is not None:
+        print(f"[gemini] Response cache: {cache.summary()}")
+    print(f"[gemini] Uploads: {encoder.summary()}")
+    if mosaic.enabled:
+        print(f"[gemini] Mosaics: {mosaic_stats.summary()}")
+    if rate_limited:
+        print(f"[gemini] {rate_limited} frames skipped after repeated rate limits; re-run to label them.")
+    if missing:
+        print(f"[gemini] {missing} frames were missing from multi-image answers; re-run to label them.")
+    if dead_letter.added:
+        print(f"[gemini] {dead_letter.added} frames failed and were added to {dead_letter.path}; re-run to retry them.")
+    print(f"[gemini] Done. {len(unlabeled) - rate_limited - missing - dead_letter.added} frames labeled.")
     return 0
 
 
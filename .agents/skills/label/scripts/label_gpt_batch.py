@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""Label skill (gpt-batch mode): label frames through the OpenAI Batch API.
+
+Each unlabeled frame x request in the label plan (same `label_strategy` as run.py)
+becomes one line of a JSONL batch input file, split at the API's per-file limits.
+Submitted batches are tracked in `<output_dir>/label_batch_job.json`, so an
+interrupted run resumes polling the same batches instead of resubmitting. Once all
+batches finish, outputs are parsed and written with run.py's `write_yolo_labels`.
+Requests whose response is already in the response cache are not resubmitted.
+
+`batch_transport: local` swaps the API for the on-disk stand-in in shared/batch.py,
+which runs the whole submit/poll/ingest cycle offline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import OpenAI
+
+from run import (
+    DEFAULT_RECALL_THRESHOLD,
+    LABEL_STRATEGIES,
+    LabelPlan,
+    assign_class,
+    build_joint_prompt,
+    build_joint_schema,
+    build_prompt,
+    build_request,
+    build_single_class_prompt,
+    load_auto_calibration,
+    load_class_map,
+    normalize_class_name,
+    parse_boxes,
+    plan_for_strategy,
+    weak_classes_from_recall,
+    write_class_map,
+    write_yolo_labels,
+)
+from shared.batch import (
+    BATCH_ENDPOINT,
+    MAX_BATCH_BYTES,
+    MAX_BATCH_REQUESTS,
+    TERMINAL_STATUSES,
+    BatchTransport,
+    LocalBatchTransport,
+    OpenAIBatchTransport,
+    response_output_text,
+)
+from shared.cache import ResponseCache, cache_from_config, cache_key
+from shared.manifest import list_frames
+from shared.upload import EncodedImage, UploadEncoder, encode_for_upload, scale_box, upload_encoder_from_config
+from shared.utils import BoundingBox, PipelineError, load_config
+
+JOB_RECORD_NAME = "label_batch_job.json"
+BATCH_DIR_NAME = "batch"
+DEFAULT_POLL_SECONDS = 30.0
+ID_SEPARATOR = "::"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Label frames with the OpenAI Batch API")
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Submit (or poll once) and exit; re-run later to resume and ingest",
+    )
+    return parser.parse_args()
+
+
+def request_parts(model: str, image: EncodedImage, plan: LabelPlan, fallback_prompt: str) -> list[tuple[str, dict[str, Any]]]:
+    """(part, request body) for every request `label_frame` would make for this frame."""
+    image_b64 = image.b64
+    if not plan.joint and not plan.per_class:
+        return [("all", build_request(model, fallback_prompt, image_b64))]
+    parts: list[tuple[str, dict[str, Any]]] = []
+    if plan.joint:
+        joint_request = build_request(
+            model, build_joint_prompt(plan.joint), image_b64, build_joint_schema(plan.joint)
+        )
+        parts.append(("joint", joint_request))
+    for class_name in plan.per_class:
+        parts.append((f"class:{class_name}", build_request(model, build_single_class_prompt(class_name), image_b64)))
+    return parts
+
+
+def boxes_from_outputs(outputs: dict[str, str], plan: LabelPlan) -> list[BoundingBox]:
+    """Combine one frame's outputs the same way `label_frame` does."""
+    if not plan.joint and not plan.per_class:
+        return parse_boxes(outputs["all"])
+    boxes: list[BoundingBox] = []
+    if plan.joint:
+        allowed = {normalize_class_name(c) for c in plan.joint}
+        covered = {normalize_class_name(c) for c in plan.per_class}
+        boxes.extend(
+            box for box in parse_boxes(outputs["joint"])
+            if box.class_name in allowed and box.class_name not in covered
+        )
+    for class_name in plan.per_class:
+        boxes.extend(assign_class(parse_boxes(outputs[f"class:{class_name}"]), class_name))
+    return boxes
+
+
+def save_job(record_path: Path, job: dict[str, Any]) -> None:
+    tmp_path = record_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(job), encoding="utf-8")
+    tmp_path.replace(record_path)
+
+
+def load_job(record_path: Path) -> dict[str, Any] | None:
+    """The unfinished job on disk, or None when there is nothing to resume."""
+    if not record_path.exists():
+        return None
+    try:
+        job = json.loads(record_path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+    return None if job.get("ingested") else job
+
+
+def prepare_job(
+    frames: list[Path],
+    model: str,
+    strategy: str,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    batch_dir: Path,
+    cache: ResponseCache | None,
+    encoder: UploadEncoder | None = None,
+) -> dict[str, Any]:
+    """Write the batch input files and return a job record that has not been submitted yet."""
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    job: dict[str, Any] = {
+        "model": model,
+        "strategy": strategy,
+        "plan": asdict(plan),
+        "fallback_prompt": fallback_prompt,
+        "frames": [frame.name for frame in frames],
+        "keys": {},
+        "cached": {},
+        "scales": {},
+        "batches": [],
+        "ingested": False,
+    }
+    handle = None
+    count = 0
+    size = 0
+    try:
+        for frame_path in frames:
+            image = encode_for_upload(frame_path, encoder)
+            if image.resized:
+                # Ingest maps boxes from the uploaded size back to the frame's pixels.
+                job["scales"][frame_path.name] = [image.scale_x, image.scale_y]
+            for part, body in request_parts(model, image, plan, fallback_prompt):
+                request_id = f"{frame_path.name}{ID_SEPARATOR}{part}"
+                if cache is not None:
+                    key = cache_key(body)
+                    cached = cache.get(key)
+                    if cached is not None:
+                        job["cached"][request_id] = cached
+                        continue
+                    job["keys"][request_id] = key
+                line = json.dumps(
+                    {"custom_id": request_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                    separators=(",", ":"),
+                ) + "\n"
+                line_size = len(line.encode("utf-8"))
+                if handle is None or count >= MAX_BATCH_REQUESTS or size + line_size > MAX_BATCH_BYTES:
+                    if handle is not None:
+                        handle.close()
+                    input_name = f"batch_{len(job['batches']) + 1:04d}.jsonl"
+                    handle = (batch_dir / input_name).open("w", encoding="utf-8")
+                    job["batches"].append({"input": input_name, "requests": 0})
+                    count = 0
+                    size = 0
+                handle.write(line)
+                job["batches"][-1]["requests"] += 1
+                count += 1
+                size += line_size
+    finally:
+        if handle is not None:
+            handle.close()
+    return job
+
+
+def submit_pending(job: dict[str, Any], transport: BatchTransport, batch_dir: Path, record_path: Path) -> None:
+    for batch in job["batches"]:
+        if batch.get("batch_id"):
+            continue
+        batch["file_id"] = transport.upload(batch_dir / batch["input"])
+        batch["batch_id"] = transport.create(batch["file_id"])
+        batch["status"] = "validating"
+        # Record each submission immediately so a crash never resubmits a batch.
+        save_job(record_path, job)
+        print(f"[batch] Submitted {batch['input']} ({batch['requests']} requests) as {batch['batch_id']}")
+
+
+def poll(
+    job: dict[str, Any],
+    transport: BatchTransport,
+    record_path: Path,
+    poll_seconds: float,
+    wait: bool,
+) -> bool:
+    """Refresh batch statuses until all are terminal (or once with wait=False); True when done."""
+    while True:
+        for batch in job["batches"]:
+            if batch.get("status") in TERMINAL_STATUSES:
+                continue
+            status = transport.retrieve(batch["batch_id"])
+            batch.update(
+                status=status.status,
+                output_file_id=status.output_file_id,
+                error_file_id=status.error_file_id,
+            )
+            print(
+                f"[batch] {batch['batch_id']}: {status.status} "
+                f"({status.completed}/{status.total or batch['requests']} done, {status.failed} failed)"
+            )
+        save_job(record_path, job)
+        if all(batch.get("status") in TERMINAL_STATUSES for batch in job["batches"]):
+            return True
+        if not wait:
+            return False
+        time.sleep(poll_seconds)
+
+
+def ingest(
+    job: dict[str, Any],
+    transport: BatchTransport,
+    frames_dir: Path,
+    class_to_id: dict[str, int],
+    cache: ResponseCache | None,
+) -> tuple[int, int]:
+    """Write labels for frames whose requests all succeeded; returns (labeled, incomplete)."""
+    outputs: dict[str, dict[str, str]] = {}
+    for request_id, text in job["cached"].items():
+        frame_name, part = request_id.split(ID_SEPARATOR, 1)
+        outputs.setdefault(frame_name, {})[part] = text
+
+    for batch in job["batches"]:
+        if not batch.get("output_file_id"):
+            continue
+        for line in transport.download(batch["output_file_id"]).splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            frame_name, part = result["custom_id"].split(ID_SEPARATOR, 1)
+            outputs.setdefault(frame_name, {})[part] = response_output_text(response.get("body") or {})
+
+    plan = LabelPlan(**job["plan"])
+    labeled = 0
+    incomplete = 0
+    for frame_name in job["frames"]:
+        frame_path = frames_dir / frame_name
+        if frame_path.with_suffix(".txt").exists() or not frame_path.exists():
+            continue
+        frame_outputs = outputs.get(frame_name, {})
+        try:
+            boxes = boxes_from_outputs(frame_outputs, plan)
+            scale = job.get("scales", {}).get(frame_name)
+            if scale:
+                boxes = [scale_box(box, scale[0], scale[1]) for box in boxes]
+        except (KeyError, PipelineError):
+            # A missing or unparseable part leaves the frame for the next run.
+            incomplete += 1
+            continue
+        write_yolo_labels(frame_path, boxes, class_to_id)
+        labeled += 1
+        if cache is not None:
+            for part, text in frame_outputs.items():
+                key = job["keys"].get(f"{frame_name}{ID_SEPARATOR}{part}")
+                if key:
+                    cache.put(key, text)
+    return labeled, incomplete
+
+
+def make_transport(config: dict[str, Any], output_dir: Path) -> BatchTransport:
+    name = str(config.get("batch_transport", "openai")).strip().lower()
+    if name == "local":
+        return LocalBatchTransport(output_dir / BATCH_DIR_NAME / "local")
+    if name != "openai":
+        raise PipelineError(f"Unsupported batch_transport: {name}")
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise PipelineError("OPENAI_API_KEY is not set.")
+    return OpenAIBatchTransport(OpenAI(api_key=api_key))
+
+
+def resolve_plan(config: dict[str, Any], model: str, output_dir: Path) -> tuple[str, LabelPlan]:
+    classes = [str(c) for c in config.get("classes", [])]
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    if strategy not in LABEL_STRATEGIES:
+        raise PipelineError(f"Unsupported label_strategy: {strategy}")
+    if strategy != "auto" or not classes:
+        return strategy, plan_for_strategy(strategy, classes)
+    # Batches cannot calibrate interactively; reuse run.py's calibration when present.
+    saved = load_auto_calibration(output_dir / "label_strategy.json", model, classes)
+    if saved is None:
+        print("[batch] No auto calibration found; using per-class requests.")
+        return strategy, plan_for_strategy("per_class", classes)
+    threshold = float(config.get("auto_recall_threshold", DEFAULT_RECALL_THRESHOLD))
+    return strategy, plan_for_strategy("auto", classes, weak_classes_from_recall(saved["recall"], threshold))
+
+
+def main() -> int:
+    args = parse_args()
+    config = load_config()
+    model = config.get("model", "gpt-5-nano")
+    classes = config.get("classes", [])
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = output_dir / "frames"
+    batch_dir = output_dir / BATCH_DIR_NAME
+    record_path = output_dir / JOB_RECORD_NAME
+    poll_seconds = float(config.get("batch_poll_seconds", DEFAULT_POLL_SECONDS))
+
+    cache = cache_from_config(config, output_dir)
+    try:
+        transport = make_transport(config, output_dir)
+        job = load_job(record_path)
+        if job is not None:
+            print(f"[batch] Resuming job in {record_path} ({len(job['batches'])} batches)")
+        else:
+            frames = list_frames(frames_dir)
+            if not frames:
+                print("Error: No frames found. Run the collect skill first.", file=sys.stderr)
+                return 1
+            unlabeled = [f for f in frames if not f.with_suffix(".txt").exists()]
+            if not unlabeled:
+                print("[batch] All frames already labeled.")
+                return 0
+            strategy, plan = resolve_plan(config, model, output_dir)
+            fallback_prompt = build_prompt(classes) if not classes else ""
+            encoder = upload_encoder_from_config(config)
+            job = prepare_job(unlabeled, model, strategy, plan, fallback_prompt, batch_dir, cache, encoder)
+            requests = sum(batch["requests"] for batch in job["batches"])
+            print(
+                f"[batch] {len(unlabeled)} frames -> {requests} requests in {len(job['batches'])} batch files "
+                f"({len(job['cached'])} answered from cache)"
+            )
+            print(f"[batch] Uploads: {encoder.summary()}")
+            save_job(record_path, job)
+
+        submit_pending(job, transport, batch_dir, record_path)
+        if job["batches"] and not poll(job, transport, record_path, poll_seconds, wait=not args.no_wait):
+            print(f"[batch] Batches still running; re-run to resume from {record_path}.")
+            return 0
+
+        class_map_path = output_dir / "classes.txt"
+        class_to_id = load_class_map(class_map_path, classes)
+        labeled, incomplete = ingest(job, transport, frames_dir, class_to_id, cache)
+        write_class_map(class_to_id, class_map_path)
+        job["ingested"] = True
+        save_job(record_path, job)
+        for batch in job["batches"]:
+            (batch_dir / batch["input"]).unlink(missing_ok=True)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if cache is not None:
+            print(f"[batch] Response cache: {cache.summary()}")
+            cache.close()
+
+    print(f"[batch] Done. {labeled} frames labeled, {incomplete} left for the next run. Classes: {class_map_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Auto-label confident frames with the previous iteration's YOLO weights.
+
+Runs before the configured labeler when `prelabel: true`. Accepted frames get .txt
+labels, so every label mode skips them; uncertain frames and frames without
+detections stay unlabeled for the VLM. Does nothing until `weights/best.pt` exists.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from label_gemini import MAX_IMAGES_PER_REQUEST
+from run import (
+    DEFAULT_RECALL_THRESHOLD,
+    load_auto_calibration,
+    load_class_map,
+    normalize_class_name,
+    plan_for_strategy,
+    weak_classes_from_recall,
+    write_class_map,
+    write_yolo_labels,
+)
+from shared.manifest import list_frames
+from shared.prelabel import append_report, prelabel_frames, prelabel_settings
+from shared.utils import load_config
+
+
+def calls_per_frame(config: dict[str, Any], output_dir: Path, present: set[str]) -> float:
+    """Labeler requests one frame would have cost in the configured label mode.
+
+    `present` holds the classes prelabel found in the frame. With `presence_gate` they
+    stand in for the presence pass's answer, which decides the per-class calls. Frames
+    sharing a mosaic or a multi-image Gemini request count their share of it.
+    """
+    classes = [str(c) for c in config.get("classes", [])]
+    mode = str(config.get("label_mode", "gpt")).strip().lower()
+    mosaic = max(1, int(config.get("mosaic_frames", 1)))
+    if mode == "gemini":
+        if mosaic > 1:
+            return 1 / mosaic
+        return 1 / min(max(1, int(config.get("gemini_images_per_request", 1))), MAX_IMAGES_PER_REQUEST)
+    if mode == "cua+sam":
+        return max(1, len(classes))
+    if mode == "cascade":
+        # Every frame pays at least the first tier; escalations are not predictable up front.
+        tiers = config.get("cascade_tiers") or [[config.get("model", "")]]
+        first = [tiers[0]] if isinstance(tiers[0], str) else list(tiers[0])
+        strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+        per_model = len(classes) if strategy != "joint" and classes else 1
+        return sum(1 if str(m).lower().startswith("gemini") else per_model for m in first)
+    if mode not in ("gpt", "gpt-batch"):
+        # Codex subagents make no API calls; count the per-frame inspection instead.
+        return 1
+    plan = plan_for_strategy("per_class", [])
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    if strategy == "auto" and classes:
+        saved = load_auto_calibration(output_dir / "label_strategy.json", str(config.get("model", "")), classes)
+        if saved is not None:
+            threshold = float(config.get("auto_recall_threshold", DEFAULT_RECALL_THRESHOLD))
+            plan = plan_for_strategy("auto", classes, weak_classes_from_recall(saved["recall"], threshold))
+        else:
+            plan = plan_for_strategy("joint", classes)
+    elif classes:
+        plan = plan_for_strategy(strategy, classes)
+    calls = float(max(1, plan.requests_per_frame))
+    # The Batch API path sends every planned request; only run.py gates and tiles frames.
+    if mode == "gpt":
+        if plan.per_class and config.get("presence_gate", False):
+            asked = sum(normalize_class_name(c) in present for c in plan.per_class)
+            calls += 1 - len(plan.per_class) + asked
+        calls /= mosaic
+    return calls
+
+
+def main() -> int:
+    config = load_config()
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = output_dir / "frames"
+    weights = output_dir / "weights" / "best.pt"
+    classes = [str(c) for c in config.get("classes", [])]
+
+    if not config.get("prelabel", False):
+        print("[prelabel] Off; set prelabel: true in config.json to enable it.")
+        return 0
+    if not weights.exists():
+        print(f"[prelabel] No trained weights at {weights} yet; skipping.")
+        return 0
+
+    frames = list_frames(frames_dir)
+    unlabeled = [f for f in frames if not f.with_suffix(".txt").exists()]
+    if not unlabeled:
+        print("[prelabel] All frames already labeled.")
+        return 0
+
+    class_map_path = output_dir / "classes.txt"
+    class_to_id = load_class_map(class_map_path, classes)
+    # Only classes the labelers would produce; anything else needs a VLM look.
+    known = set(class_to_id) or set(classes)
+    settings = prelabel_settings(config)
+
+    print(
+        f"[prelabel] Running {weights} on {len(unlabeled)} unlabeled frames "
+        f"(CPU, batch {settings['batch_size']}, confidence >= {settings['confidence']:g})..."
+    )
+    result = prelabel_frames(weights, unlabeled, known, **settings)
+    for frame_path, boxes in result.accepted.items():
+        write_yolo_labels(frame_path, boxes, class_to_id)
+    if result.accepted:
+        write_class_map(class_to_id, class_map_path)
+
+    calls_saved = sum(
+        calls_per_frame(config, output_dir, {box.class_name for box in boxes}) for boxes in result.accepted.values()
+    )
+    entry = append_report(output_dir, weights, result, calls_saved)
+    print(
+        f"[prelabel] Iteration {entry['iteration']}: auto-labeled {entry['auto_labeled']}/{entry['frames']} "
+        f"({entry['auto_labeled_share']:.0%}); {entry['uncertain']} uncertain, "
+        f"{entry['no_detections']} without detections left for the labeler"
+    )
+    print(f"[prelabel] API calls saved: {entry['api_calls_saved']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
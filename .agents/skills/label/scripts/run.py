@@ -1,23 +1,80 @@
 #!/usr/bin/env python3
-"""Label skill (single-agent mode): label frames sequentially with class-wise GPT vision calls."""
+"""Label skill (single-agent mode): label frames with GPT vision calls.
+
+Frames are labeled sequentially by default. Set `max_in_flight` > 1 in config.json
+to label concurrently with AsyncOpenAI and a bounded worker pool; `hedge: true`
+then also re-issues calls that run past the rolling p95 latency (shared/hedge.py).
+
+`propagate: true` sends only keyframes to the model and carries their boxes to the
+following frames by template matching (shared/tracking.py), re-querying when
+tracking confidence drops or the scene changes. Propagation is sequential, so it
+ignores `max_in_flight`.
+
+Each frame is retried under the shared retry policy (shared/retry.py); frames that
+exhaust their budget are recorded in `<output_dir>/dead_letter.json` and skipped,
+and the next run retries them.
+
+`label_strategy` picks how configured classes are requested:
+- `per_class` (default): one request per class per frame.
+- `joint`: one request per frame with a class-enum schema over all classes.
+- `auto`: joint, plus per-class requests only for classes whose joint-mode recall
+  (measured against per-class on a few calibration frames) is below threshold.
+With `presence_gate: true`, a low-detail presence request per frame decides which
+of the per-class requests are sent at all (shared/presence.py).
+
+`mosaic_frames: K` (K > 1) packs K frames into one grid image per request and splits
+the returned boxes back to their frames, dropping boxes that cross a tile seam
+(shared/mosaic.py). Propagation takes precedence over mosaics.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import copy
+import json
 import os
 import sys
 import subprocess
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import Any
 
 # Ensure repo root is importable
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
+from shared.cache import ResponseCache, cache_from_config, cache_key
+from shared.geometry import count_matches
+from shared.hedge import Hedger, hedger_from_config
+from shared.manifest import list_frames
+from shared.mosaic import Mosaic, MosaicSettings, MosaicStats, group_frames, mosaic_settings_from_config
+from shared.presence import (
+    PresenceGate,
+    build_presence_prompt,
+    build_presence_schema,
+    encode_lowres_base64,
+    parse_present,
+    presence_gate_from_config,
+)
+from shared.ratelimit import (
+    RateLimiter,
+    estimate_image_tokens,
+    estimate_request_tokens,
+    limiter_from_config,
+)
+from shared.retry import DEAD_LETTER_NAME, DeadLetter, FatalAPIError, RetryPolicy, retry_policy_from_config
+from shared.tracking import (
+    DEFAULT_MAX_DIFF,
+    DEFAULT_MAX_GAP,
+    DEFAULT_MIN_CONFIDENCE,
+    BoxPropagator,
+)
+from shared.upload import UploadEncoder, encode_for_upload, upload_encoder_from_config
 from shared.utils import (
     BoundingBox,
     PipelineError,
     clamp,
-    encode_image_base64,
     extract_json_from_text,
     load_config,
     read_image_dimensions,
@@ -41,6 +98,19 @@ Rules:
 - x,y is top-left corner.
 """.strip()
 
+JOINT_PROMPT_TEMPLATE = """
+Detect every object of these classes in this image and return bounding boxes: {class_list}.
+Rules:
+- class_name must be one of: {class_list}. Ignore objects of any other class.
+- Return one entry per object instance. If none are visible, return an empty list.
+- x,y,width,height must be pixel values in the original image.
+- x,y is top-left corner.
+""".strip()
+
+LABEL_STRATEGIES = ("per_class", "joint", "auto")
+DEFAULT_RECALL_THRESHOLD = 0.8
+DEFAULT_CALIBRATION_FRAMES = 5
+
 # Structured output schema — the API enforces this, no more JSON parsing failures
 RESPONSE_SCHEMA = {
     "type": "json_schema",
@@ -83,27 +153,82 @@ def build_single_class_prompt(class_name: str) -> str:
     return SINGLE_CLASS_PROMPT_TEMPLATE.format(class_name=class_name)
 
 
-def detect_objects(client: OpenAI, model: str, frame_path: Path, prompt: str) -> list[BoundingBox]:
-    image_b64 = encode_image_base64(frame_path)
+def normalize_class_name(class_name: str) -> str:
+    return str(class_name).strip().lower().replace(" ", "_")
+
+
+def build_joint_prompt(classes: list[str]) -> str:
+    return JOINT_PROMPT_TEMPLATE.format(class_list=", ".join(normalize_class_name(c) for c in classes))
+
+
+def build_joint_schema(classes: list[str]) -> dict[str, Any]:
+    """RESPONSE_SCHEMA with class_name restricted to the given classes."""
+    schema = copy.deepcopy(RESPONSE_SCHEMA)
+    item = schema["schema"]["properties"]["objects"]["items"]
+    item["properties"]["class_name"] = {
+        "type": "string",
+        "enum": [normalize_class_name(c) for c in classes],
+    }
+    return schema
+
+
+@dataclass
+class LabelPlan:
+    """Which configured classes share one joint request per frame and which get their own."""
 
-    response = client.responses.create(
-        model=model,
-        input=[
+    joint: list[str] = field(default_factory=list)
+    per_class: list[str] = field(default_factory=list)
+    note: str = ""  # appended to every labeling prompt, e.g. the mosaic layout
+
+    @property
+    def requests_per_frame(self) -> int:
+        return (1 if self.joint else 0) + len(self.per_class)
+
+
+def plan_for_strategy(strategy: str, classes: list[str], weak_classes: list[str] | None = None) -> LabelPlan:
+    classes = [str(c) for c in classes]
+    if strategy == "joint":
+        return LabelPlan(joint=classes)
+    if strategy == "auto":
+        weak = {normalize_class_name(c) for c in weak_classes or []}
+        return LabelPlan(
+            joint=classes,
+            per_class=[c for c in classes if normalize_class_name(c) in weak],
+        )
+    return LabelPlan(per_class=classes)
+
+
+def with_note(prompt: str, note: str) -> str:
+    return f"{prompt}\n{note}" if note else prompt
+
+
+def build_request(
+    model: str,
+    prompt: str,
+    image_b64: str,
+    schema: dict[str, Any] = RESPONSE_SCHEMA,
+    detail: str | None = None,
+) -> dict[str, Any]:
+    image: dict[str, Any] = {"type": "input_image", "image_url": f"data:image/jpeg;base64,{image_b64}"}
+    if detail is not None:
+        image["detail"] = detail
+    return {
+        "model": model,
+        "input": [
             {
                 "role": "user",
                 "content": [
                     {"type": "input_text", "text": prompt},
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{image_b64}",
-                    },
+                    image,
                 ],
             }
         ],
-        text={"format": RESPONSE_SCHEMA},
-    )
+        "text": {"format": schema},
+    }
+
 
-    payload = extract_json_from_text(response.output_text)
+def parse_boxes(output_text: str) -> list[BoundingBox]:
+    payload = extract_json_from_text(output_text)
     objects = payload.get("objects", [])
 
     boxes: list[BoundingBox] = []
@@ -125,15 +250,8 @@ def detect_objects(client: OpenAI, model: str, frame_path: Path, prompt: str) ->
     return boxes
 
 
-def detect_objects_for_class(
-    client: OpenAI,
-    model: str,
-    frame_path: Path,
-    class_name: str,
-) -> list[BoundingBox]:
-    prompt = build_single_class_prompt(class_name)
-    boxes = detect_objects(client, model, frame_path, prompt)
-    normalized_name = class_name.strip().lower().replace(" ", "_")
+def assign_class(boxes: list[BoundingBox], class_name: str) -> list[BoundingBox]:
+    normalized_name = normalize_class_name(class_name)
     return [
         BoundingBox(
             class_name=normalized_name,
@@ -146,6 +264,629 @@ def detect_objects_for_class(
     ]
 
 
+@dataclass
+class RequestOptions:
+    """Cross-cutting plumbing applied to every labeling request."""
+
+    limiter: RateLimiter | None = None
+    cache: ResponseCache | None = None
+    retry: RetryPolicy | None = None
+    dead_letter: DeadLetter | None = None
+    hedger: Hedger | None = None
+    gate: PresenceGate | None = None
+    upload: UploadEncoder | None = None
+
+
+def _cache_if_parseable(cache: ResponseCache | None, key: str, output_text: str) -> None:
+    # Never pin a malformed response: it would fail the same frame on every re-run.
+    if cache is None:
+        return
+    try:
+        extract_json_from_text(output_text)
+    except PipelineError:
+        return
+    cache.put(key, output_text)
+
+
+def request_output_text(
+    client: OpenAI,
+    request: dict[str, Any],
+    options: RequestOptions | None,
+    tokens: int,
+) -> str:
+    options = options or RequestOptions()
+    key = cache_key(request) if options.cache is not None else ""
+    if options.cache is not None:
+        cached = options.cache.get(key)
+        if cached is not None:
+            return cached
+
+    if options.limiter is None:
+        output_text = client.responses.create(**request).output_text
+    else:
+        limiter = options.limiter
+        raw = limiter.call(lambda: client.responses.with_raw_response.create(**request), tokens)
+        limiter.update_from_headers(raw.headers)
+        output_text = raw.parse().output_text
+
+    _cache_if_parseable(options.cache, key, output_text)
+    return output_text
+
+
+async def request_output_text_async(
+    client: AsyncOpenAI,
+    request: dict[str, Any],
+    options: RequestOptions | None,
+    tokens: int,
+    semaphore: asyncio.Semaphore | None = None,
+) -> str:
+    """`semaphore` is the in-flight bound the caller holds a slot of; hedges need one of their own."""
+    options = options or RequestOptions()
+    key = cache_key(request) if options.cache is not None else ""
+    if options.cache is not None:
+        cached = options.cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def send() -> str:
+        if options.limiter is None:
+            return (await client.responses.create(**request)).output_text
+        limiter = options.limiter
+        raw = await limiter.call_async(lambda: client.responses.with_raw_response.create(**request), tokens)
+        limiter.update_from_headers(raw.headers)
+        return raw.parse().output_text
+
+    # A hedge is a second real request, so it draws from the rate limiter like any other.
+    output_text = await (options.hedger.call(send, semaphore) if options.hedger is not None else send())
+
+    _cache_if_parseable(options.cache, key, output_text)
+    return output_text
+
+
+def detect_objects(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    prompt: str,
+    options: RequestOptions | None = None,
+    schema: dict[str, Any] = RESPONSE_SCHEMA,
+) -> list[BoundingBox]:
+    image = encode_for_upload(frame_path, options.upload if options is not None else None)
+    tokens = 0
+    if options is not None and options.limiter is not None:
+        tokens = estimate_request_tokens(prompt, estimate_image_tokens(image.width, image.height))
+    request = build_request(model, prompt, image.b64, schema)
+    return [image.to_original(box) for box in parse_boxes(request_output_text(client, request, options, tokens))]
+
+
+def detect_objects_for_class(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    class_name: str,
+    options: RequestOptions | None = None,
+    note: str = "",
+) -> list[BoundingBox]:
+    prompt = with_note(build_single_class_prompt(class_name), note)
+    return assign_class(detect_objects(client, model, frame_path, prompt, options), class_name)
+
+
+def detect_objects_joint(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    classes: list[str],
+    options: RequestOptions | None = None,
+    note: str = "",
+) -> list[BoundingBox]:
+    """One request for all `classes`; boxes outside the class enum are dropped."""
+    allowed = {normalize_class_name(c) for c in classes}
+    prompt = with_note(build_joint_prompt(classes), note)
+    boxes = detect_objects(client, model, frame_path, prompt, options, build_joint_schema(classes))
+    return [box for box in boxes if box.class_name in allowed]
+
+
+def build_presence_request(
+    model: str, frame_path: Path, classes: list[str], gate: PresenceGate, limited: bool
+) -> tuple[dict[str, Any], int]:
+    """Low-detail presence request for `classes` and its token estimate (0 when not rate limited)."""
+    prompt = build_presence_prompt(classes)
+    image_b64, _ = encode_lowres_base64(frame_path, gate.long_side, gate.quality)
+    tokens = estimate_request_tokens(prompt, estimate_image_tokens(0, 0, "low")) if limited else 0
+    return build_request(model, prompt, image_b64, build_presence_schema(classes), detail="low"), tokens
+
+
+def detect_present_classes(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    classes: list[str],
+    options: RequestOptions,
+) -> list[str]:
+    """The subset of `classes` the presence pass sees in the frame."""
+    assert options.gate is not None
+    request, tokens = build_presence_request(model, frame_path, classes, options.gate, options.limiter is not None)
+    present = parse_present(request_output_text(client, request, options, tokens), classes)
+    options.gate.record(frame_path.name, len(classes), len(present))
+    return present
+
+
+def label_frame(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    options: RequestOptions | None = None,
+) -> list[BoundingBox]:
+    if not plan.joint and not plan.per_class:
+        return detect_objects(client, model, frame_path, with_note(fallback_prompt, plan.note), options)
+
+    boxes: list[BoundingBox] = []
+    if plan.joint:
+        # Classes that also get a per-class call take their boxes from that call only.
+        covered = {normalize_class_name(c) for c in plan.per_class}
+        joint_boxes = detect_objects_joint(client, model, frame_path, plan.joint, options, plan.note)
+        boxes.extend(box for box in joint_boxes if box.class_name not in covered)
+    per_class = plan.per_class
+    if options is not None and options.gate is not None and per_class:
+        per_class = detect_present_classes(client, model, frame_path, per_class, options)
+    for class_name in per_class:
+        boxes.extend(detect_objects_for_class(client, model, frame_path, class_name, options, plan.note))
+    return boxes
+
+
+def _dead_letter_frame(options: RequestOptions, frame_path: Path, exc: Exception) -> None:
+    if options.dead_letter is None:
+        raise exc
+    attempts = options.retry.attempts if options.retry is not None else 1
+    options.dead_letter.add(frame_path.name, exc, attempts)
+    print(f"  ! {frame_path.name}: failed after {attempts} attempts ({exc}); added to dead letter", file=sys.stderr)
+
+
+def label_frame_isolated(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    options: RequestOptions | None = None,
+) -> list[BoundingBox] | None:
+    """`label_frame` under the retry policy; returns None once the frame is dead-lettered.
+
+    Responses that parsed are cached, so a retry only re-sends the requests that failed.
+    """
+    options = options or RequestOptions()
+    if options.retry is None:
+        return label_frame(client, model, frame_path, plan, fallback_prompt, options)
+    try:
+        boxes = options.retry.run(
+            lambda: label_frame(client, model, frame_path, plan, fallback_prompt, options)
+        )
+    except FatalAPIError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        _dead_letter_frame(options, frame_path, exc)
+        return None
+    if options.dead_letter is not None:
+        options.dead_letter.discard(frame_path.name)
+    return boxes
+
+
+def label_mosaic(
+    client: OpenAI,
+    model: str,
+    mosaic: Mosaic,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    options: RequestOptions | None = None,
+) -> tuple[dict[Path, list[BoundingBox]], int]:
+    """Label a mosaic as one frame; returns each member frame's boxes and the seam-dropped count."""
+    boxes = label_frame(client, model, mosaic.path, replace(plan, note=mosaic.note), fallback_prompt, options)
+    return mosaic.split(boxes)
+
+
+def label_mosaic_isolated(
+    client: OpenAI,
+    model: str,
+    mosaic: Mosaic,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    options: RequestOptions | None = None,
+) -> tuple[dict[Path, list[BoundingBox]], int] | None:
+    """`label_mosaic` under the retry policy; a failed mosaic dead-letters each of its frames."""
+    options = options or RequestOptions()
+    if options.retry is None:
+        return label_mosaic(client, model, mosaic, plan, fallback_prompt, options)
+    try:
+        result = options.retry.run(lambda: label_mosaic(client, model, mosaic, plan, fallback_prompt, options))
+    except FatalAPIError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        for frame_path in mosaic.frames:
+            _dead_letter_frame(options, frame_path, exc)
+        return None
+    if options.dead_letter is not None:
+        for frame_path in mosaic.frames:
+            options.dead_letter.discard(frame_path.name)
+    return result
+
+
+def write_mosaic_labels(
+    mosaic: Mosaic,
+    result: tuple[dict[Path, list[BoundingBox]], int],
+    class_to_id: dict[str, int],
+    stats: MosaicStats,
+) -> None:
+    per_frame, dropped = result
+    for frame_path, boxes in per_frame.items():
+        write_yolo_labels(frame_path, boxes, class_to_id)
+    kept = sum(len(boxes) for boxes in per_frame.values())
+    stats.record(mosaic, kept, dropped)
+    seams = f", {dropped} seam-crossing dropped" if dropped else ""
+    print(f"  - Mosaic {stats.mosaics}: {', '.join(f.name for f in mosaic.frames)} ({kept} boxes{seams})")
+
+
+def label_frames_mosaic(
+    client: OpenAI,
+    model: str,
+    frames: list[Path],
+    plan: LabelPlan,
+    fallback_prompt: str,
+    class_to_id: dict[str, int],
+    settings: MosaicSettings,
+    stats: MosaicStats,
+    options: RequestOptions | None = None,
+) -> None:
+    """Label frames `settings.frames` at a time, one composite image per group."""
+    for group in group_frames(frames, settings.frames):
+        mosaic = settings.build(group)
+        try:
+            result = label_mosaic_isolated(client, model, mosaic, plan, fallback_prompt, options)
+        finally:
+            mosaic.path.unlink(missing_ok=True)
+        if result is not None:
+            write_mosaic_labels(mosaic, result, class_to_id, stats)
+
+
+def calibrate_auto_strategy(
+    client: OpenAI,
+    model: str,
+    frames: list[Path],
+    classes: list[str],
+    options: RequestOptions | None = None,
+) -> tuple[dict[str, float | None], dict[Path, list[BoundingBox]]]:
+    """Measure per-class recall of joint mode, using per-class mode as the reference.
+
+    Returns the recall per class (None if the class never appeared in the sample)
+    and the per-class reference boxes for each calibration frame, so those frames
+    can be written out instead of labeled a second time.
+    """
+    # The per-class reference must not be gated, or missed classes would inflate joint recall.
+    options = replace(options, gate=None) if options is not None else None
+    reference_total: dict[str, int] = {normalize_class_name(c): 0 for c in classes}
+    matched_total: dict[str, int] = dict.fromkeys(reference_total, 0)
+    reference_boxes: dict[Path, list[BoundingBox]] = {}
+
+    for frame_path in frames:
+        reference = label_frame(client, model, frame_path, plan_for_strategy("per_class", classes), "", options)
+        joint = detect_objects_joint(client, model, frame_path, classes, options)
+        reference_boxes[frame_path] = reference
+        for class_name in reference_total:
+            ref = [b for b in reference if b.class_name == class_name]
+            reference_total[class_name] += len(ref)
+            matched_total[class_name] += count_matches(ref, joint)
+
+    recall = {
+        name: (matched_total[name] / total if total else None)
+        for name, total in reference_total.items()
+    }
+    return recall, reference_boxes
+
+
+def load_auto_calibration(path: Path, model: str, classes: list[str]) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+    if data.get("model") != model or data.get("classes") != [normalize_class_name(c) for c in classes]:
+        return None
+    return data
+
+
+def weak_classes_from_recall(recall: dict[str, float | None], threshold: float) -> list[str]:
+    # Classes absent from the calibration sample have no evidence against joint mode.
+    return [name for name, value in recall.items() if value is not None and value < threshold]
+
+
+async def detect_objects_async(
+    client: AsyncOpenAI,
+    model: str,
+    image_b64: str,
+    prompt: str,
+    semaphore: asyncio.Semaphore,
+    options: RequestOptions | None = None,
+    image_tokens: int = 0,
+    schema: dict[str, Any] = RESPONSE_SCHEMA,
+) -> list[BoundingBox]:
+    tokens = estimate_request_tokens(prompt, image_tokens)
+    async with semaphore:
+        output_text = await request_output_text_async(
+            client, build_request(model, prompt, image_b64, schema), options, tokens, semaphore
+        )
+    return parse_boxes(output_text)
+
+
+async def detect_present_classes_async(
+    client: AsyncOpenAI,
+    model: str,
+    frame_path: Path,
+    classes: list[str],
+    semaphore: asyncio.Semaphore,
+    options: RequestOptions,
+) -> list[str]:
+    assert options.gate is not None
+    request, tokens = build_presence_request(model, frame_path, classes, options.gate, options.limiter is not None)
+    async with semaphore:
+        output_text = await request_output_text_async(client, request, options, tokens, semaphore)
+    present = parse_present(output_text, classes)
+    options.gate.record(frame_path.name, len(classes), len(present))
+    return present
+
+
+async def label_frame_async(
+    client: AsyncOpenAI,
+    model: str,
+    frame_path: Path,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    semaphore: asyncio.Semaphore,
+    options: RequestOptions | None = None,
+) -> list[BoundingBox]:
+    """Label one frame; its requests run concurrently but share the in-flight budget."""
+    image = encode_for_upload(frame_path, options.upload if options is not None else None)
+    image_b64 = image.b64
+    image_tokens = 0
+    if options is not None and options.limiter is not None:
+        image_tokens = estimate_image_tokens(image.width, image.height)
+    if not plan.joint and not plan.per_class:
+        boxes = await detect_objects_async(
+            client, model, image_b64, with_note(fallback_prompt, plan.note), semaphore, options, image_tokens
+        )
+        return [image.to_original(box) for box in boxes]
+
+    per_class = plan.per_class
+    if options is not None and options.gate is not None and per_class:
+        # Awaited first: the per-class calls it rules out are never sent.
+        per_class = await detect_present_classes_async(client, model, frame_path, per_class, semaphore, options)
+    calls = [
+        detect_objects_async(
+            client,
+            model,
+            image_b64,
+            with_note(build_single_class_prompt(c), plan.note),
+            semaphore,
+            options,
+            image_tokens,
+        )
+        for c in per_class
+    ]
+    if plan.joint:
+        calls.append(
+            detect_objects_async(
+                client,
+                model,
+                image_b64,
+                with_note(build_joint_prompt(plan.joint), plan.note),
+                semaphore,
+                options,
+                image_tokens,
+                build_joint_schema(plan.joint),
+            )
+        )
+    results = await asyncio.gather(*calls)
+
+    boxes: list[BoundingBox] = []
+    for class_name, class_boxes in zip(per_class, results):
+        boxes.extend(assign_class(class_boxes, class_name))
+    if plan.joint:
+        allowed = {normalize_class_name(c) for c in plan.joint}
+        allowed -= {normalize_class_name(c) for c in plan.per_class}
+        boxes.extend(box for box in results[-1] if box.class_name in allowed)
+    return [image.to_original(box) for box in boxes]
+
+
+async def label_frame_isolated_async(
+    client: AsyncOpenAI,
+    model: str,
+    frame_path: Path,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    semaphore: asyncio.Semaphore,
+    options: RequestOptions | None = None,
+) -> list[BoundingBox] | None:
+    options = options or RequestOptions()
+    if options.retry is None:
+        return await label_frame_async(client, model, frame_path, plan, fallback_prompt, semaphore, options)
+    try:
+        boxes = await options.retry.run_async(
+            lambda: label_frame_async(client, model, frame_path, plan, fallback_prompt, semaphore, options)
+        )
+    except FatalAPIError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        _dead_letter_frame(options, frame_path, exc)
+        return None
+    if options.dead_letter is not None:
+        options.dead_letter.discard(frame_path.name)
+    return boxes
+
+
+async def label_frames_async(
+    api_key: str,
+    model: str,
+    frames: list[Path],
+    plan: LabelPlan,
+    fallback_prompt: str,
+    class_to_id: dict[str, int],
+    max_in_flight: int,
+    options: RequestOptions | None = None,
+) -> int:
+    """Label frames with a bounded worker pool, writing each frame's labels as soon as it completes.
+
+    At most `max_in_flight` API requests are outstanding at any time. Label files are
+    written from the event loop thread, so `class_to_id` needs no extra locking.
+    """
+    queue: asyncio.Queue[Path] = asyncio.Queue()
+    for frame_path in frames:
+        queue.put_nowait(frame_path)
+
+    semaphore = asyncio.Semaphore(max_in_flight)
+    done = 0
+
+    async with AsyncOpenAI(api_key=api_key) as client:
+
+        async def worker() -> None:
+            nonlocal done
+            while True:
+                try:
+                    frame_path = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                boxes = await label_frame_isolated_async(
+                    client, model, frame_path, plan, fallback_prompt, semaphore, options
+                )
+                if boxes is None:
+                    continue
+                write_yolo_labels(frame_path, boxes, class_to_id)
+                done += 1
+                print(f"  - Frame {done}/{len(frames)}: {frame_path.name} ({len(boxes)} boxes)")
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(max_in_flight, len(frames)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    return done
+
+
+async def label_mosaic_isolated_async(
+    client: AsyncOpenAI,
+    model: str,
+    mosaic: Mosaic,
+    plan: LabelPlan,
+    fallback_prompt: str,
+    semaphore: asyncio.Semaphore,
+    options: RequestOptions | None = None,
+) -> tuple[dict[Path, list[BoundingBox]], int] | None:
+    options = options or RequestOptions()
+    mosaic_plan = replace(plan, note=mosaic.note)
+
+    async def attempt() -> tuple[dict[Path, list[BoundingBox]], int]:
+        boxes = await label_frame_async(client, model, mosaic.path, mosaic_plan, fallback_prompt, semaphore, options)
+        return mosaic.split(boxes)
+
+    if options.retry is None:
+        return await attempt()
+    try:
+        result = await options.retry.run_async(attempt)
+    except FatalAPIError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        for frame_path in mosaic.frames:
+            _dead_letter_frame(options, frame_path, exc)
+        return None
+    if options.dead_letter is not None:
+        for frame_path in mosaic.frames:
+            options.dead_letter.discard(frame_path.name)
+    return result
+
+
+async def label_frames_mosaic_async(
+    api_key: str,
+    model: str,
+    frames: list[Path],
+    plan: LabelPlan,
+    fallback_prompt: str,
+    class_to_id: dict[str, int],
+    max_in_flight: int,
+    settings: MosaicSettings,
+    stats: MosaicStats,
+    options: RequestOptions | None = None,
+) -> None:
+    """`label_frames_mosaic` with a bounded worker pool, as in `label_frames_async`."""
+    queue: asyncio.Queue[list[Path]] = asyncio.Queue()
+    groups = group_frames(frames, settings.frames)
+    for group in groups:
+        queue.put_nowait(group)
+    semaphore = asyncio.Semaphore(max_in_flight)
+
+    async with AsyncOpenAI(api_key=api_key) as client:
+
+        async def worker() -> None:
+            while True:
+                try:
+                    group = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                mosaic = settings.build(group)
+                try:
+                    result = await label_mosaic_isolated_async(
+                        client, model, mosaic, plan, fallback_prompt, semaphore, options
+                    )
+                finally:
+                    mosaic.path.unlink(missing_ok=True)
+                if result is not None:
+                    write_mosaic_labels(mosaic, result, class_to_id, stats)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(max_in_flight, len(groups)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+
+def label_frames_propagated(
+    client: OpenAI,
+    model: str,
+    frames: list[Path],
+    plan: LabelPlan,
+    fallback_prompt: str,
+    class_to_id: dict[str, int],
+    propagator: BoxPropagator,
+    options: RequestOptions | None = None,
+    all_frames: list[Path] | None = None,
+) -> None:
+    """Query the model on keyframes only and track their boxes into the frames in between.
+
+    `all_frames` is the full frame sequence `frames` was filtered from; tracking restarts
+    wherever `frames` skips over one of them, e.g. a frame labeled in an earlier run.
+    """
+    position = {frame_path: index for index, frame_path in enumerate(all_frames or frames)}
+    previous = None
+    for idx, frame_path in enumerate(frames, start=1):
+        current = position.get(frame_path)
+        if previous is None or current is None or current != previous + 1:
+            propagator.reset()
+        previous = current
+        boxes = propagator.propagate(frame_path)
+        source = "tracked"
+        if boxes is None:
+            boxes = label_frame_isolated(client, model, frame_path, plan, fallback_prompt, options)
+            if boxes is None:
+                propagator.reset()
+                continue
+            propagator.set_keyframe(boxes)
+            source = "keyframe"
+        print(f"  - Frame {idx}/{len(frames)}: {frame_path.name} ({source}, {len(boxes)} boxes)")
+        write_yolo_labels(frame_path, boxes, class_to_id)
+
+
 def to_yolo_line(box: BoundingBox, class_id: int, img_w: int, img_h: int) -> str:
     x = clamp(box.x, 0.0, float(img_w))
     y = clamp(box.y, 0.0, float(img_h))
@@ -178,11 +919,134 @@ def write_yolo_labels(
     label_path.write_text("\n".join(lines), encoding="utf-8")
 
 
+def load_class_map(class_map_path: Path, classes: list[str]) -> dict[str, int]:
+    """Existing classes.txt ids, else ids in configured class order."""
+    class_to_id: dict[str, int] = {}
+    if class_map_path.exists():
+        for idx, name in enumerate(class_map_path.read_text().strip().split("\n")):
+            if name:
+                class_to_id[name] = idx
+    elif classes:
+        for class_name in classes:
+            normalized = str(class_name).strip().lower().replace(" ", "_")
+            if normalized and normalized not in class_to_id:
+                class_to_id[normalized] = len(class_to_id)
+    return class_to_id
+
+
 def write_class_map(class_to_id: dict[str, int], output_path: Path) -> None:
     names = [name for name, _ in sorted(class_to_id.items(), key=lambda item: item[1])]
     output_path.write_text("\n".join(names), encoding="utf-8")
 
 
+def _maybe_generate_previews(output_dir: Path) -> None:
+    frames_dir = output_dir / "frames"
+    classes_path = output_dir / "classes.txt"
+    if not frames_dir.exists() or not classes_path.exists():
+        return
+
+    preview_dir = frames_dir / "preview"
+    video_out = preview_dir / "preview.mp4"
+
+    cmd = [
+        "uv",
+        "run",
+        ".agents/skills/eval/scripts/preview_labels.py",
+        str(frames_dir),
+        "--classes",
+        str(classes_path),
+        "--out-dir",
+        str(preview_dir),
+        "--limit",
+        "0",
+        "--video-out",
+        str(video_out),
+    ]
+
+    try:
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as exc:
+        print(f"[label] Warning: preview generation failed ({exc})", file=sys.stderr)
+
+
+def print_request_stats(options: RequestOptions) -> None:
+    if options.limiter is not None and options.limiter.throttled:
+        print(f"[label] Rate limiter paused {options.limiter.throttled} times for 429s/retry-after.")
+    if options.cache is not None:
+        print(f"[label] Response cache: {options.cache.summary()}")
+    if options.hedger is not None:
+        print(f"[label] Request latency: {options.hedger.summary()}")
+    if options.gate is not None:
+        print(f"[label] Presence gate: {options.gate.summary()}")
+    if options.upload is not None and options.upload.uploads:
+        print(f"[label] Uploads: {options.upload.summary()}")
+    if options.retry is not None and options.retry.retries:
+        breaker = options.retry.breaker
+        opened = f", circuit breaker opened {breaker.opened} times" if breaker is not None and breaker.opened else ""
+        print(f"[label] Retried frames {options.retry.retries} times{opened}.")
+    if options.dead_letter is not None and options.dead_letter.added:
+        print(
+            f"[label] {options.dead_letter.added} frames failed and were added to "
+            f"{options.dead_letter.path}; re-run to retry them."
+        )
+
+
+def resolve_label_plan(
+    client: OpenAI,
+    model: str,
+    config: dict[str, Any],
+    strategy: str,
+    unlabeled: list[Path],
+    output_dir: Path,
+    class_to_id: dict[str, int],
+    options: RequestOptions | None = None,
+) -> tuple[LabelPlan, list[Path]]:
+    """Build the request plan; for `auto`, calibrate first (or reuse a saved calibration).
+
+    Calibration frames are labeled with per-class results while measuring recall,
+    so they are written here and dropped from the returned frame list.
+    """
+    classes = [str(c) for c in config.get("classes", [])]
+    if strategy != "auto" or not classes:
+        return plan_for_strategy(strategy, classes), unlabeled
+
+    threshold = float(config.get("auto_recall_threshold", DEFAULT_RECALL_THRESHOLD))
+    calibration_path = output_dir / "label_strategy.json"
+    saved = load_auto_calibration(calibration_path, model, classes)
+    if saved is not None:
+        weak = weak_classes_from_recall(saved["recall"], threshold)
+        print(f"[label] Using saved auto calibration ({calibration_path}); per-class: {weak or 'none'}")
+        return plan_for_strategy("auto", classes, weak), unlabeled
+
+    sample_size = max(1, int(config.get("auto_calibration_frames", DEFAULT_CALIBRATION_FRAMES)))
+    step = max(1, len(unlabeled) // sample_size)
+    sample = unlabeled[::step][:sample_size]
+    print(f"[label] Calibrating auto strategy on {len(sample)} frames...")
+    recall, reference = calibrate_auto_strategy(client, model, sample, classes, options)
+    for frame_path, boxes in reference.items():
+        write_yolo_labels(frame_path, boxes, class_to_id)
+
+    weak = weak_classes_from_recall(recall, threshold)
+    calibration_path.write_text(
+        json.dumps(
+            {
+                "model": model,
+                "classes": [normalize_class_name(c) for c in classes],
+                "frames": len(sample),
+                "recall": recall,
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    for name, value in recall.items():
+        shown = "n/a (not seen)" if value is None else f"{value:.2f}"
+        print(f"  - {name}: joint recall {shown}")
+    print(f"[label] Per-class requests kept for: {', '.join(weak) or 'none'}")
+    sampled = set(sample)
+    return plan_for_strategy("auto", classes, weak), [f for f in unlabeled if f not in sampled]
+
+
 def main() -> int:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -195,7 +1059,7 @@ def main() -> int:
     output_dir = Path(config.get("output_dir", "output"))
     frames_dir = output_dir / "frames"
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     if not frames:
         print("Error: No frames found. Run the collect skill first.", file=sys.stderr)
         return 1
@@ -206,72 +1070,109 @@ def main() -> int:
         print("[label] All frames already labeled.")
         return 0
 
-    client = OpenAI(api_key=api_key)
     fallback_prompt = build_prompt(classes) if not classes else ""
-    class_to_id: dict[str, int] = {}
-
-    # Load existing class map if present
     class_map_path = output_dir / "classes.txt"
-    if class_map_path.exists():
-        for idx, name in enumerate(class_map_path.read_text().strip().split("\n")):
-            if name:
-                class_to_id[name] = idx
-    elif classes:
-        for class_name in classes:
-            normalized = str(class_name).strip().lower().replace(" ", "_")
-            if normalized and normalized not in class_to_id:
-                class_to_id[normalized] = len(class_to_id)
+    class_to_id = load_class_map(class_map_path, classes)
 
-    print(f"[label] Labeling {len(unlabeled)} frames with {model}...")
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    if strategy not in LABEL_STRATEGIES:
+        print(f"Error: Unsupported label_strategy: {strategy}", file=sys.stderr)
+        return 1
+
+    client = OpenAI(api_key=api_key)
+    options = RequestOptions(
+        limiter=limiter_from_config(config, model),
+        cache=cache_from_config(config, output_dir),
+        retry=retry_policy_from_config(config),
+        dead_letter=DeadLetter(output_dir / DEAD_LETTER_NAME),
+        gate=presence_gate_from_config(config),
+    )
+    max_in_flight = max(1, int(config.get("max_in_flight", 1)))
+    mosaic = mosaic_settings_from_config(config, output_dir)
+    mosaic_stats = MosaicStats()
+    if max_in_flight > 1:
+        # Hedging cancels the losing call, which only the async client can do.
+        options.hedger = hedger_from_config(config)
     try:
-        for idx, frame_path in enumerate(unlabeled, start=1):
-            print(f"  - Frame {idx}/{len(unlabeled)}: {frame_path.name}")
-            if classes:
-                boxes: list[BoundingBox] = []
-                for class_name in classes:
-                    boxes.extend(detect_objects_for_class(client, model, frame_path, str(class_name)))
+        options.upload = upload_encoder_from_config(config)
+        plan, remaining = resolve_label_plan(
+            client, model, config, strategy, unlabeled, output_dir, class_to_id, options
+        )
+        if classes:
+            print(f"[label] Strategy '{strategy}': {plan.requests_per_frame} requests per frame.")
+        propagate = bool(config.get("propagate", False))
+        suffix = f" ({max_in_flight} requests in flight)" if max_in_flight > 1 and not propagate else ""
+        print(f"[label] Labeling {len(remaining)} frames with {model}{suffix}...")
+        if propagate:
+            propagator = BoxPropagator(
+                min_confidence=float(config.get("propagate_min_confidence", DEFAULT_MIN_CONFIDENCE)),
+                max_diff=float(config.get("propagate_max_diff", DEFAULT_MAX_DIFF)),
+                max_gap=int(config.get("propagate_max_gap", DEFAULT_MAX_GAP)),
+            )
+            label_frames_propagated(
+                client, model, remaining, plan, fallback_prompt, class_to_id, propagator, options, frames
+            )
+            total = propagator.keyframes + propagator.propagated
+            saved = propagator.propagated / total * 100.0 if total else 0.0
+            print(
+                f"[label] Propagation: {propagator.keyframes} keyframes sent to {model}, "
+                f"{propagator.propagated} frames tracked ({saved:.0f}% fewer frames queried)."
+            )
+        elif mosaic.enabled:
+            print(f"[label] Mosaic mode: {mosaic.frames} frames per request.")
+            if max_in_flight > 1:
+                asyncio.run(
+                    label_frames_mosaic_async(
+                        api_key,
+                        model,
+                        remaining,
+                        plan,
+                        fallback_prompt,
+                        class_to_id,
+                        max_in_flight,
+                        mosaic,
+                        mosaic_stats,
+                        options,
+                    )
+                )
             else:
-                boxes = detect_objects(client, model, frame_path, fallback_prompt)
-            write_yolo_labels(frame_path, boxes, class_to_id)
+                label_frames_mosaic(
+                    client, model, remaining, plan, fallback_prompt, class_to_id, mosaic, mosaic_stats, options
+                )
+            print(f"[label] Mosaics: {mosaic_stats.summary()}")
+        elif max_in_flight > 1:
+            asyncio.run(
+                label_frames_async(
+                    api_key,
+                    model,
+                    remaining,
+                    plan,
+                    fallback_prompt,
+                    class_to_id,
+                    max_in_flight,
+                    options,
+                )
+            )
+        else:
+            for idx, frame_path in enumerate(remaining, start=1):
+                print(f"  - Frame {idx}/{len(remaining)}: {frame_path.name}")
+                boxes = label_frame_isolated(client, model, frame_path, plan, fallback_prompt, options)
+                if boxes is not None:
+                    write_yolo_labels(frame_path, boxes, class_to_id)
     except PipelineError as exc:
         print(f"Error: {exc}", file=sys.stderr)
+        # Labels written so far reference these ids, so keep the class map in sync.
+        write_class_map(class_to_id, class_map_path)
+        print_request_stats(options)
         return 1
 
     write_class_map(class_to_id, class_map_path)
-    print(f"[label] Done. {len(unlabeled)} frames labeled. Classes: {class_map_path}")
+    print_request_stats(options)
+    labeled = len(unlabeled) - options.dead_letter.added
+    print(f"[label] Done. {labeled} frames labeled. Classes: {class_map_path}")
     _maybe_generate_previews(output_dir)
     return 0
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
-
-def _maybe_generate_previews(output_dir: Path) -> None:
-    frames_dir = output_dir / "frames"
-    classes_path = output_dir / "classes.txt"
-    if not frames_dir.exists() or not classes_path.exists():
-        return
-
-    preview_dir = frames_dir / "preview"
-    video_out = preview_dir / "preview.mp4"
-
-    cmd = [
-        "uv",
-        "run",
-        ".agents/skills/eval/scripts/preview_labels.py",
-        str(frames_dir),
-        "--classes",
-        str(classes_path),
-        "--out-dir",
-        str(preview_dir),
-        "--limit",
-        "0",
-        "--video-out",
-        str(video_out),
-    ]
-
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as exc:
-        print(f"[label] Warning: preview generation failed ({exc})", file=sys.stderr)
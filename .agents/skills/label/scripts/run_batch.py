@@ -9,179 +9,50 @@ from pathlib import Path
 
 # Ensure repo root is importable
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from openai import OpenAI
 
-from shared.utils import (
-    BoundingBox,
-    PipelineError,
-    clamp,
-    encode_image_base64,
-    extract_json_from_text,
-    load_config,
-    read_image_dimensions,
+# Requests are built by run.py so both labelers send the same prompts and schemas.
+from run import (
+    DEFAULT_RECALL_THRESHOLD,
+    LabelPlan,
+    RequestOptions,
+    build_prompt,
+    label_frame_isolated,
+    load_auto_calibration,
+    plan_for_strategy,
+    weak_classes_from_recall,
+    write_class_map,
+    write_yolo_labels,
 )
-
-MULTI_CLASS_PROMPT_TEMPLATE = """
-Detect every visible object in this image and return bounding boxes.
-{class_hint}
-Rules:
-- x,y,width,height must be pixel values in the original image.
-- x,y is top-left corner.
-- Include all salient objects.
-""".strip()
-
-SINGLE_CLASS_PROMPT_TEMPLATE = """
-Detect only objects of class "{class_name}" in this image and return bounding boxes.
-Rules:
-- Return only "{class_name}" objects. Ignore every other class.
-- If no "{class_name}" is visible, return an empty list.
-- x,y,width,height must be pixel values in the original image.
-- x,y is top-left corner.
-""".strip()
-
-RESPONSE_SCHEMA = {
-    "type": "json_schema",
-    "json_schema": {
-        "name": "bounding_boxes",
-        "strict": True,
-        "schema": {
-            "type": "object",
-            "properties": {
-                "objects": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "class_name": {"type": "string"},
-                            "x": {"type": "number"},
-                            "y": {"type": "number"},
-                            "width": {"type": "number"},
-                            "height": {"type": "number"},
-                        },
-                        "required": ["class_name", "x", "y", "width", "height"],
-                        "additionalProperties": False,
-                    },
-                }
-            },
-            "required": ["objects"],
-            "additionalProperties": False,
-        },
-    },
-}
-
-
-def build_prompt(classes: list[str]) -> str:
-    if classes:
-        hint = f"Focus on these classes: {', '.join(classes)}."
-    else:
-        hint = "Include all salient objects (people, vehicles, UI elements, weapons, items, enemies, etc.)."
-    return MULTI_CLASS_PROMPT_TEMPLATE.format(class_hint=hint)
-
-
-def build_single_class_prompt(class_name: str) -> str:
-    return SINGLE_CLASS_PROMPT_TEMPLATE.format(class_name=class_name)
-
-
-def detect_objects(client: OpenAI, model: str, frame_path: Path, prompt: str) -> list[BoundingBox]:
-    image_b64 = encode_image_base64(frame_path)
-
-    response = client.responses.create(
-        model=model,
-        input=[
-            {
-                "role": "user",
-                "content": [
-                    {"type": "input_text", "text": prompt},
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{image_b64}",
-                    },
-                ],
-            }
-        ],
-        text=RESPONSE_SCHEMA,
-        temperature=0,
-    )
-
-    payload = extract_json_from_text(response.output_text)
-    objects = payload.get("objects", [])
-
-    boxes: list[BoundingBox] = []
-    for obj in objects:
-        if not isinstance(obj, dict):
-            continue
-        try:
-            boxes.append(
-                BoundingBox(
-                    class_name=str(obj["class_name"]).strip().lower().replace(" ", "_"),
-                    x=float(obj["x"]),
-                    y=float(obj["y"]),
-                    width=float(obj["width"]),
-                    height=float(obj["height"]),
-                )
-            )
-        except (KeyError, TypeError, ValueError):
-            continue
-    return boxes
-
-
-def detect_objects_for_class(
-    client: OpenAI,
-    model: str,
-    frame_path: Path,
-    class_name: str,
-) -> list[BoundingBox]:
-    prompt = build_single_class_prompt(class_name)
-    boxes = detect_objects(client, model, frame_path, prompt)
-    normalized_name = class_name.strip().lower().replace(" ", "_")
-    return [
-        BoundingBox(
-            class_name=normalized_name,
-            x=box.x,
-            y=box.y,
-            width=box.width,
-            height=box.height,
-        )
-        for box in boxes
-    ]
-
-
-def to_yolo_line(box: BoundingBox, class_id: int, img_w: int, img_h: int) -> str:
-    x = clamp(box.x, 0.0, float(img_w))
-    y = clamp(box.y, 0.0, float(img_h))
-    w = clamp(box.width, 0.0, float(img_w))
-    h = clamp(box.height, 0.0, float(img_h))
-
-    center_x = clamp((x + (w / 2.0)) / float(img_w), 0.0, 1.0)
-    center_y = clamp((y + (h / 2.0)) / float(img_h), 0.0, 1.0)
-    norm_w = clamp(w / float(img_w), 0.0, 1.0)
-    norm_h = clamp(h / float(img_h), 0.0, 1.0)
-
-    return f"{class_id} {center_x:.6f} {center_y:.6f} {norm_w:.6f} {norm_h:.6f}"
-
-
-def write_yolo_labels(
-    frame_path: Path,
-    boxes: list[BoundingBox],
-    class_to_id: dict[str, int],
-) -> None:
-    img_w, img_h = read_image_dimensions(frame_path)
-
-    lines: list[str] = []
-    for box in boxes:
-        if box.class_name not in class_to_id:
-            class_to_id[box.class_name] = len(class_to_id)
-        class_id = class_to_id[box.class_name]
-        lines.append(to_yolo_line(box, class_id, img_w, img_h))
-
-    label_path = frame_path.with_suffix(".txt")
-    label_path.write_text("\n".join(lines), encoding="utf-8")
-
-
-def write_class_map(class_to_id: dict[str, int], output_path: Path) -> None:
-    names = [name for name, _ in sorted(class_to_id.items(), key=lambda item: item[1])]
-    output_path.write_text("\n".join(names), encoding="utf-8")
+from shared.cache import cache_from_config
+from shared.manifest import list_frames
+from shared.presence import presence_gate_from_config
+from shared.ratelimit import limiter_from_config
+from shared.retry import DEAD_LETTER_NAME, DeadLetter, retry_policy_from_config
+from shared.upload import upload_encoder_from_config
+from shared.utils import PipelineError, load_config
+
+
+def resolve_plan(strategy: str, classes: list[str], model: str, output_dir: Path, threshold: float) -> LabelPlan:
+    """The request plan for `label_strategy`. `auto` reads run.py's label_strategy.json.
+
+    Subagents never calibrate themselves (dispatch.sh copies the file into each
+    worktree when it exists); without it, `auto` falls back to per-class requests.
+    """
+    if strategy != "auto" or not classes:
+        return plan_for_strategy(strategy, classes)
+    calibration_path = output_dir / "label_strategy.json"
+    saved = load_auto_calibration(calibration_path, model, classes)
+    if saved is None:
+        print("[batch] No auto calibration for this model/classes; using per-class requests.")
+        return plan_for_strategy("per_class", classes)
+    weak = weak_classes_from_recall(saved["recall"], threshold)
+    if len(weak) == len(classes):
+        # Every class gets its own request, so a joint request would add nothing.
+        return plan_for_strategy("per_class", classes)
+    return plan_for_strategy("auto", classes, weak)
 
 
 def main() -> int:
@@ -196,7 +67,7 @@ def main() -> int:
     output_dir = Path(config.get("output_dir", "output"))
     frames_dir = output_dir / "frames"
 
-    frames = sorted(frames_dir.glob("*.jpg"))
+    frames = list_frames(frames_dir)
     if not frames:
         print("[batch] No frames in this worktree. Nothing to label.")
         return 0
@@ -208,6 +79,20 @@ def main() -> int:
         return 0
 
     client = OpenAI(api_key=api_key)
+    options = RequestOptions(
+        # Every dispatch.sh subagent draws from the same account quota.
+        limiter=limiter_from_config(config, model, share=config.get("num_agents", 1)),
+        cache=cache_from_config(config, output_dir),
+        retry=retry_policy_from_config(config),
+        dead_letter=DeadLetter(output_dir / DEAD_LETTER_NAME),
+        gate=presence_gate_from_config(config),
+    )
+    try:
+        options.upload = upload_encoder_from_config(config)
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    dead_letter = options.dead_letter
     fallback_prompt = build_prompt(classes) if not classes else ""
     class_to_id: dict[str, int] = {}
     for class_name in classes:
@@ -215,23 +100,35 @@ def main() -> int:
         if normalized and normalized not in class_to_id:
             class_to_id[normalized] = len(class_to_id)
 
+    strategy = str(config.get("label_strategy", "per_class")).strip().lower()
+    classes = [str(c) for c in classes]
+    threshold = float(config.get("auto_recall_threshold", DEFAULT_RECALL_THRESHOLD))
+    plan = resolve_plan(strategy, classes, model, output_dir, threshold)
+
     print(f"[batch] Labeling {len(unlabeled)} frames with {model}...")
     try:
         for idx, frame_path in enumerate(unlabeled, start=1):
             print(f"  - Frame {idx}/{len(unlabeled)}: {frame_path.name}")
-            if classes:
-                boxes: list[BoundingBox] = []
-                for class_name in classes:
-                    boxes.extend(detect_objects_for_class(client, model, frame_path, str(class_name)))
-            else:
-                boxes = detect_objects(client, model, frame_path, fallback_prompt)
-            write_yolo_labels(frame_path, boxes, class_to_id)
+            # Failures are retried, then recorded in the dead letter without stopping the batch.
+            boxes = label_frame_isolated(client, model, frame_path, plan, fallback_prompt, options)
+            if boxes is not None:
+                write_yolo_labels(frame_path, boxes, class_to_id)
     except PipelineError as exc:
         print(f"Error: {exc}", file=sys.stderr)
+        write_class_map(class_to_id, output_dir / "classes.txt")
         return 1
+    finally:
+        if options.cache is not None:
+            print(f"[batch] Response cache: {options.cache.summary()}")
+        if options.gate is not None:
+            print(f"[batch] Presence gate: {options.gate.summary()}")
+        if options.upload.uploads:
+            print(f"[batch] Uploads: {options.upload.summary()}")
+        if dead_letter.added:
+            print(f"[batch] {dead_letter.added} frames failed; see {dead_letter.path} and re-run to retry.")
 
     write_class_map(class_to_id, output_dir / "classes.txt")
-    print(f"[batch] Done. {len(unlabeled)} frames labeled.")
+    print(f"[batch] Done. {len(unlabeled) - dead_letter.added} frames labeled.")
     return 0
 
 
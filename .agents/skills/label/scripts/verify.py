@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Verify existing labels from crop grids instead of re-labeling whole frames.
+
+Boxes of the classes under review (eval's weakest classes by default) are cut
+out of their frames and packed into numbered grids, `verify_per_request` crops
+per image. For each crop the model answers yes (keep), no (drop the box) or
+relabel (with the class it actually shows). Only rejected boxes change; every
+other label line is left as is.
+
+Frames are recorded in `<output_dir>/verify_index.json` with a hash of their
+label file and the classes checked, so later runs skip boxes already verified.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openai import OpenAI
+
+from run import (
+    RequestOptions,
+    build_request,
+    load_class_map,
+    normalize_class_name,
+    print_request_stats,
+    request_output_text,
+)
+from shared.cache import cache_from_config
+from shared.cropgrid import (
+    DEFAULT_COLUMNS,
+    DEFAULT_PER_GRID,
+    DEFAULT_TILE,
+    CropRef,
+    encode_grid_base64,
+    read_yolo_boxes,
+    render_grids,
+)
+from shared.manifest import list_frames
+from shared.ratelimit import estimate_image_tokens, estimate_request_tokens, limiter_from_config
+from shared.retry import FatalAPIError, retry_policy_from_config
+from shared.utils import PipelineError, extract_json_from_text, load_config, read_image_dimensions
+
+VERIFY_INDEX_NAME = "verify_index.json"
+VERDICTS = ("yes", "no", "relabel")
+
+VERIFY_PROMPT_TEMPLATE = """
+This image is a grid of {count} numbered crops cut from video game frames. Each crop
+should show the object class listed for its number below, roughly centered.
+Allowed classes: {class_list}.
+
+{claims}
+
+For every crop number answer:
+- "yes" if the crop shows the listed class,
+- "relabel" with the correct class_name if it clearly shows a different allowed class,
+- "no" if it shows none of the allowed classes (background, UI, partial or ambiguous).
+For "yes" and "no" repeat the listed class as class_name.
+""".strip()
+
+
+def build_verify_schema(classes: list[str]) -> dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "name": "crop_verdicts",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "crops": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "index": {"type": "integer"},
+                            "verdict": {"type": "string", "enum": list(VERDICTS)},
+                            "class_name": {"type": "string", "enum": classes},
+                        },
+                        "required": ["index", "verdict", "class_name"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["crops"],
+            "additionalProperties": False,
+        },
+    }
+
+
+def build_verify_prompt(chunk: list[CropRef], classes: list[str]) -> str:
+    claims = "\n".join(f"{i}: {crop.box.class_name}" for i, crop in enumerate(chunk, start=1))
+    return VERIFY_PROMPT_TEMPLATE.format(count=len(chunk), class_list=", ".join(classes), claims=claims)
+
+
+def parse_verdicts(output_text: str, count: int, classes: list[str]) -> dict[int, tuple[str, str]]:
+    """{0-based crop index: (verdict, class_name)}; crops the model skipped are left out (kept)."""
+    allowed = set(classes)
+    verdicts: dict[int, tuple[str, str]] = {}
+    for item in extract_json_from_text(output_text).get("crops", []):
+        try:
+            index = int(item["index"]) - 1
+            verdict = str(item["verdict"]).strip().lower()
+            class_name = normalize_class_name(item["class_name"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= index < count and verdict in VERDICTS and (verdict != "relabel" or class_name in allowed):
+            verdicts[index] = (verdict, class_name)
+    return verdicts
+
+
+def label_digest(label_path: Path) -> str:
+    return hashlib.sha1(label_path.read_bytes()).hexdigest()
+
+
+def load_verify_index(path: Path) -> dict[str, dict[str, Any]]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("frames", {})
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+
+
+def is_verified(entry: dict[str, Any] | None, digest: str, targets: set[str] | None) -> bool:
+    if not entry or entry.get("digest") != digest:
+        return False
+    checked = set(entry.get("classes", []))
+    return "*" in checked or (targets is not None and targets <= checked)
+
+
+def collect_crops(
+    frames: list[Path],
+    id_to_class: dict[int, str],
+    targets: set[str] | None,
+    verified: dict[str, dict[str, Any]],
+) -> tuple[list[CropRef], list[Path], int]:
+    """Crops to verify (grouped by frame), frames they come from, and those frames' total pixels."""
+    crops: list[CropRef] = []
+    sources: list[Path] = []
+    frame_pixels = 0
+    for frame_path in frames:
+        label_path = frame_path.with_suffix(".txt")
+        if not label_path.exists() or is_verified(verified.get(frame_path.name), label_digest(label_path), targets):
+            continue
+        img_w, img_h = read_image_dimensions(frame_path)
+        found = False
+        for line_index, box in enumerate(read_yolo_boxes(label_path, id_to_class, img_w, img_h)):
+            if box is None or (targets is not None and normalize_class_name(box.class_name) not in targets):
+                continue
+            crops.append(CropRef(frame_path=frame_path, line_index=line_index, box=box))
+            found = True
+        if found:
+            sources.append(frame_path)
+            frame_pixels += img_w * img_h
+    return crops, sources, frame_pixels
+
+
+def apply_verdicts(
+    verdicts: dict[Path, dict[int, tuple[str, str]]], class_to_id: dict[str, int]
+) -> tuple[int, int]:
+    """Rewrite label files: drop rejected lines, swap the class id of relabeled ones."""
+    dropped = relabeled = 0
+    for frame_path, by_line in verdicts.items():
+        label_path = frame_path.with_suffix(".txt")
+        lines = label_path.read_text(encoding="utf-8").splitlines()
+        kept: list[str] = []
+        for line_index, line in enumerate(lines):
+            verdict, class_name = by_line.get(line_index, ("yes", ""))
+            if verdict == "no":
+                dropped += 1
+                continue
+            if verdict == "relabel" and class_name in class_to_id:
+                parts = line.split()
+                new_id = str(class_to_id[class_name])
+                if parts and parts[0] != new_id:
+                    line = " ".join([new_id] + parts[1:])
+                    relabeled += 1
+            kept.append(line)
+        label_path.write_text("\n".join(kept), encoding="utf-8")
+    return dropped, relabeled
+
+
+def weakest_classes(output_dir: Path) -> list[str]:
+    results_path = output_dir / "eval_results.json"
+    if not results_path.exists():
+        return []
+    try:
+        return [str(c) for c in json.loads(results_path.read_text(encoding="utf-8")).get("weakest_classes", [])]
+    except (json.JSONDecodeError, AttributeError):
+        return []
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--classes", nargs="+", help="Classes to verify (default: eval's weakest classes).")
+    scope.add_argument("--all", action="store_true", help="Verify boxes of every class.")
+    parser.add_argument("--recheck", action="store_true", help="Ignore verify_index.json and check every frame.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("Error: OPENAI_API_KEY is not set.", file=sys.stderr)
+        return 1
+
+    config = load_config()
+    model = config.get("model", "gpt-5-nano")
+    output_dir = Path(config.get("output_dir", "output"))
+    frames_dir = output_dir / "frames"
+    class_to_id = load_class_map(output_dir / "classes.txt", config.get("classes", []))
+    if not class_to_id:
+        print("Error: No classes.txt or configured classes. Run the label skill first.", file=sys.stderr)
+        return 1
+    id_to_class = {idx: name for name, idx in class_to_id.items()}
+    classes = [id_to_class[idx] for idx in sorted(id_to_class)]
+
+    if args.all:
+        targets = None
+    else:
+        requested = args.classes or config.get("verify_classes") or weakest_classes(output_dir)
+        if not requested:
+            print("Error: No classes to verify. Pass --classes/--all or run the eval skill first.", file=sys.stderr)
+            return 1
+        targets = {normalize_class_name(c) for c in requested}
+
+    index_path = output_dir / VERIFY_INDEX_NAME
+    verified = {} if args.recheck else load_verify_index(index_path)
+    crops, sources, frame_pixels = collect_crops(list_frames(frames_dir), id_to_class, targets, verified)
+    scope = "all classes" if targets is None else ", ".join(sorted(targets))
+    if not crops:
+        print(f"[verify] No unverified boxes for {scope}.")
+        return 0
+
+    per_grid = max(1, int(config.get("verify_per_request", DEFAULT_PER_GRID)))
+    columns = max(1, int(config.get("verify_columns", DEFAULT_COLUMNS)))
+    tile = max(32, int(config.get("verify_tile", DEFAULT_TILE)))
+    requests = (len(crops) + per_grid - 1) // per_grid
+    print(
+        f"[verify] Checking {len(crops)} boxes ({scope}) from {len(sources)} frames "
+        f"in {requests} grid requests of up to {per_grid} crops..."
+    )
+
+    client = OpenAI(api_key=api_key)
+    options = RequestOptions(
+        limiter=limiter_from_config(config, model),
+        cache=cache_from_config(config, output_dir),
+        retry=retry_policy_from_config(config),
+    )
+    schema = build_verify_schema(classes)
+    verdicts: dict[Path, dict[int, tuple[str, str]]] = {}
+    failed: set[Path] = set()
+    grid_pixels = 0
+    counts = {verdict: 0 for verdict in VERDICTS}
+    try:
+        for number, (chunk, grid) in enumerate(render_grids(crops, per_grid, columns, tile), start=1):
+            prompt = build_verify_prompt(chunk, classes)
+            request = build_request(model, prompt, encode_grid_base64(grid), schema)
+            tokens = 0
+            if options.limiter is not None:
+                tokens = estimate_request_tokens(prompt, estimate_image_tokens(*grid.size))
+            grid_pixels += grid.width * grid.height
+            try:
+                output_text = options.retry.run(lambda: request_output_text(client, request, options, tokens))
+                parsed = parse_verdicts(output_text, len(chunk), classes)
+            except FatalAPIError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                # Failed request or unparseable verdicts: leave these boxes unverified and
+                # keep the verdicts of earlier grids; the next run picks them up again.
+                failed.update(crop.frame_path for crop in chunk)
+                print(f"  - Grid {number}/{requests}: failed ({type(exc).__name__}: {exc})", file=sys.stderr)
+                continue
+            for index, (verdict, class_name) in parsed.items():
+                crop = chunk[index]
+                if verdict == "relabel" and class_name == normalize_class_name(crop.box.class_name):
+                    verdict = "yes"
+                counts[verdict] += 1
+                verdicts.setdefault(crop.frame_path, {})[crop.line_index] = (verdict, class_name)
+            print(f"  - Grid {number}/{requests}: {len(chunk)} crops")
+    except PipelineError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        print_request_stats(options)
+        return 1
+
+    checked_before = {frame_path: label_digest(frame_path.with_suffix(".txt")) for frame_path in sources}
+    dropped, relabeled = apply_verdicts(
+        {frame_path: by_line for frame_path, by_line in verdicts.items() if frame_path not in failed}, class_to_id
+    )
+    for frame_path in sources:
+        if frame_path in failed:
+            continue
+        previous = verified.get(frame_path.name) or {}
+        checked = {"*"} if targets is None else set(targets)
+        if previous.get("digest") == checked_before[frame_path]:
+            checked |= set(previous.get("classes", []))
+        verified[frame_path.name] = {
+            "digest": label_digest(frame_path.with_suffix(".txt")),
+            "classes": sorted(checked),
+        }
+    index_path.write_text(json.dumps({"frames": verified}, indent=2), encoding="utf-8")
+
+    print_request_stats(options)
+    unanswered = len(crops) - sum(counts.values())
+    print(
+        f"[verify] Kept {counts['yes']}, dropped {dropped}, relabeled {relabeled}"
+        + (f", {unanswered} unanswered (kept)" if unanswered else "")
+        + (f"; {len(failed)} frames left unverified after failed requests" if failed else "")
+    )
+    share = grid_pixels / frame_pixels * 100.0 if frame_pixels else 0.0
+    print(
+        f"[verify] {requests} requests over {grid_pixels / 1e6:.1f} MP of grids vs "
+        f"at least {len(sources)} requests over {frame_pixels / 1e6:.1f} MP to re-label the frames "
+        f"({share:.0f}% of the pixels)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,6 +12,7 @@ import yaml
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent.parent.parent))
 
+from shared.manifest import list_frames
 from shared.utils import load_config
 
 
@@ -33,7 +34,7 @@ def split_dataset(
     # Collect all image/label pairs
     pairs: list[tuple[Path, Path]] = []
 
-    for img_path in sorted(frames_dir.glob("*.jpg")):
+    for img_path in list_frames(frames_dir):
         lbl_path = img_path.with_suffix(".txt")
         if lbl_path.exists():
             pairs.append((img_path, lbl_path))
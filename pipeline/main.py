@@ -1,29 +1,34 @@
 #!/usr/bin/env python3
-"""End-to-end YouTube -> frames -> GPT-4o labels -> YOLO annotations pipeline."""
+"""End-to-end YouTube -> frames -> GPT-4o labels -> YOLO annotations pipeline.
+
+With --stream, frame extraction and labeling overlap: ffmpeg writes JPEGs to a
+pipe, each frame is saved and queued as soon as it is complete, and labeling
+workers drain a bounded queue (a full queue stops reading the pipe, which in turn
+pauses ffmpeg). Results are written in frame order, so labels and classes.txt
+match the phased run.
+"""
 
 from __future__ import annotations
 
 import argparse
-import base64
 import json
 import os
+import queue
 import re
 import subprocess
 import sys
-from dataclasses import dataclass
+import threading
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
 from openai import OpenAI
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-@dataclass
-class BoundingBox:
-    class_name: str
-    x: float
-    y: float
-    width: float
-    height: float
+from shared.cache import DEFAULT_MAX_MB, ResponseCache, cache_from_config, cache_key
+from shared.upload import DEFAULT_PROFILE, PROFILES, UploadEncoder, encode_for_upload, resolve_profile
+from shared.utils import BoundingBox, PipelineError, read_image_dimensions
 
 
 PROMPT = """
@@ -50,10 +55,6 @@ Rules:
 """.strip()
 
 
-class PipelineError(RuntimeError):
-    """Raised when a pipeline step fails."""
-
-
 def run_command(cmd: list[str]) -> None:
     """Run a subprocess command and raise with readable context on failure."""
     try:
@@ -94,32 +95,59 @@ def extract_frames(video_path: Path, frames_dir: Path, fps: int = 1) -> list[Pat
     return frames
 
 
-def read_image_dimensions(frame_path: Path) -> tuple[int, int]:
-    """Read width/height via ffprobe to avoid extra Python imaging deps."""
+JPEG_EOI = b"\xff\xd9"
+PIPE_READ_SIZE = 1 << 16
+
+
+def stream_frames(video_path: Path, frames_dir: Path, fps: int = 1) -> Iterator[Path]:
+    """Run ffmpeg with JPEG output on stdout and yield each frame once it is saved.
+
+    Frames get the same names and bytes as extract_frames (same mjpeg encoder).
+    Closing the generator early closes the pipe, which stops ffmpeg.
+    """
+    frames_dir.mkdir(parents=True, exist_ok=True)
     cmd = [
-        "ffprobe",
+        "ffmpeg",
+        "-y",
         "-v",
         "error",
-        "-select_streams",
-        "v:0",
-        "-show_entries",
-        "stream=width,height",
-        "-of",
-        "json",
-        str(frame_path),
+        "-i",
+        str(video_path),
+        "-vf",
+        f"fps={fps}",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "mjpeg",
+        "-",
     ]
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        data = json.loads(result.stdout)
-        stream = data["streams"][0]
-        return int(stream["width"]), int(stream["height"])
-    except Exception as exc:  # noqa: BLE001
-        raise PipelineError(f"Failed to read dimensions for {frame_path}") from exc
-
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    except FileNotFoundError as exc:
+        raise PipelineError(f"Required executable not found: {cmd[0]}") from exc
 
-def encode_image_base64(image_path: Path) -> str:
-    image_bytes = image_path.read_bytes()
-    return base64.b64encode(image_bytes).decode("utf-8")
+    index = 0
+    buffer = bytearray()
+    search_from = 0
+    try:
+        while chunk := proc.stdout.read1(PIPE_READ_SIZE):
+            buffer += chunk
+            # Entropy-coded JPEG data byte-stuffs 0xFF, so the first EOI marks the frame end.
+            while (end := buffer.find(JPEG_EOI, search_from)) >= 0:
+                index += 1
+                frame_path = frames_dir / f"frame_{index:06d}.jpg"
+                frame_path.write_bytes(bytes(buffer[: end + 2]))
+                del buffer[: end + 2]
+                search_from = 0
+                yield frame_path
+            search_from = max(0, len(buffer) - 1)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise PipelineError(f"Command failed ({returncode}): {' '.join(cmd)}")
+    if index == 0:
+        raise PipelineError("No frames extracted. Check video input and ffmpeg installation.")
 
 
 def extract_json_from_text(text: str) -> dict[str, Any]:
@@ -136,10 +164,16 @@ def extract_json_from_text(text: str) -> dict[str, Any]:
             raise PipelineError("Model returned malformed JSON.") from exc
 
 
-def detect_objects(client: OpenAI, model: str, frame_path: Path) -> list[BoundingBox]:
-    image_b64 = encode_image_base64(frame_path)
+def detect_objects(
+    client: OpenAI,
+    model: str,
+    frame_path: Path,
+    cache: ResponseCache | None = None,
+    upload: UploadEncoder | None = None,
+) -> list[BoundingBox]:
+    image = encode_for_upload(frame_path, upload)
 
-    response = client.responses.create(
+    request = dict(
         model=model,
         input=[
             {
@@ -148,7 +182,7 @@ def detect_objects(client: OpenAI, model: str, frame_path: Path) -> list[Boundin
                     {"type": "input_text", "text": PROMPT},
                     {
                         "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{image_b64}",
+                        "image_url": f"data:image/jpeg;base64,{image.b64}",
                     },
                 ],
             }
@@ -156,25 +190,33 @@ def detect_objects(client: OpenAI, model: str, frame_path: Path) -> list[Boundin
         temperature=0,
     )
 
-    payload = extract_json_from_text(response.output_text)
+    key = cache_key(request)
+    output_text = cache.get(key) if cache is not None else None
+    from_cache = output_text is not None
+    if output_text is None:
+        output_text = client.responses.create(**request).output_text
+
+    payload = extract_json_from_text(output_text)
     objects = payload.get("objects", [])
     if not isinstance(objects, list):
         raise PipelineError("Model JSON missing 'objects' list.")
+    if cache is not None and not from_cache:
+        cache.put(key, output_text)
 
     boxes: list[BoundingBox] = []
     for obj in objects:
         if not isinstance(obj, dict):
             continue
         try:
-            boxes.append(
-                BoundingBox(
-                    class_name=str(obj["class_name"]).strip().lower().replace(" ", "_"),
-                    x=float(obj["x"]),
-                    y=float(obj["y"]),
-                    width=float(obj["width"]),
-                    height=float(obj["height"]),
-                )
+            box = BoundingBox(
+                class_name=str(obj["class_name"]).strip().lower().replace(" ", "_"),
+                x=float(obj["x"]),
+                y=float(obj["y"]),
+                width=float(obj["width"]),
+                height=float(obj["height"]),
             )
+            # The model answers in the uploaded image's pixels.
+            boxes.append(image.to_original(box))
         except (KeyError, TypeError, ValueError):
             continue
     return boxes
@@ -228,11 +270,114 @@ def write_class_map(class_to_id: dict[str, int], output_path: Path) -> None:
     output_path.write_text("\n".join(names), encoding="utf-8")
 
 
-def run_pipeline(youtube_url: str, output_dir: Path, model: str) -> None:
+_WORKER_DONE = object()
+
+
+def label_stream(
+    client: OpenAI,
+    model: str,
+    frames: Iterator[Path],
+    class_to_id: dict[str, int],
+    cache: ResponseCache | None = None,
+    workers: int = 4,
+    queue_size: int = 16,
+    upload: UploadEncoder | None = None,
+) -> int:
+    """Label frames as the iterator yields them; returns the number of frames labeled.
+
+    A producer thread moves frames into a queue of at most `queue_size` entries and
+    `workers` threads call the model. Labels are written in frame order so class
+    ids are assigned exactly as in the sequential loop.
+    """
+    tasks: queue.Queue = queue.Queue(maxsize=queue_size)
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def put_task(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                tasks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for index, frame_path in enumerate(frames, start=1):
+                if not put_task((index, frame_path)):
+                    return
+        except Exception as exc:  # noqa: BLE001
+            results.put((None, None, exc))
+        finally:
+            close = getattr(frames, "close", None)
+            if close is not None:
+                close()
+            for _ in range(workers):
+                put_task(None)
+
+    def work() -> None:
+        while not stop.is_set():
+            try:
+                item = tasks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+            index, frame_path = item
+            try:
+                results.put((index, frame_path, detect_objects(client, model, frame_path, cache, upload)))
+            except Exception as exc:  # noqa: BLE001
+                results.put((index, frame_path, exc))
+        results.put((None, None, _WORKER_DONE))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    labelers = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in [producer, *labelers]:
+        thread.start()
+
+    pending: dict[int, tuple[Path, list[BoundingBox]]] = {}
+    next_index = 1
+    finished = 0
+    try:
+        while finished < workers:
+            index, frame_path, outcome = results.get()
+            if outcome is _WORKER_DONE:
+                finished += 1
+                continue
+            if isinstance(outcome, Exception):
+                raise outcome
+            pending[index] = (frame_path, outcome)
+            while next_index in pending:
+                ready_path, boxes = pending.pop(next_index)
+                print(f"  - Frame {next_index}: {ready_path.name}")
+                write_yolo_labels(ready_path, boxes, class_to_id)
+                next_index += 1
+    finally:
+        stop.set()
+        # Workers may be mid-request and still using the cache, which the caller closes next.
+        for thread in labelers:
+            thread.join()
+    return next_index - 1
+
+
+def run_pipeline(
+    youtube_url: str,
+    output_dir: Path,
+    model: str,
+    stream: bool = False,
+    workers: int = 4,
+    queue_size: int = 16,
+    upload_profile: str = DEFAULT_PROFILE,
+    response_cache: bool = True,
+    cache_max_mb: float = DEFAULT_MAX_MB,
+) -> None:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise PipelineError("OPENAI_API_KEY is not set.")
 
+    # Fail on a bad profile name before spending time on the download.
+    upload = UploadEncoder(resolve_profile(upload_profile), upload_profile)
     client = OpenAI(api_key=api_key)
 
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -242,16 +387,38 @@ def run_pipeline(youtube_url: str, output_dir: Path, model: str) -> None:
     print("[1/4] Downloading video with yt-dlp...")
     download_video(youtube_url, video_path)
 
-    print("[2/4] Extracting frames at 1 FPS with ffmpeg...")
-    frames = extract_frames(video_path, frames_dir, fps=1)
-
-    print(f"[3/4] Labeling {len(frames)} frames with {model}...")
     class_to_id: dict[str, int] = {}
+    # Same policy as the skills: opt-out, size cap and YOLODEX_CACHE_DIR.
+    cache = cache_from_config({"response_cache": response_cache, "cache_max_mb": cache_max_mb}, output_dir)
 
-    for idx, frame_path in enumerate(frames, start=1):
-        print(f"  - Frame {idx}/{len(frames)}: {frame_path.name}")
-        boxes = detect_objects(client, model, frame_path)
-        write_yolo_labels(frame_path, boxes, class_to_id)
+    try:
+        if stream:
+            print(f"[2-3/4] Extracting frames at 1 FPS and labeling with {model} ({workers} workers)...")
+            labeled = label_stream(
+                client,
+                model,
+                stream_frames(video_path, frames_dir, fps=1),
+                class_to_id,
+                cache,
+                workers=workers,
+                queue_size=queue_size,
+                upload=upload,
+            )
+            print(f"  Labeled {labeled} frames")
+        else:
+            print("[2/4] Extracting frames at 1 FPS with ffmpeg...")
+            frames = extract_frames(video_path, frames_dir, fps=1)
+
+            print(f"[3/4] Labeling {len(frames)} frames with {model}...")
+            for idx, frame_path in enumerate(frames, start=1):
+                print(f"  - Frame {idx}/{len(frames)}: {frame_path.name}")
+                boxes = detect_objects(client, model, frame_path, cache, upload)
+                write_yolo_labels(frame_path, boxes, class_to_id)
+    finally:
+        if cache is not None:
+            print(f"Response cache: {cache.summary()}")
+            cache.close()
+        print(f"Uploads: {upload.summary()}")
 
     write_class_map(class_to_id, output_dir / "classes.txt")
 
@@ -276,13 +443,57 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         default="gpt-4o",
         help="OpenAI vision-capable model (default: gpt-4o)",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Label frames while ffmpeg is still extracting them",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent labeling requests in --stream mode (default: 4)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="Extracted frames buffered ahead of labeling in --stream mode (default: 16)",
+    )
+    parser.add_argument(
+        "--upload-profile",
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        help=f"Downscale/re-encode frames before upload (default: {DEFAULT_PROFILE})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the response cache (default: cache in <output-dir>/.cache or $YOLODEX_CACHE_DIR)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"Response cache size cap in MB (default: {DEFAULT_MAX_MB})",
+    )
     return parser.parse_args(argv)
 
 
 def main(argv: list[str] | None = None) -> int:
     args = parse_args(argv or sys.argv[1:])
     try:
-        run_pipeline(args.youtube_url, Path(args.output_dir), args.model)
+        run_pipeline(
+            args.youtube_url,
+            Path(args.output_dir),
+            args.model,
+            stream=args.stream,
+            workers=max(1, args.workers),
+            queue_size=max(1, args.queue_size),
+            upload_profile=args.upload_profile,
+            response_cache=not args.no_cache,
+            cache_max_mb=args.cache_max_mb,
+        )
     except PipelineError as exc:
         print(f"Error: {exc}", file=sys.stderr)
         return 1
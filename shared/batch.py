@@ -0,0 +1,182 @@
+"""OpenAI Batch API transport for large, latency-insensitive labeling backfills.
+
+`OpenAIBatchTransport` uses the Files and Batches endpoints. `LocalBatchTransport`
+has the same interface but "processes" batches on disk with a stub responder, so
+the whole submit/poll/ingest cycle can run offline.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+from shared.utils import PipelineError
+
+BATCH_ENDPOINT = "/v1/responses"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# API limits are 50,000 requests and 200 MB per input file; stay under the byte cap.
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+
+@dataclass
+class BatchStatus:
+    status: str
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+    completed: int = 0
+    failed: int = 0
+    total: int = 0
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class BatchTransport(Protocol):
+    def upload(self, path: Path) -> str: ...
+
+    def create(self, file_id: str) -> str: ...
+
+    def retrieve(self, batch_id: str) -> BatchStatus: ...
+
+    def download(self, file_id: str) -> str: ...
+
+
+class OpenAIBatchTransport:
+    def __init__(self, client: Any) -> None:
+        self.client = client
+
+    def upload(self, path: Path) -> str:
+        with path.open("rb") as handle:
+            return self.client.files.create(file=handle, purpose="batch").id
+
+    def create(self, file_id: str) -> str:
+        batch = self.client.batches.create(
+            input_file_id=file_id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def retrieve(self, batch_id: str) -> BatchStatus:
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchStatus(
+            status=batch.status,
+            output_file_id=batch.output_file_id,
+            error_file_id=batch.error_file_id,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+            total=counts.total if counts else 0,
+        )
+
+    def download(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+
+def stub_responder(body: dict[str, Any]) -> str:
+    """One fixed box per request, named after the first enum class when the schema has one."""
+    schema = body.get("text", {}).get("format", {}).get("schema", {})
+    item = schema.get("properties", {}).get("objects", {}).get("items", {})
+    enum = item.get("properties", {}).get("class_name", {}).get("enum") or ["object"]
+    return json.dumps({"objects": [{"class_name": enum[0], "x": 10, "y": 10, "width": 20, "height": 20}]})
+
+
+class LocalBatchTransport:
+    """Offline stand-in: files and batches live under `root`; a batch completes after
+    `polls_until_done` retrieve calls, answering each request with `responder`."""
+
+    def __init__(
+        self,
+        root: Path,
+        responder: Callable[[dict[str, Any]], str] = stub_responder,
+        polls_until_done: int = 1,
+    ) -> None:
+        self.root = root
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        (root / "files").mkdir(parents=True, exist_ok=True)
+        (root / "batches").mkdir(parents=True, exist_ok=True)
+
+    def _file(self, file_id: str) -> Path:
+        return self.root / "files" / f"{file_id}.jsonl"
+
+    def _batch(self, batch_id: str) -> Path:
+        return self.root / "batches" / f"{batch_id}.json"
+
+    def upload(self, path: Path) -> str:
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()[:24]
+        file_id = f"file-local-{digest}"
+        shutil.copyfile(path, self._file(file_id))
+        return file_id
+
+    def create(self, file_id: str) -> str:
+        if not self._file(file_id).exists():
+            raise PipelineError(f"Unknown batch input file: {file_id}")
+        batch_id = f"batch-local-{len(list((self.root / 'batches').glob('*.json'))) + 1:06d}"
+        state = {"input_file_id": file_id, "status": "validating", "polls": 0}
+        self._batch(batch_id).write_text(json.dumps(state), encoding="utf-8")
+        return batch_id
+
+    def retrieve(self, batch_id: str) -> BatchStatus:
+        path = self._batch(batch_id)
+        state = json.loads(path.read_text(encoding="utf-8"))
+        if state["status"] not in TERMINAL_STATUSES:
+            state["polls"] += 1
+            state["status"] = "in_progress"
+            if state["polls"] >= self.polls_until_done:
+                self._process(batch_id, state)
+            path.write_text(json.dumps(state), encoding="utf-8")
+        return BatchStatus(
+            status=state["status"],
+            output_file_id=state.get("output_file_id"),
+            completed=state.get("total", 0),
+            total=state.get("total", 0),
+        )
+
+    def _process(self, batch_id: str, state: dict[str, Any]) -> None:
+        lines: list[str] = []
+        for index, line in enumerate(self._file(state["input_file_id"]).read_text(encoding="utf-8").splitlines()):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            text = self.responder(request["body"])
+            body = {
+                "id": f"resp_local_{index}",
+                "object": "response",
+                "status": "completed",
+                "output": [{"type": "message", "content": [{"type": "output_text", "text": text}]}],
+            }
+            lines.append(json.dumps({
+                "id": f"batch_req_{index}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": f"req_{index}", "body": body},
+                "error": None,
+            }))
+        output_id = f"file-local-{batch_id}-output"
+        self._file(output_id).write_text("\n".join(lines) + "\n", encoding="utf-8")
+        state.update(status="completed", output_file_id=output_id, total=len(lines))
+
+    def download(self, file_id: str) -> str:
+        path = self._file(file_id)
+        if not path.exists():
+            raise PipelineError(f"Unknown batch file: {file_id}")
+        return path.read_text(encoding="utf-8")
+
+
+def response_output_text(body: dict[str, Any]) -> str:
+    """Concatenate the output_text parts of a Responses API body (what `.output_text` does)."""
+    parts: list[str] = []
+    for item in body.get("output", []):
+        if item.get("type") != "message":
+            continue
+        for content in item.get("content", []):
+            if content.get("type") == "output_text":
+                parts.append(content.get("text", ""))
+    return "".join(parts)
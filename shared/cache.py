@@ -0,0 +1,118 @@
+"""Content-addressed on-disk cache for vision labeling responses (SQLite)."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_MAX_MB = 512
+# Evict down to this fraction of the limit so a full cache does not evict on every put.
+EVICT_TO_FRACTION = 0.9
+
+
+def cache_key(*parts: Any) -> str:
+    """SHA-256 over the given parts; dicts/lists are hashed as canonical JSON."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode("utf-8")
+        else:
+            data = json.dumps(part, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Maps a request hash (image bytes, prompt, model, schema) to the raw model output.
+
+    Least-recently-used entries are evicted once the stored payload exceeds
+    `max_bytes`. Safe to share between threads and asyncio tasks.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._total = int(row[0])
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO_FRACTION))
+            self._conn.commit()
+
+    def _evict(self, target_bytes: int) -> None:
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC").fetchall()
+        doomed: list[tuple[str]] = []
+        for key, size in rows:
+            if self._total <= target_bytes:
+                break
+            doomed.append((key,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = (self.hits / lookups * 100.0) if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+            f"{self._total / (1024 * 1024):.1f} MB stored"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def cache_from_config(config: dict[str, Any], output_dir: Path) -> ResponseCache | None:
+    """Open `<output_dir>/.cache/responses.sqlite` unless `response_cache` is false.
+
+    YOLODEX_CACHE_DIR overrides the directory so dispatch.sh worktrees share the
+    main run's cache.
+    """
+    if not config.get("response_cache", True):
+        return None
+    cache_dir = Path(os.environ.get("YOLODEX_CACHE_DIR") or output_dir / ".cache")
+    max_mb = float(config.get("cache_max_mb", DEFAULT_MAX_MB))
+    return ResponseCache(cache_dir / "responses.sqlite", int(max_mb * 1024 * 1024))
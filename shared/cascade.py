@@ -0,0 +1,134 @@
+"""Cheap-to-expensive model cascade: escalation triggers and per-tier accounting.
+
+Tiers run cheapest first. A tier lists one model, or two cheap backends whose
+answers are cross-checked. A frame escalates to the next tier when a trigger
+fires. The triggers are:
+- `empty`: no boxes.
+- `count`: the box count is far from the counts of the preceding frames.
+- `disagreement`: the tier's two backends agree on too few boxes.
+Malformed output and failed calls always escalate, since there is nothing to keep.
+The last tier's parsed answer is always kept.
+"""
+
+from __future__ import annotations
+
+import statistics
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from shared.geometry import count_matches
+from shared.utils import BoundingBox, PipelineError
+
+TRIGGERS = ("empty", "count", "disagreement")
+DEFAULT_COUNT_TOLERANCE = 2
+DEFAULT_NEIGHBORS = 3
+DEFAULT_AGREEMENT_IOU = 0.5
+DEFAULT_MIN_AGREEMENT = 0.6
+
+
+@dataclass
+class CascadeSettings:
+    tiers: list[list[str]]
+    triggers: frozenset[str] = frozenset(TRIGGERS)
+    count_tolerance: int = DEFAULT_COUNT_TOLERANCE
+    neighbors: int = DEFAULT_NEIGHBORS
+    agreement_iou: float = DEFAULT_AGREEMENT_IOU
+    min_agreement: float = DEFAULT_MIN_AGREEMENT
+    cost_per_call: dict[str, float] = field(default_factory=dict)
+
+
+def agreement(a: list[BoundingBox], b: list[BoundingBox], iou_threshold: float = DEFAULT_AGREEMENT_IOU) -> float:
+    """Same-class pairs matched at `iou_threshold` over the larger box count; 1.0 when both are empty."""
+    if not a and not b:
+        return 1.0
+    return count_matches(a, b, iou_threshold) / float(max(len(a), len(b)))
+
+
+class CountHistory:
+    """Box counts of the last `window` accepted frames, in labeling order."""
+
+    def __init__(self, window: int = DEFAULT_NEIGHBORS) -> None:
+        self._counts: deque[int] = deque(maxlen=max(1, window))
+
+    def add(self, count: int) -> None:
+        self._counts.append(count)
+
+    def is_outlier(self, count: int, tolerance: int) -> bool:
+        # Two neighbours are the minimum for a median worth trusting.
+        if len(self._counts) < 2:
+            return False
+        return abs(count - statistics.median(self._counts)) > tolerance
+
+
+def escalation_reason(
+    settings: CascadeSettings, results: list[list[BoundingBox]], history: CountHistory
+) -> str | None:
+    """The first trigger that fires for one tier's parsed results, or None to accept results[0]."""
+    primary = results[0]
+    if "empty" in settings.triggers and not primary:
+        return "empty"
+    if "count" in settings.triggers and history.is_outlier(len(primary), settings.count_tolerance):
+        return "count"
+    if "disagreement" in settings.triggers and len(results) > 1:
+        if agreement(primary, results[1], settings.agreement_iou) < settings.min_agreement:
+            return "disagreement"
+    return None
+
+
+class CascadeStats:
+    def __init__(self, settings: CascadeSettings) -> None:
+        self.settings = settings
+        self.calls: Counter[str] = Counter()
+        self.accepted: Counter[int] = Counter()
+        self.escalated: list[Counter[str]] = [Counter() for _ in settings.tiers]
+
+    def cost(self, model: str) -> float:
+        return self.calls[model] * self.settings.cost_per_call.get(model, 0.0)
+
+    def summary_lines(self) -> list[str]:
+        lines: list[str] = []
+        for index, models in enumerate(self.settings.tiers):
+            calls = sum(self.calls[m] for m in models)
+            cost = sum(self.cost(m) for m in models)
+            reasons = ", ".join(f"{reason} {n}" for reason, n in self.escalated[index].most_common())
+            escalated = sum(self.escalated[index].values())
+            lines.append(
+                f"tier {index + 1} ({' + '.join(models)}): {calls} calls, ${cost:.4f}; "
+                f"accepted {self.accepted[index]} frames, escalated {escalated}"
+                + (f" ({reasons})" if reasons else "")
+            )
+        total = sum(self.cost(m) for m in self.calls)
+        lines.append(f"total: {sum(self.calls.values())} calls, ${total:.4f}")
+        return lines
+
+
+def _tier_models(tier: Any) -> list[str]:
+    models = [tier] if isinstance(tier, str) else list(tier)
+    if not 1 <= len(models) <= 2:
+        raise PipelineError(f"cascade tier must list one model or two cross-checked models, got {tier!r}")
+    return [str(m) for m in models]
+
+
+def cascade_from_config(config: dict[str, Any]) -> CascadeSettings:
+    """`cascade_tiers`, cheapest first, e.g. [["gpt-5-nano", "gemini-2.5-flash"], "gpt-5-mini", "gpt-5"].
+
+    `cascade_triggers`, `cascade_count_tolerance`, `cascade_neighbors`, `cascade_agreement_iou`
+    and `cascade_min_agreement` tune escalation; `cascade_cost_per_call` maps model -> USD.
+    """
+    tiers = [_tier_models(t) for t in config.get("cascade_tiers") or []]
+    if not tiers:
+        raise PipelineError("label_mode 'cascade' needs cascade_tiers in config.json")
+    triggers = frozenset(str(t) for t in config.get("cascade_triggers", TRIGGERS))
+    unknown = triggers - set(TRIGGERS)
+    if unknown:
+        raise PipelineError(f"Unknown cascade_triggers: {', '.join(sorted(unknown))}")
+    return CascadeSettings(
+        tiers=tiers,
+        triggers=triggers,
+        count_tolerance=int(config.get("cascade_count_tolerance", DEFAULT_COUNT_TOLERANCE)),
+        neighbors=int(config.get("cascade_neighbors", DEFAULT_NEIGHBORS)),
+        agreement_iou=float(config.get("cascade_agreement_iou", DEFAULT_AGREEMENT_IOU)),
+        min_agreement=float(config.get("cascade_min_agreement", DEFAULT_MIN_AGREEMENT)),
+        cost_per_call={str(k): float(v) for k, v in (config.get("cascade_cost_per_call") or {}).items()},
+    )
@@ -0,0 +1,113 @@
+"""Pack labeled box crops into numbered grid images for cheap label verification.
+
+Each crop is the box plus a little context, fitted into a fixed-size tile; tiles
+are laid out row-major with their 1-based index drawn in the corner, so one image
+can carry crops from many frames.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+from shared.utils import BoundingBox, clamp
+
+DEFAULT_TILE = 160
+DEFAULT_COLUMNS = 4
+DEFAULT_PER_GRID = 16
+DEFAULT_PAD = 0.15
+GRID_JPEG_QUALITY = 85
+TILE_BACKGROUND = (114, 114, 114)
+
+
+@dataclass
+class CropRef:
+    frame_path: Path
+    line_index: int  # line in the frame's .txt label file
+    box: BoundingBox
+
+
+def read_yolo_boxes(
+    label_path: Path, id_to_class: dict[int, str], img_w: int, img_h: int
+) -> list[BoundingBox | None]:
+    """Pixel boxes for each line of a YOLO label file; None for lines that do not parse."""
+    boxes: list[BoundingBox | None] = []
+    for line in label_path.read_text(encoding="utf-8").splitlines():
+        parts = line.split()
+        try:
+            class_id = int(parts[0])
+            cx, cy, w, h = (float(v) for v in parts[1:5])
+        except (IndexError, ValueError):
+            boxes.append(None)
+            continue
+        boxes.append(
+            BoundingBox(
+                class_name=id_to_class.get(class_id, f"class_{class_id}"),
+                x=(cx - w / 2) * img_w,
+                y=(cy - h / 2) * img_h,
+                width=w * img_w,
+                height=h * img_h,
+            )
+        )
+    return boxes
+
+
+def crop_tile(image: Image.Image, box: BoundingBox, tile: int = DEFAULT_TILE, pad: float = DEFAULT_PAD) -> Image.Image:
+    """The box plus `pad` context on each side, scaled to fit a `tile` square."""
+    pad_x, pad_y = box.width * pad, box.height * pad
+    x1 = int(clamp(box.x - pad_x, 0, image.width - 1))
+    y1 = int(clamp(box.y - pad_y, 0, image.height - 1))
+    x2 = int(clamp(box.x + box.width + pad_x, x1 + 1, image.width))
+    y2 = int(clamp(box.y + box.height + pad_y, y1 + 1, image.height))
+    crop = image.crop((x1, y1, x2, y2))
+    scale = tile / float(max(crop.width, crop.height))
+    size = (max(1, round(crop.width * scale)), max(1, round(crop.height * scale)))
+    crop = crop.resize(size, Image.BILINEAR)
+    canvas = Image.new("RGB", (tile, tile), TILE_BACKGROUND)
+    canvas.paste(crop, ((tile - size[0]) // 2, (tile - size[1]) // 2))
+    return canvas
+
+
+def build_grid(tiles: list[Image.Image], columns: int = DEFAULT_COLUMNS, tile: int = DEFAULT_TILE) -> Image.Image:
+    """Row-major grid with each tile's 1-based index drawn top-left."""
+    columns = max(1, min(columns, len(tiles)))
+    rows = (len(tiles) + columns - 1) // columns
+    grid = Image.new("RGB", (columns * tile, rows * tile), (0, 0, 0))
+    draw = ImageDraw.Draw(grid)
+    for index, image in enumerate(tiles):
+        x, y = (index % columns) * tile, (index // columns) * tile
+        grid.paste(image, (x, y))
+        draw.rectangle((x, y, x + tile - 1, y + tile - 1), outline=(255, 255, 255))
+        draw.rectangle((x + 1, y + 1, x + 22, y + 14), fill=(0, 0, 0))
+        draw.text((x + 3, y + 2), str(index + 1), fill=(255, 255, 0))
+    return grid
+
+
+def render_grids(
+    crops: list[CropRef], per_grid: int = DEFAULT_PER_GRID, columns: int = DEFAULT_COLUMNS, tile: int = DEFAULT_TILE
+) -> Iterator[tuple[list[CropRef], Image.Image]]:
+    """Yield (crops, grid) chunks; crops should be grouped by frame so each frame is decoded once."""
+    current_path: Path | None = None
+    frame: Image.Image | None = None
+    for start in range(0, len(crops), per_grid):
+        chunk = crops[start:start + per_grid]
+        tiles: list[Image.Image] = []
+        for crop in chunk:
+            if crop.frame_path != current_path:
+                with Image.open(crop.frame_path) as img:
+                    frame = img.convert("RGB")
+                current_path = crop.frame_path
+            assert frame is not None
+            tiles.append(crop_tile(frame, crop.box, tile))
+        yield chunk, build_grid(tiles, columns, tile)
+
+
+def encode_grid_base64(grid: Image.Image, quality: int = GRID_JPEG_QUALITY) -> str:
+    buffer = io.BytesIO()
+    grid.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
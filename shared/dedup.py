@@ -0,0 +1,190 @@
+"""Perceptual-hash near-duplicate frame index.
+
+Frames are hashed with a 64-bit dHash or pHash, computed in batches with numpy.
+Near-duplicate lookup uses multi-index hashing: with a Hamming threshold r, the hash
+is split into r + 1 chunks and, by the pigeonhole principle, any hash within r
+bits of a query matches it exactly on at least one chunk. Only frames sharing a
+chunk bucket are compared, instead of all n^2 pairs.
+
+The index is persisted next to the frames and is incremental: frames are keyed by
+content hash, so re-running after new frames are added only hashes the new ones.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from shared.manifest import DEDUP_INDEX_NAME, list_frames, load_manifest
+from shared.utils import PipelineError
+
+HASH_METHODS = ("dhash", "phash")
+DEFAULT_THRESHOLD = 4
+HASH_BATCH = 512
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _load_gray(frame_path: Path, size: tuple[int, int]) -> np.ndarray:
+    with Image.open(frame_path) as img:
+        # JPEG draft mode decodes at 1/2..1/8 scale, which is all a perceptual hash needs.
+        img.draft("L", (size[0] * 4, size[1] * 4))
+        return np.asarray(img.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(N, 64) bool -> (N,) uint64, first bit most significant."""
+    return np.packbits(bits.astype(np.uint8), axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def dhash_batch(pixels: np.ndarray) -> np.ndarray:
+    """Difference hash of (N, 8, 9) grayscale thumbnails: is each pixel brighter than its right neighbour."""
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    return _pack_bits(bits.reshape(len(pixels), 64))
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash_batch(pixels: np.ndarray) -> np.ndarray:
+    """DCT hash of (N, 32, 32) grayscale thumbnails: low 8x8 frequencies above their median."""
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT32, pixels, _DCT32)[:, :8, :8].reshape(len(pixels), 64)
+    # Exclude the DC term from the median so overall brightness does not dominate.
+    medians = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(coeffs > medians)
+
+
+def hash_frames(frames: list[Path], method: str = "dhash") -> np.ndarray:
+    size = (9, 8) if method == "dhash" else (32, 32)
+    hasher = dhash_batch if method == "dhash" else phash_batch
+    hashes = np.zeros(len(frames), dtype=np.uint64)
+    for start in range(0, len(frames), HASH_BATCH):
+        batch = frames[start:start + HASH_BATCH]
+        pixels = np.stack([_load_gray(frame, size) for frame in batch])
+        hashes[start:start + len(batch)] = hasher(pixels)
+    return hashes
+
+
+def hamming(query: int, hashes: np.ndarray) -> np.ndarray:
+    """Hamming distance between one 64-bit hash and an array of hashes."""
+    xor = np.bitwise_xor(hashes, np.uint64(query))
+    return _POPCOUNT_TABLE[xor.view(np.uint8)].reshape(len(hashes), 8).sum(axis=1)
+
+
+class MultiIndexHash:
+    """Exact r-neighbour search over 64-bit hashes with r + 1 chunk hash tables."""
+
+    def __init__(self, threshold: int) -> None:
+        self.threshold = threshold
+        chunks = min(threshold + 1, 64)
+        bounds = np.linspace(0, 64, chunks + 1).astype(int)
+        self._spans = [(int(lo), int(hi - lo)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._tables: list[dict[int, list[int]]] = [{} for _ in self._spans]
+        self._hashes: list[int] = []
+        self.ids: list[str] = []
+
+    def _chunks(self, value: int) -> list[int]:
+        return [(value >> (64 - lo - width)) & ((1 << width) - 1) for lo, width in self._spans]
+
+    def add(self, item_id: str, value: int) -> None:
+        slot = len(self._hashes)
+        self._hashes.append(value)
+        self.ids.append(item_id)
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(slot)
+
+    def nearest(self, value: int) -> tuple[str, int] | None:
+        """Closest indexed item within the threshold, as (id, distance)."""
+        candidates: set[int] = set()
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            candidates.update(table.get(chunk, ()))
+        if not candidates:
+            return None
+        slots = np.fromiter(candidates, dtype=np.int64)
+        distances = hamming(value, np.array(self._hashes, dtype=np.uint64)[slots])
+        best = int(np.argmin(distances))
+        if distances[best] > self.threshold:
+            return None
+        return self.ids[int(slots[best])], int(distances[best])
+
+
+def _content_hashes(frames_dir: Path, frames: list[Path]) -> dict[str, str]:
+    records = load_manifest(frames_dir) or []
+    known = {record.file: record.sha1 for record in records}
+    return {
+        frame.name: known.get(frame.name) or hashlib.sha1(frame.read_bytes()).hexdigest()
+        for frame in frames
+    }
+
+
+def update_dedup_index(
+    frames_dir: Path,
+    frames: list[Path],
+    method: str = "dhash",
+    threshold: int = DEFAULT_THRESHOLD,
+) -> dict[str, int]:
+    """Hash frames not yet in the index and mark near-duplicates of earlier frames.
+
+    Returns counts: total frames, newly hashed frames and duplicates.
+    """
+    index_path = frames_dir / DEDUP_INDEX_NAME
+    entries: dict[str, dict] = {}
+    if index_path.exists():
+        try:
+            saved = json.loads(index_path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            saved = {}
+        if saved.get("method") == method:
+            entries = saved.get("frames", {})
+
+    content = _content_hashes(frames_dir, frames)
+    stale = [f for f in frames if entries.get(f.name, {}).get("sha1") != content[f.name]]
+    if stale:
+        for frame, value in zip(stale, hash_frames(stale, method)):
+            entries[frame.name] = {"sha1": content[frame.name], "hash": f"{int(value):016x}"}
+
+    # Decisions are replayed in frame order so the earliest copy of a scene is the one kept.
+    names = {frame.name for frame in frames}
+    index = MultiIndexHash(threshold)
+    duplicates = 0
+    for frame in frames:
+        entry = entries[frame.name]
+        value = int(entry["hash"], 16)
+        match = index.nearest(value)
+        if match is None:
+            entry["duplicate_of"] = None
+            index.add(frame.name, value)
+        else:
+            entry["duplicate_of"] = match[0]
+            duplicates += 1
+
+    payload = {
+        "method": method,
+        "threshold": threshold,
+        "frames": {name: entry for name, entry in entries.items() if name in names},
+    }
+    tmp_path = index_path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+    tmp_path.replace(index_path)
+    return {"frames": len(frames), "hashed": len(stale), "duplicates": duplicates}
+
+
+def dedup_from_config(config: dict, frames_dir: Path) -> dict[str, int]:
+    """Update the index with `dedup_hash` (dhash/phash) and `dedup_threshold` from config."""
+    method = str(config.get("dedup_hash", "dhash")).strip().lower()
+    if method not in HASH_METHODS:
+        raise PipelineError(f"Unsupported dedup_hash: {method}")
+    threshold = int(config.get("dedup_threshold", DEFAULT_THRESHOLD))
+    return update_dedup_index(frames_dir, list_frames(frames_dir, include_duplicates=True), method, threshold)
@@ -0,0 +1,92 @@
+"""Vectorized box geometry helpers (IoU, matching) on top of numpy."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from shared.utils import BoundingBox
+
+
+def boxes_to_xyxy(boxes: list[BoundingBox]) -> np.ndarray:
+    """Convert pixel x/y/width/height boxes to an (N, 4) float array of x1, y1, x2, y2."""
+    if not boxes:
+        return np.zeros((0, 4), dtype=np.float64)
+    arr = np.array([[b.x, b.y, b.width, b.height] for b in boxes], dtype=np.float64)
+    arr[:, 2:] += arr[:, :2]
+    return arr
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays, returned as (N, M)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float64)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_match(iou: np.ndarray, threshold: float = 0.5) -> list[tuple[int, int]]:
+    """One-to-one matches (row, col) taken in descending IoU order above `threshold`."""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_rows: set[int] = set()
+    used_cols: set[int] = set()
+    matches: list[tuple[int, int]] = []
+    for i in order:
+        r, c = int(rows[i]), int(cols[i])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matches.append((r, c))
+    return matches
+
+
+def count_matches(
+    reference: list[BoundingBox],
+    predicted: list[BoundingBox],
+    threshold: float = 0.5,
+) -> int:
+    """Number of reference boxes recovered by same-class predictions at IoU >= threshold."""
+    matched = 0
+    for class_name in {b.class_name for b in reference}:
+        ref = [b for b in reference if b.class_name == class_name]
+        pred = [b for b in predicted if b.class_name == class_name]
+        iou = iou_matrix(boxes_to_xyxy(ref), boxes_to_xyxy(pred))
+        matched += len(greedy_match(iou, threshold))
+    return matched
+
+
+def nms(xyxy: np.ndarray, iou_threshold: float, scores: np.ndarray | None = None) -> list[int]:
+    """Indices kept by greedy NMS, best score first (input order when no scores are given)."""
+    if len(xyxy) == 0:
+        return []
+    order = np.argsort(-scores, kind="stable") if scores is not None else np.arange(len(xyxy))
+    iou = iou_matrix(xyxy, xyxy)
+    suppressed = np.zeros(len(xyxy), dtype=bool)
+    keep: list[int] = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(int(i))
+        suppressed |= iou[i] > iou_threshold
+    return keep
+
+
+def per_class_nms(
+    boxes: list[BoundingBox], iou_threshold: float, scores: list[float] | None = None
+) -> list[BoundingBox]:
+    """Drop same-class boxes overlapping an earlier (or higher-scoring) one above `iou_threshold`."""
+    keep: set[int] = set()
+    for class_name in {b.class_name for b in boxes}:
+        idx = [i for i, b in enumerate(boxes) if b.class_name == class_name]
+        class_scores = np.array([scores[i] for i in idx]) if scores is not None else None
+        kept = nms(boxes_to_xyxy([boxes[i] for i in idx]), iou_threshold, class_scores)
+        keep.update(idx[k] for k in kept)
+    return [b for i, b in enumerate(boxes) if i in keep]
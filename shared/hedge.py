@@ -0,0 +1,165 @@
+"""Hedged requests for async API calls.
+
+When a call has not returned after the rolling p95 of recent call latencies, a
+duplicate is issued; whichever finishes first wins and the other is cancelled.
+Every call also gets a hard timeout. Hedging needs a baseline, so nothing is
+hedged until `min_samples` latencies have been recorded. Given the caller's
+concurrency semaphore, a hedge takes a slot of its own and is skipped when none
+is free, so hedges never push requests in flight past the bound.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_QUANTILE = 0.95
+DEFAULT_WINDOW = 200
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_TIMEOUT = 120.0
+# Histogram bucket upper bounds in seconds: 10 ms doubling up to ~5.5 min.
+HISTOGRAM_BOUNDS = [0.01 * (2 ** i) for i in range(16)]
+
+
+class LatencyHistogram:
+    """Cumulative log-bucket histogram plus a rolling window for the adaptive threshold."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW) -> None:
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.recent: deque[float] = deque(maxlen=window)
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+        self.recent.append(seconds)
+        self.total += 1
+
+    def rolling_quantile(self, q: float) -> float | None:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile of every recorded call."""
+        if not self.total:
+            return None
+        target = q * self.total
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS + [math.inf], self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return math.inf
+
+    def summary(self) -> str:
+        if not self.total:
+            return "no calls"
+        parts = []
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = self.quantile(q)
+            parts.append(f"{label} <= {value * 1000:.0f} ms" if value != math.inf else f"{label} > 5 min")
+        return f"{self.total} calls, " + ", ".join(parts)
+
+
+class Hedger:
+    """Run awaitables with one hedge after the adaptive delay and a hard timeout."""
+
+    def __init__(
+        self,
+        quantile: float = DEFAULT_QUANTILE,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        timeout: float = DEFAULT_TIMEOUT,
+        window: int = DEFAULT_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.latency = LatencyHistogram(window)
+        self._clock = clock
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+        self.timeouts = 0
+
+    def hedge_delay(self) -> float | None:
+        if len(self.latency.recent) < self.min_samples:
+            return None
+        return self.latency.rolling_quantile(self.quantile)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], semaphore: asyncio.Semaphore | None = None) -> T:
+        """Await `fn()`, hedged; the primary call already holds one of `semaphore`'s slots."""
+        start = self._clock()
+        deadline = start + self.timeout
+        primary = asyncio.ensure_future(fn())
+        started = {primary: start}
+        tasks = [primary]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and delay < self.timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and semaphore is not None and semaphore.locked():
+                    self.hedges_skipped += 1
+                elif not done:
+                    if semaphore is not None:
+                        await semaphore.acquire()  # free, so this does not wait
+                    hedge = asyncio.ensure_future(fn())
+                    if semaphore is not None:
+                        # A done callback also runs if the hedge is cancelled before it starts.
+                        hedge.add_done_callback(lambda _: semaphore.release())
+                    started[hedge] = self._clock()
+                    tasks.append(hedge)
+                    self.hedged += 1
+
+            last_error: BaseException | None = None
+            while tasks:
+                remaining = deadline - self._clock()
+                done, _ = await asyncio.wait(
+                    tasks, timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self.timeouts += 1
+                    raise TimeoutError(f"Request exceeded {self.timeout:g}s timeout.")
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        self.latency.record(self._clock() - started[task])
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+            # Every attempt failed: surface the last error to the caller's retry policy.
+            assert last_error is not None
+            raise last_error
+        finally:
+            now = self._clock()
+            for task in tasks:
+                task.cancel()
+                # A cancelled call was at least this slow; recording it keeps the tail
+                # in the window so hedging does not feed on its own success.
+                self.latency.record(now - started[task])
+
+    def summary(self) -> str:
+        hedges = f"{self.hedged} hedged ({self.hedge_wins} won)"
+        if self.hedges_skipped:
+            hedges += f", {self.hedges_skipped} not hedged at max_in_flight"
+        timeouts = f", {self.timeouts} timed out" if self.timeouts else ""
+        return f"{self.latency.summary()}; {hedges}{timeouts}"
+
+
+def hedger_from_config(config: dict[str, Any]) -> Hedger | None:
+    """`hedge: true` enables hedging with `hedge_quantile`, `hedge_min_samples`, `request_timeout`."""
+    if not config.get("hedge", False):
+        return None
+    return Hedger(
+        quantile=float(config.get("hedge_quantile", DEFAULT_QUANTILE)),
+        min_samples=int(config.get("hedge_min_samples", DEFAULT_MIN_SAMPLES)),
+        timeout=float(config.get("request_timeout", DEFAULT_TIMEOUT)),
+    )
@@ -0,0 +1,108 @@
+"""Frame manifest written by collect and read by downstream stages.
+
+`frames/manifest.jsonl` holds one JSON object per extracted frame (index, file name,
+source timestamp, width, height, byte size, content hash), so later stages can list
+frames and look up their metadata without globbing or decoding images again.
+`list_frames` hands the recorded dimensions to `read_image_dimensions`, so label
+writers and upload encoders do not re-read frame headers; preview_labels shows the
+timestamp.
+
+`frames/dedup_index.json`, written by the optional dedup stage (shared/dedup.py),
+marks near-duplicate frames; `list_frames` leaves them out so they are neither
+labeled nor trained on.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from shared.utils import read_image_dimensions, remember_image_dimensions
+
+MANIFEST_NAME = "manifest.jsonl"
+DEDUP_INDEX_NAME = "dedup_index.json"
+
+
+@dataclass
+class FrameRecord:
+    index: int
+    file: str
+    timestamp: float
+    width: int
+    height: int
+    size: int
+    sha1: str
+
+
+def build_record(frame_path: Path, index: int, timestamp: float) -> FrameRecord:
+    data = frame_path.read_bytes()
+    width, height = read_image_dimensions(frame_path)
+    return FrameRecord(
+        index=index,
+        file=frame_path.name,
+        timestamp=round(timestamp, 3),
+        width=width,
+        height=height,
+        size=len(data),
+        sha1=hashlib.sha1(data).hexdigest(),
+    )
+
+
+def write_manifest(frames_dir: Path, records: list[FrameRecord]) -> Path:
+    manifest_path = frames_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".jsonl.tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(asdict(record), separators=(",", ":")) + "\n")
+    tmp_path.replace(manifest_path)
+    return manifest_path
+
+
+def load_manifest(frames_dir: Path) -> list[FrameRecord] | None:
+    """Return the manifest records in frame order, or None if there is no usable manifest."""
+    manifest_path = frames_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    records: list[FrameRecord] = []
+    try:
+        for line in manifest_path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                records.append(FrameRecord(**json.loads(line)))
+    except (json.JSONDecodeError, TypeError):
+        return None
+    records.sort(key=lambda record: record.index)
+    return records
+
+
+def load_duplicates(frames_dir: Path) -> set[str]:
+    """File names the dedup index marked as near-duplicates of an earlier frame."""
+    index_path = frames_dir / DEDUP_INDEX_NAME
+    if not index_path.exists():
+        return set()
+    try:
+        entries = json.loads(index_path.read_text(encoding="utf-8")).get("frames", {})
+    except (json.JSONDecodeError, AttributeError):
+        return set()
+    return {name for name, entry in entries.items() if entry.get("duplicate_of")}
+
+
+def list_frames(frames_dir: Path, include_duplicates: bool = False) -> list[Path]:
+    """Frame images in order: from the manifest when collect wrote one, else a directory glob.
+
+    Worktrees created by dispatch.sh only receive the frame images, so the glob
+    fallback keeps subagents working without a manifest. Near-duplicates recorded
+    in the dedup index are skipped unless `include_duplicates` is set.
+    """
+    records = load_manifest(frames_dir)
+    if records is None:
+        frames = sorted(frames_dir.glob("*.jpg"))
+    else:
+        frames = [frames_dir / record.file for record in records]
+        for frame, record in zip(frames, records):
+            remember_image_dimensions(frame, record.size, record.width, record.height)
+    if include_duplicates:
+        return frames
+    duplicates = load_duplicates(frames_dir)
+    return [frame for frame in frames if frame.name not in duplicates]
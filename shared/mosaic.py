@@ -0,0 +1,203 @@
+"""Pack several frames into one composite image so one request labels all of them.
+
+Frames are fitted into equal cells of a near-square grid, separated by solid
+gutters. Each frame's cell offset and scale are kept, so boxes the model returns
+in composite pixels can be split back to their source frames. A box that reaches
+across a gutter into a neighbouring cell cannot belong to one frame and is dropped.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, TypeVar
+
+from PIL import Image
+
+from shared.utils import read_image_dimensions
+
+B = TypeVar("B")
+
+DEFAULT_FRAMES = 1  # 1 disables mosaics
+DEFAULT_MAX_EDGE = 2048
+DEFAULT_GUTTER = 8
+SEAM_TOLERANCE = 0.02  # overhang allowed past a cell edge, as a fraction of the cell size
+MOSAIC_JPEG_QUALITY = 90
+GUTTER_COLOR = (0, 0, 0)
+
+MOSAIC_NOTE_TEMPLATE = """
+This image is a {rows}x{columns} grid of {count} separate video frames divided by black bars.
+Treat each cell as its own frame: no box may cross a black bar. Coordinates are pixels of the whole grid image.
+""".strip()
+
+
+@dataclass(frozen=True)
+class MosaicTile:
+    frame_path: Path
+    x: int  # cell offset in the composite
+    y: int
+    width: int  # size of the frame as placed in the composite
+    height: int
+    scale: float  # composite pixels per original-frame pixel
+
+
+@dataclass
+class Mosaic:
+    path: Path
+    tiles: list[MosaicTile]
+    rows: int
+    columns: int
+
+    @property
+    def frames(self) -> list[Path]:
+        return [tile.frame_path for tile in self.tiles]
+
+    @property
+    def note(self) -> str:
+        return MOSAIC_NOTE_TEMPLATE.format(rows=self.rows, columns=self.columns, count=len(self.tiles))
+
+    def split(self, boxes: list[B]) -> tuple[dict[Path, list[B]], int]:
+        return split_boxes(boxes, self.tiles)
+
+
+@dataclass
+class MosaicStats:
+    mosaics: int = 0
+    frames: int = 0
+    boxes_kept: int = 0
+    boxes_dropped: int = 0
+
+    def record(self, mosaic: Mosaic, kept: int, dropped: int) -> None:
+        self.mosaics += 1
+        self.frames += len(mosaic.tiles)
+        self.boxes_kept += kept
+        self.boxes_dropped += dropped
+
+    def summary(self) -> str:
+        per = self.frames / self.mosaics if self.mosaics else 0.0
+        return (
+            f"{self.frames} frames in {self.mosaics} mosaics ({per:.1f} frames/request); "
+            f"{self.boxes_dropped} seam-crossing boxes dropped, {self.boxes_kept} kept"
+        )
+
+
+def grid_shape(count: int) -> tuple[int, int]:
+    """(rows, columns) of the most square grid holding `count` cells."""
+    columns = max(1, math.ceil(math.sqrt(count)))
+    return math.ceil(count / columns), columns
+
+
+def build_mosaic(
+    frames: list[Path],
+    out_path: Path,
+    max_edge: int = DEFAULT_MAX_EDGE,
+    gutter: int = DEFAULT_GUTTER,
+) -> Mosaic:
+    """Write the composite of `frames` to `out_path`; cells are sized from the first frame."""
+    rows, columns = grid_shape(len(frames))
+    cell_w, cell_h = read_image_dimensions(frames[0])
+    scale = min(
+        1.0,
+        (max_edge - gutter * (columns - 1)) / float(cell_w * columns),
+        (max_edge - gutter * (rows - 1)) / float(cell_h * rows),
+    )
+    cell_w, cell_h = max(1, int(cell_w * scale)), max(1, int(cell_h * scale))
+
+    canvas_size = (columns * cell_w + (columns - 1) * gutter, rows * cell_h + (rows - 1) * gutter)
+    canvas = Image.new("RGB", canvas_size, GUTTER_COLOR)
+    tiles: list[MosaicTile] = []
+    for index, frame_path in enumerate(frames):
+        x = (index % columns) * (cell_w + gutter)
+        y = (index // columns) * (cell_h + gutter)
+        # Frames of another size are fitted into the cell, keeping their aspect ratio.
+        frame_w, frame_h = read_image_dimensions(frame_path)
+        tile_scale = min(cell_w / float(frame_w), cell_h / float(frame_h))
+        size = (max(1, min(cell_w, round(frame_w * tile_scale))), max(1, min(cell_h, round(frame_h * tile_scale))))
+        with Image.open(frame_path) as img:
+            img.draft("RGB", size)
+            image = img.convert("RGB")
+        if image.size != size:
+            image = image.resize(size, Image.BICUBIC, reducing_gap=2.0)
+        canvas.paste(image, (x, y))
+        tiles.append(MosaicTile(frame_path, x, y, size[0], size[1], tile_scale))
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    canvas.save(out_path, format="JPEG", quality=MOSAIC_JPEG_QUALITY)
+    return Mosaic(out_path, tiles, rows, columns)
+
+
+def _owner(tiles: list[MosaicTile], cx: float, cy: float) -> MosaicTile | None:
+    for tile in tiles:
+        if tile.x <= cx < tile.x + tile.width and tile.y <= cy < tile.y + tile.height:
+            return tile
+    return None
+
+
+def split_boxes(boxes: list[B], tiles: list[MosaicTile]) -> tuple[dict[Path, list[B]], int]:
+    """Map composite-pixel boxes back to their frames; returns (boxes per frame, dropped count).
+
+    A box belongs to the tile holding its center. Boxes centered in a gutter, or
+    overhanging their tile by more than SEAM_TOLERANCE of its size, are dropped.
+    """
+    per_frame: dict[Path, list[B]] = {tile.frame_path: [] for tile in tiles}
+    dropped = 0
+    for box in boxes:
+        x1, y1 = box.x, box.y
+        x2, y2 = x1 + box.width, y1 + box.height
+        tile = _owner(tiles, (x1 + x2) / 2.0, (y1 + y2) / 2.0)
+        if tile is None:
+            dropped += 1
+            continue
+        slack_x, slack_y = tile.width * SEAM_TOLERANCE, tile.height * SEAM_TOLERANCE
+        if (
+            x1 < tile.x - slack_x
+            or y1 < tile.y - slack_y
+            or x2 > tile.x + tile.width + slack_x
+            or y2 > tile.y + tile.height + slack_y
+        ):
+            dropped += 1
+            continue
+        x1, x2 = max(x1, tile.x), min(x2, tile.x + tile.width)
+        y1, y2 = max(y1, tile.y), min(y2, tile.y + tile.height)
+        per_frame[tile.frame_path].append(
+            replace(
+                box,
+                x=(x1 - tile.x) / tile.scale,
+                y=(y1 - tile.y) / tile.scale,
+                width=(x2 - x1) / tile.scale,
+                height=(y2 - y1) / tile.scale,
+            )
+        )
+    return per_frame, dropped
+
+
+def group_frames(frames: list[Path], k: int) -> list[list[Path]]:
+    k = max(1, k)
+    return [frames[i:i + k] for i in range(0, len(frames), k)]
+
+
+@dataclass
+class MosaicSettings:
+    frames: int = DEFAULT_FRAMES
+    max_edge: int = DEFAULT_MAX_EDGE
+    gutter: int = DEFAULT_GUTTER
+    work_dir: Path = field(default_factory=lambda: Path("output") / ".cache" / "mosaics")
+
+    @property
+    def enabled(self) -> bool:
+        return self.frames > 1
+
+    def build(self, frames: list[Path]) -> Mosaic:
+        name = f"mosaic_{frames[0].stem}_{len(frames)}.jpg"
+        return build_mosaic(frames, self.work_dir / name, self.max_edge, self.gutter)
+
+
+def mosaic_settings_from_config(config: dict[str, Any], output_dir: Path) -> MosaicSettings:
+    """`mosaic_frames: K` (>1) packs K frames per request; `mosaic_max_edge`, `mosaic_gutter` shape the grid."""
+    return MosaicSettings(
+        frames=max(1, int(config.get("mosaic_frames", DEFAULT_FRAMES))),
+        max_edge=max(256, int(config.get("mosaic_max_edge", DEFAULT_MAX_EDGE))),
+        gutter=max(0, int(config.get("mosaic_gutter", DEFAULT_GUTTER))),
+        work_dir=output_dir / ".cache" / "mosaics",
+    )
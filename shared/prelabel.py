@@ -0,0 +1,133 @@
+"""Pre-label unlabeled frames with the YOLO model trained in a previous iteration.
+
+Frames are run through `weights/best.pt` on CPU in batches. A frame is accepted
+when it has at least one detection and every detection is a known class scoring
+at least `confidence`; its boxes are then used as labels. Frames with a
+low-scoring detection, or none at all, are left for the VLM labelers.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from shared.utils import BoundingBox
+
+DEFAULT_CONFIDENCE = 0.7
+# Detections down to this score are looked at; one between here and `confidence`
+# marks the frame uncertain instead of silently dropping the box.
+DEFAULT_FLOOR = 0.1
+DEFAULT_BATCH = 16
+DEFAULT_IMGSZ = 640
+PRELABEL_REPORT_NAME = "prelabel_report.json"
+
+
+@dataclass
+class PrelabelResult:
+    accepted: dict[Path, list[BoundingBox]] = field(default_factory=dict)
+    uncertain: list[Path] = field(default_factory=list)
+    empty: list[Path] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return len(self.accepted) + len(self.uncertain) + len(self.empty)
+
+
+def _detections(result: Any) -> list[tuple[str, float, list[float]]]:
+    """(class name, score, xyxy) for one ultralytics Results object."""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+    names = result.names
+    xyxy = boxes.xyxy.cpu().tolist()
+    scores = boxes.conf.cpu().tolist()
+    class_ids = boxes.cls.cpu().tolist()
+    return [(str(names[int(c)]), float(s), coords) for c, s, coords in zip(class_ids, scores, xyxy)]
+
+
+def classify_frame(
+    detections: list[tuple[str, float, list[float]]],
+    known_classes: set[str],
+    confidence: float,
+) -> list[BoundingBox] | None:
+    """Boxes when the frame can be auto-accepted, else None."""
+    if not detections:
+        return None
+    boxes: list[BoundingBox] = []
+    for name, score, (x1, y1, x2, y2) in detections:
+        if score < confidence or name not in known_classes:
+            return None
+        boxes.append(BoundingBox(class_name=name, x=x1, y=y1, width=x2 - x1, height=y2 - y1))
+    return boxes
+
+
+def prelabel_frames(
+    weights: Path,
+    frames: list[Path],
+    known_classes: set[str],
+    confidence: float = DEFAULT_CONFIDENCE,
+    batch_size: int = DEFAULT_BATCH,
+    imgsz: int = DEFAULT_IMGSZ,
+    model: Any = None,
+) -> PrelabelResult:
+    if model is None:
+        from ultralytics import YOLO
+
+        model = YOLO(str(weights))
+    floor = min(DEFAULT_FLOOR, confidence)
+    result = PrelabelResult()
+    for start in range(0, len(frames), batch_size):
+        batch = frames[start:start + batch_size]
+        predictions = model.predict(
+            [str(frame) for frame in batch], device="cpu", conf=floor, imgsz=imgsz, verbose=False
+        )
+        for frame_path, prediction in zip(batch, predictions):
+            detections = _detections(prediction)
+            if not detections:
+                result.empty.append(frame_path)
+                continue
+            boxes = classify_frame(detections, known_classes, confidence)
+            if boxes is None:
+                result.uncertain.append(frame_path)
+            else:
+                result.accepted[frame_path] = boxes
+    return result
+
+
+def append_report(output_dir: Path, weights: Path, result: PrelabelResult, calls_saved: float) -> dict[str, Any]:
+    """Append this pass to `prelabel_report.json` (one entry per iteration) and return it.
+
+    `calls_saved` is the labeler's estimated request count for the accepted frames.
+    """
+    path = output_dir / PRELABEL_REPORT_NAME
+    history: list[dict[str, Any]] = []
+    if path.exists():
+        try:
+            history = json.loads(path.read_text(encoding="utf-8")).get("iterations", [])
+        except (json.JSONDecodeError, AttributeError):
+            history = []
+    entry = {
+        "iteration": len(history) + 1,
+        "weights_mtime": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(weights.stat().st_mtime)),
+        "frames": result.total,
+        "auto_labeled": len(result.accepted),
+        "uncertain": len(result.uncertain),
+        "no_detections": len(result.empty),
+        "auto_labeled_share": round(len(result.accepted) / result.total, 4) if result.total else 0.0,
+        "api_calls_saved": round(calls_saved),
+    }
+    history.append(entry)
+    path.write_text(json.dumps({"iterations": history}, indent=2), encoding="utf-8")
+    return entry
+
+
+def prelabel_settings(config: dict[str, Any]) -> dict[str, Any]:
+    """`prelabel_confidence`, `prelabel_batch`, `prelabel_imgsz`."""
+    return {
+        "confidence": float(config.get("prelabel_confidence", DEFAULT_CONFIDENCE)),
+        "batch_size": max(1, int(config.get("prelabel_batch", DEFAULT_BATCH))),
+        "imgsz": int(config.get("prelabel_imgsz", DEFAULT_IMGSZ)),
+    }
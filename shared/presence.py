@@ -0,0 +1,122 @@
+"""Cheap class-presence pass that gates per-class localization requests.
+
+Before the per-class calls for a frame, one low-detail request with a downscaled
+copy of the frame and a tiny schema asks which configured classes appear at all.
+Only those classes then get a full-resolution localization call; most classes are
+absent from most frames, so most per-class calls are skipped.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import threading
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from shared.utils import extract_json_from_text
+
+DEFAULT_LONG_SIDE = 384
+DEFAULT_QUALITY = 70
+
+PRESENCE_PROMPT_TEMPLATE = """
+Which of these object classes are visible anywhere in this video game frame: {class_list}?
+List every class with at least one instance, even a small or partly hidden one.
+When unsure, include the class. Return an empty list only if none are visible.
+""".strip()
+
+
+def _normalize(class_name: str) -> str:
+    return str(class_name).strip().lower().replace(" ", "_")
+
+
+def build_presence_prompt(classes: list[str]) -> str:
+    return PRESENCE_PROMPT_TEMPLATE.format(class_list=", ".join(_normalize(c) for c in classes))
+
+
+def build_presence_schema(classes: list[str]) -> dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "name": "class_presence",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "present": {
+                    "type": "array",
+                    "items": {"type": "string", "enum": [_normalize(c) for c in classes]},
+                }
+            },
+            "required": ["present"],
+            "additionalProperties": False,
+        },
+    }
+
+
+def encode_lowres_base64(
+    frame_path: Path, long_side: int = DEFAULT_LONG_SIDE, quality: int = DEFAULT_QUALITY
+) -> tuple[str, tuple[int, int]]:
+    """JPEG of the frame shrunk to `long_side`, as base64, with the encoded size."""
+    with Image.open(frame_path) as img:
+        img.draft("RGB", (long_side, long_side))
+        image = img.convert("RGB")
+    image.thumbnail((long_side, long_side), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8"), image.size
+
+
+def parse_present(output_text: str, classes: list[str]) -> list[str]:
+    """Configured classes (original spelling, config order) the response marks present."""
+    present = {_normalize(name) for name in extract_json_from_text(output_text).get("present", [])}
+    return [c for c in classes if _normalize(c) in present]
+
+
+class PresenceGate:
+    """Presence-pass settings plus per-frame counts of per-class calls made and avoided.
+
+    Counts are keyed by frame, so a frame that is retried is only counted once.
+    """
+
+    def __init__(self, long_side: int = DEFAULT_LONG_SIDE, quality: int = DEFAULT_QUALITY) -> None:
+        self.long_side = long_side
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._frames: dict[str, tuple[int, int]] = {}
+
+    def record(self, frame_name: str, requested: int, present: int) -> None:
+        with self._lock:
+            self._frames[frame_name] = (requested, present)
+
+    @property
+    def gate_calls(self) -> int:
+        return len(self._frames)
+
+    @property
+    def calls_made(self) -> int:
+        return sum(present for _, present in self._frames.values())
+
+    @property
+    def calls_avoided(self) -> int:
+        return sum(requested - present for requested, present in self._frames.values())
+
+    def summary(self) -> str:
+        with self._lock:
+            requested = sum(r for r, _ in self._frames.values())
+        net = self.calls_avoided - self.gate_calls
+        return (
+            f"{self.gate_calls} presence calls; {self.calls_made}/{requested} per-class calls made, "
+            f"{self.calls_avoided} avoided ({net} fewer requests overall)"
+        )
+
+
+def presence_gate_from_config(config: dict[str, Any]) -> PresenceGate | None:
+    """`presence_gate: true` enables the pass; `presence_long_side`, `presence_quality` tune the image."""
+    if not config.get("presence_gate", False):
+        return None
+    return PresenceGate(
+        long_side=max(64, int(config.get("presence_long_side", DEFAULT_LONG_SIDE))),
+        quality=int(config.get("presence_quality", DEFAULT_QUALITY)),
+    )
@@ -0,0 +1,265 @@
+"""Token-bucket rate limiting for the API labelers (requests/min + tokens/min)."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Mapping, TypeVar
+
+from shared.utils import PipelineError
+
+T = TypeVar("T")
+
+# Rough chars-per-token ratio for English prompts; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+DEFAULT_OUTPUT_TOKENS = 300
+MAX_RATE_LIMIT_ATTEMPTS = 6
+
+
+class RateLimitExceeded(PipelineError):
+    """Raised when a call keeps hitting 429s after all limiter retries."""
+
+
+class _Bucket:
+    """Continuous-refill token bucket. Level may go negative to queue reservations."""
+
+    def __init__(self, per_minute: float, now: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = float(per_minute)
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` and return how long the caller must wait before using it."""
+        self.refill(now)
+        # A single request larger than the bucket would otherwise never fit.
+        self.level -= min(amount, self.capacity)
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def resize(self, per_minute: float, now: float) -> None:
+        self.refill(now)
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.level = min(self.level, self.capacity)
+
+
+class RateLimiter:
+    """Enforce requests-per-minute and tokens-per-minute budgets for one model.
+
+    Either budget may be None; an unset budget is learned from the provider's
+    rate-limit headers the first time they are seen. 429 responses and
+    `retry-after` headers pause every caller sharing the limiter.
+    Thread-safe, and usable from both sync code and asyncio.
+    """
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._requests = _Bucket(rpm, now) if rpm else None
+        self._tokens = _Bucket(tpm, now) if tpm else None
+        self._configured = (rpm is not None, tpm is not None)
+        self._blocked_until = 0.0
+        self.throttled = 0
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = self._clock()
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None and tokens > 0:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Block all callers for `seconds` (e.g. after a 429 or a retry-after header)."""
+        with self._lock:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str] | None) -> None:
+        """Adapt to OpenAI-style `x-ratelimit-*` and `retry-after` response headers."""
+        if not headers:
+            return
+        lowered = {str(k).lower(): str(v) for k, v in headers.items()}
+
+        retry_after = _retry_after_seconds(lowered)
+        if retry_after:
+            self.pause(retry_after)
+
+        with self._lock:
+            now = self._clock()
+            for kind, configured_idx in (("requests", 0), ("tokens", 1)):
+                limit = _to_float(lowered.get(f"x-ratelimit-limit-{kind}"))
+                remaining = _to_float(lowered.get(f"x-ratelimit-remaining-{kind}"))
+                reset = parse_duration(lowered.get(f"x-ratelimit-reset-{kind}"))
+                bucket = self._requests if kind == "requests" else self._tokens
+
+                if limit and not self._configured[configured_idx]:
+                    if bucket is None:
+                        bucket = _Bucket(limit, now)
+                        if kind == "requests":
+                            self._requests = bucket
+                        else:
+                            self._tokens = bucket
+                    elif bucket.capacity != limit:
+                        bucket.resize(limit, now)
+
+                if bucket is not None and remaining is not None:
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, remaining)
+                if remaining is not None and remaining <= 0 and reset:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+
+    def _backoff(self, exc: BaseException, attempt: int) -> None:
+        delay = retry_after_from_error(exc)
+        if delay is None:
+            delay = min(60.0, (2 ** attempt) + random.uniform(0, 1))
+        self.pause(delay)
+
+    def call(self, fn: Callable[[], T], tokens: int = 0, attempts: int = MAX_RATE_LIMIT_ATTEMPTS) -> T:
+        """Run `fn` under the budget, retrying rate-limit errors after the advised delay."""
+        for attempt in range(attempts):
+            self.acquire(tokens)
+            try:
+                return fn()
+            except Exception as exc:  # noqa: BLE001
+                if not is_rate_limit_error(exc):
+                    raise
+                self._backoff(exc, attempt)
+        raise RateLimitExceeded(f"Still rate limited after {attempts} attempts.")
+
+    async def call_async(
+        self, fn: Callable[[], Awaitable[T]], tokens: int = 0, attempts: int = MAX_RATE_LIMIT_ATTEMPTS
+    ) -> T:
+        for attempt in range(attempts):
+            await self.acquire_async(tokens)
+            try:
+                return await fn()
+            except Exception as exc:  # noqa: BLE001
+                if not is_rate_limit_error(exc):
+                    raise
+                self._backoff(exc, attempt)
+        raise RateLimitExceeded(f"Still rate limited after {attempts} attempts.")
+
+
+def limiter_from_config(config: dict[str, Any], model: str, share: int = 1) -> RateLimiter:
+    """Build a limiter from `config["rate_limits"][model]` ({"rpm": ..., "tpm": ...}).
+
+    `share` splits the budget across that many processes labeling concurrently
+    against the same quota (e.g. dispatch.sh subagents).
+    """
+    limits = (config.get("rate_limits") or {}).get(model) or {}
+    share = max(1, int(share))
+    rpm = limits.get("rpm")
+    tpm = limits.get("tpm")
+    return RateLimiter(
+        rpm=float(rpm) / share if rpm else None,
+        tpm=float(tpm) / share if tpm else None,
+    )
+
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """OpenAI vision token cost: 85 base + 170 per 512px tile after the API's resizing."""
+    if detail == "low" or width <= 0 or height <= 0:
+        return 85
+    scale = min(1.0, 2048.0 / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768.0 / min(w, h))
+    w, h = w * scale, h * scale
+    tiles = math.ceil(w / 512.0) * math.ceil(h / 512.0)
+    return 85 + 170 * tiles
+
+
+def estimate_gemini_image_tokens(width: int, height: int) -> int:
+    """Gemini vision token cost: 258 per image up to 384px, else 258 per 768px tile."""
+    if max(width, height) <= 384:
+        return 258
+    return 258 * math.ceil(width / 768.0) * math.ceil(height / 768.0)
+
+
+def estimate_request_tokens(
+    prompt: str,
+    image_tokens: int,
+    output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+) -> int:
+    """Tokens a request counts against TPM: prompt text + image + reserved output."""
+    return len(prompt) // CHARS_PER_TOKEN + image_tokens + output_tokens
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Match openai.RateLimitError, google ResourceExhausted and generic HTTP 429s."""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        try:
+            if int(value) == 429:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return type(exc).__name__ in {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+
+
+def retry_after_from_error(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    return _retry_after_seconds({str(k).lower(): str(v) for k, v in headers.items()})
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse OpenAI reset durations such as "1s", "6m0s" or "20ms" into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    plain = _to_float(value)
+    if plain is not None:
+        return plain
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(num) * units[unit] for num, unit in parts)
+
+
+def _retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    ms = _to_float(headers.get("retry-after-ms"))
+    if ms is not None:
+        return ms / 1000.0
+    return _to_float(headers.get("retry-after"))
+
+
+def _to_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
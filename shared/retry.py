@@ -0,0 +1,231 @@
+"""Per-frame retry policy for the API labelers.
+
+A frame is retried with exponential backoff and full jitter up to a per-frame
+attempt budget. A circuit breaker shared by all workers pauses everyone after a
+run of consecutive transient API errors (5xx, timeouts, exhausted 429 retries), so
+an outage is waited out instead of burning every frame's budget. Frames that still
+fail go to a dead-letter file and the rest of the run continues; the frames stay
+unlabeled, so the next run retries them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, TypeVar
+
+from shared.ratelimit import RateLimitExceeded, is_rate_limit_error
+from shared.utils import PipelineError
+
+T = TypeVar("T")
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+DEAD_LETTER_NAME = "dead_letter.json"
+
+# Failing auth/permission/model lookups would fail every frame the same way.
+FATAL_STATUS_CODES = {401, 403, 404}
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+}
+
+
+class FatalAPIError(PipelineError):
+    """Raised for errors that retrying or skipping the frame cannot fix (bad key, unknown model)."""
+
+
+def _status_code(exc: BaseException) -> int | None:
+    for attr in ("status_code", "code"):
+        try:
+            return int(getattr(exc, attr))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    return None
+
+
+def is_fatal_error(exc: BaseException) -> bool:
+    return _status_code(exc) in FATAL_STATUS_CODES
+
+
+def is_transient_api_error(exc: BaseException) -> bool:
+    """Errors that indicate the API (not this frame) is unhealthy."""
+    if isinstance(exc, (RateLimitExceeded, ConnectionError, TimeoutError)) or is_rate_limit_error(exc):
+        return True
+    status = _status_code(exc)
+    if status is not None and status >= 500:
+        return True
+    return type(exc).__name__ in TRANSIENT_ERROR_NAMES
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # 400s (e.g. an image the API rejects) fail identically on retry.
+    return not is_fatal_error(exc) and _status_code(exc) != 400
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive transient errors from any worker and keeps
+    every caller waiting for `cooldown` seconds. Thread-safe."""
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        cooldown: float = DEFAULT_BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._open_until = 0.0
+        self.opened = 0
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._consecutive >= self.threshold:
+                self._consecutive = 0
+                self._open_until = self._clock() + self.cooldown
+                self.opened += 1
+
+    def remaining(self) -> float:
+        with self._lock:
+            return max(0.0, self._open_until - self._clock())
+
+    def wait(self) -> None:
+        delay = self.remaining()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        delay = self.remaining()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RetryPolicy:
+    """Run one frame's work with up to `attempts` tries, backing off between them."""
+
+    def __init__(
+        self,
+        attempts: int = DEFAULT_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.retries = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _after_failure(self, exc: Exception, attempt: int) -> None:
+        if is_fatal_error(exc):
+            raise FatalAPIError(f"Unrecoverable API error: {exc}") from exc
+        if self.breaker is not None and is_transient_api_error(exc):
+            self.breaker.record_failure()
+        if not is_retryable(exc) or attempt == self.attempts - 1:
+            raise exc
+        self.retries += 1
+
+    def _after_success(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def run(self, fn: Callable[[], T]) -> T:
+        for attempt in range(self.attempts):
+            if self.breaker is not None:
+                self.breaker.wait()
+            try:
+                result = fn()
+            except Exception as exc:  # noqa: BLE001
+                self._after_failure(exc, attempt)
+                time.sleep(self.backoff(attempt))
+                continue
+            self._after_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def run_async(self, fn: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self.attempts):
+            if self.breaker is not None:
+                await self.breaker.wait_async()
+            try:
+                result = await fn()
+            except Exception as exc:  # noqa: BLE001
+                self._after_failure(exc, attempt)
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            self._after_success()
+            return result
+        raise AssertionError("unreachable")
+
+
+class DeadLetter:
+    """Frames that exhausted their retry budget, persisted as `{name: {error, attempts, failed_at}}`."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if path.exists():
+            try:
+                self.entries = json.loads(path.read_text(encoding="utf-8")).get("frames", {})
+            except (json.JSONDecodeError, AttributeError):
+                self.entries = {}
+        self.added = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, frame_name: str, exc: BaseException, attempts: int) -> None:
+        self.entries[frame_name] = {
+            "error": f"{type(exc).__name__}: {exc}",
+            "attempts": attempts,
+            "failed_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.added += 1
+        self.save()
+
+    def discard(self, frame_name: str) -> None:
+        if self.entries.pop(frame_name, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        if not self.entries and not self.path.exists():
+            return
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"frames": self.entries}, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+
+def retry_policy_from_config(config: dict[str, Any]) -> RetryPolicy:
+    """`retry_attempts`, `retry_base_delay`, `retry_max_delay`, `breaker_threshold`, `breaker_cooldown`."""
+    breaker = CircuitBreaker(
+        threshold=int(config.get("breaker_threshold", DEFAULT_BREAKER_THRESHOLD)),
+        cooldown=float(config.get("breaker_cooldown", DEFAULT_BREAKER_COOLDOWN)),
+    )
+    return RetryPolicy(
+        attempts=int(config.get("retry_attempts", DEFAULT_ATTEMPTS)),
+        base_delay=float(config.get("retry_base_delay", DEFAULT_BASE_DELAY)),
+        max_delay=float(config.get("retry_max_delay", DEFAULT_MAX_DELAY)),
+        breaker=breaker,
+    )
@@ -0,0 +1,206 @@
+"""Point-prompted SAM segmentation for the CUA+SAM labeler.
+
+SAM's image encoder is the expensive part; the prompt decoder is cheap. So all
+click points for a frame, across every class, go to SAM in one call: the frame
+is read and encoded once and each point is decoded as its own object.
+
+ROI mode (`roi_window` > 0) instead segments a crop around each click, which
+gives small objects far more of SAM's input resolution. The crop starts at
+`roi_window` pixels and doubles, up to `roi_max_window`, while the mask touches a
+crop edge that is not also a frame edge. Each box is offset back to frame pixels.
+
+`sam_backend: onnx` swaps ultralytics/PyTorch for exported ONNX graphs run by
+onnxruntime (shared/sam_onnx.py); batching and ROI mode work the same on both.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from shared.utils import BoundingBox, PipelineError
+
+DEFAULT_SAM_MODEL = "sam2_b.pt"
+# The ONNX export handles SAM/MobileSAM weights only, not the SAM 2 default.
+DEFAULT_ONNX_SAM_MODEL = "mobile_sam.pt"
+SAM_BACKENDS = ("torch", "onnx")
+DEFAULT_ROI_WINDOW = 256
+DEFAULT_ROI_MAX_WINDOW = 1024
+DEFAULT_NMS_IOU = 0.7
+ROI_GROWTH = 2
+
+
+def masks_to_boxes(masks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Tight xyxy boxes (inclusive pixel indices) for an (N, H, W) mask stack, plus a non-empty flag per mask.
+
+    Reduces each mask to row/column occupancy vectors instead of listing every
+    foreground pixel, so the cost is two `any` passes over the stack.
+    """
+    masks = np.asarray(masks) > 0
+    if masks.ndim == 2:
+        masks = masks[None]
+    n, h, w = masks.shape
+    rows = masks.any(axis=2)  # (N, H)
+    cols = masks.any(axis=1)  # (N, W)
+    valid = rows.any(axis=1)
+    y1 = rows.argmax(axis=1)
+    y2 = h - 1 - rows[:, ::-1].argmax(axis=1)
+    x1 = cols.argmax(axis=1)
+    x2 = w - 1 - cols[:, ::-1].argmax(axis=1)
+    boxes = np.stack([x1, y1, x2, y2], axis=1).astype(np.float64) if n else np.zeros((0, 4), dtype=np.float64)
+    return boxes, valid
+
+
+def _bbox(xyxy: np.ndarray, offset_x: float = 0.0, offset_y: float = 0.0) -> BoundingBox:
+    x1, y1, x2, y2 = (float(v) for v in xyxy)
+    return BoundingBox(
+        class_name="",  # filled in by caller
+        x=x1 + offset_x,
+        y=y1 + offset_y,
+        width=x2 - x1,
+        height=y2 - y1,
+    )
+
+
+def mask_to_bbox(mask: np.ndarray) -> BoundingBox | None:
+    """Tight pixel box around a mask's foreground; None for an empty mask."""
+    boxes, valid = masks_to_boxes(mask[None])
+    return _bbox(boxes[0]) if valid[0] else None
+
+
+def _result_masks(results: Any) -> np.ndarray | None:
+    if not results or results[0].masks is None or len(results[0].masks.data) == 0:
+        return None
+    return results[0].masks.data.cpu().numpy()
+
+
+def roi_window(
+    point: tuple[int, int], size: int, img_w: int, img_h: int
+) -> tuple[int, int, int, int]:
+    """A `size` square (clipped to the frame) centered on `point` as x1, y1, x2, y2 (exclusive)."""
+    half = size // 2
+    x1 = min(max(0, point[0] - half), max(0, img_w - size))
+    y1 = min(max(0, point[1] - half), max(0, img_h - size))
+    return x1, y1, min(img_w, x1 + size), min(img_h, y1 + size)
+
+
+def touches_open_edge(box: np.ndarray, window: tuple[int, int, int, int], img_w: int, img_h: int) -> bool:
+    """True when the crop-space box reaches a crop edge that could still grow (is not a frame edge)."""
+    x1, y1, x2, y2 = window
+    bx1, by1, bx2, by2 = box
+    return bool(
+        (bx1 <= 0 and x1 > 0)
+        or (by1 <= 0 and y1 > 0)
+        or (bx2 >= x2 - x1 - 1 and x2 < img_w)
+        or (by2 >= y2 - y1 - 1 and y2 < img_h)
+    )
+
+
+class SamSegmenter:
+    """Ultralytics SAM, prompted with a batch of single-point objects per frame (or per ROI crop)."""
+
+    backend = "torch"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_SAM_MODEL,
+        model: Any = None,
+        roi_window: int = 0,
+        roi_max_window: int = DEFAULT_ROI_MAX_WINDOW,
+    ) -> None:
+        if model is None:
+            from ultralytics import SAM
+
+            model = SAM(model_name)
+        self.model_name = model_name
+        self.model = model
+        self.roi_window = max(0, roi_window)
+        self.roi_max_window = max(self.roi_window, roi_max_window)
+        self.frames = 0
+        self.points = 0
+        self.crops = 0
+        self.grown = 0
+
+    def segment_points(self, frame_path: Path, points: list[tuple[int, int]]) -> list[BoundingBox | None]:
+        """One box (or None) per point, in order, in frame pixels."""
+        if not points:
+            return []
+        self.frames += 1
+        self.points += len(points)
+        if self.roi_window:
+            return self._segment_roi(frame_path, points)
+        masks = self._masks(str(frame_path), [list(p) for p in points])
+        if masks is None:
+            return [None] * len(points)
+        boxes, valid = masks_to_boxes(masks[: len(points)])
+        found: list[BoundingBox | None] = [_bbox(b) if ok else None for b, ok in zip(boxes, valid)]
+        return found + [None] * (len(points) - len(found))
+
+    def _segment_roi(self, frame_path: Path, points: list[tuple[int, int]]) -> list[BoundingBox | None]:
+        with Image.open(frame_path) as img:
+            frame = img.convert("RGB")
+        img_w, img_h = frame.size
+        found: list[BoundingBox | None] = []
+        for point in points:
+            size, box = self.roi_window, None
+            while True:
+                window = roi_window(point, size, img_w, img_h)
+                crop = frame.crop(window)
+                local = [point[0] - window[0], point[1] - window[1]]
+                self.crops += 1
+                masks = self._masks(crop, [local])
+                if masks is None:
+                    box = None
+                    break
+                boxes, valid = masks_to_boxes(masks[:1])
+                box = _bbox(boxes[0], window[0], window[1]) if valid[0] else None
+                full_frame = window == (0, 0, img_w, img_h)
+                if box is None or full_frame or size >= self.roi_max_window:
+                    break
+                if not touches_open_edge(boxes[0], window, img_w, img_h):
+                    break
+                # The object runs past the crop: widen the window and segment again.
+                size = min(size * ROI_GROWTH, self.roi_max_window)
+                self.grown += 1
+            found.append(box)
+        return found
+
+    def _masks(self, source: str | Image.Image, points: list[list[int]]) -> np.ndarray | None:
+        """(N, H, W) masks in `source` pixels, one per point, or None when SAM returns nothing."""
+        # An (N, 2) point array with (N,) labels is N separate one-point objects.
+        return _result_masks(self.model(source, points=points, labels=[1] * len(points), verbose=False))
+
+    def summary(self) -> str:
+        text = f"{self.points} clicks segmented on {self.frames} frames"
+        if self.roi_window:
+            text += f"; {self.crops} ROI crops, {self.grown} windows grown"
+        return text
+
+
+def sam_segmenter_from_config(config: dict[str, Any]) -> SamSegmenter:
+    """`sam_model` weights; `sam_roi: true` segments crops (`sam_roi_window`, `sam_roi_max_window`).
+
+    `sam_backend` is "torch" (default) or "onnx"; `sam_onnx_threads` caps onnxruntime's threads.
+    With "onnx", an unset `sam_model` means mobile_sam.pt.
+    """
+    backend = str(config.get("sam_backend", "torch")).strip().lower()
+    if backend not in SAM_BACKENDS:
+        raise PipelineError(f"Unsupported sam_backend: {backend} (expected one of {', '.join(SAM_BACKENDS)})")
+    roi = bool(config.get("sam_roi", False))
+    default_model = DEFAULT_ONNX_SAM_MODEL if backend == "onnx" else DEFAULT_SAM_MODEL
+    model_name = str(config.get("sam_model", default_model))
+    roi_window = int(config.get("sam_roi_window", DEFAULT_ROI_WINDOW)) if roi else 0
+    roi_max_window = int(config.get("sam_roi_max_window", DEFAULT_ROI_MAX_WINDOW))
+    if backend == "onnx":
+        from shared.sam_onnx import OnnxSamSegmenter
+
+        return OnnxSamSegmenter(
+            model_name,
+            roi_window=roi_window,
+            roi_max_window=roi_max_window,
+            threads=int(config.get("sam_onnx_threads", 0)),
+        )
+    return SamSegmenter(model_name, roi_window=roi_window, roi_max_window=roi_max_window)
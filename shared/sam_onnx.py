@@ -0,0 +1,201 @@
+"""ONNX Runtime backend for point-prompted SAM.
+
+The SAM image encoder and the prompt encoder + mask decoder are exported to two
+ONNX graphs the first time a weights file is used, and cached next to the
+weights (`mobile_sam.encoder.onnx`, `mobile_sam.decoder.onnx`). Later runs load
+the graphs straight into onnxruntime, so neither torch nor ultralytics is
+imported, and the thread count is set explicitly (`sam_onnx_threads`).
+
+Pre- and post-processing mirror ultralytics' SAM predictor: the frame is
+letterboxed top-left into the encoder's square input (gray 114 padding),
+points are scaled by the same factor, and the decoder's low-res mask logits
+are cropped to the unpadded region, resized to frame pixels and thresholded at 0.
+
+Export needs ultralytics and torch, and supports SAM and MobileSAM weights
+(sam_b.pt, sam_l.pt, mobile_sam.pt). SAM 2 has a different decoder and is not
+exported.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from shared.sam import DEFAULT_ONNX_SAM_MODEL, DEFAULT_ROI_MAX_WINDOW, SamSegmenter
+from shared.utils import PipelineError
+
+ONNX_EXTRA_HINT = "sam_backend 'onnx' needs the onnx extra: uv sync --extra onnx"
+
+PIXEL_MEAN = np.array([123.675, 116.28, 103.53], dtype=np.float32)
+PIXEL_STD = np.array([58.395, 57.12, 57.375], dtype=np.float32)
+PAD_VALUE = 114.0
+MASK_THRESHOLD = 0.0
+ONNX_OPSET = 17
+
+
+def onnx_paths(model_name: str) -> tuple[Path, Path]:
+    """Cached encoder and decoder graphs beside the weights file."""
+    stem = Path(model_name).with_suffix("")
+    return stem.with_name(f"{stem.name}.encoder.onnx"), stem.with_name(f"{stem.name}.decoder.onnx")
+
+
+def export_sam_onnx(model_name: str, encoder_path: Path, decoder_path: Path) -> None:
+    """Export `model_name`'s image encoder and point decoder to ONNX (needs torch + ultralytics)."""
+    try:
+        import onnx  # noqa: F401  (torch.onnx.export writes the graphs through it)
+    except ImportError as exc:
+        raise PipelineError(ONNX_EXTRA_HINT) from exc
+    import torch
+    from ultralytics import SAM
+
+    net = SAM(model_name).model.eval()
+    if not hasattr(net, "prompt_encoder") or not hasattr(net, "mask_decoder"):
+        raise PipelineError(
+            f"sam_backend 'onnx' supports SAM/MobileSAM weights (sam_b.pt, mobile_sam.pt), not {model_name}"
+        )
+    prompt_encoder = net.prompt_encoder
+    size = int(prompt_encoder.input_image_size[0])
+    embed_h, embed_w = prompt_encoder.image_embedding_size
+
+    class PointDecoder(torch.nn.Module):
+        """Prompt encoder + mask decoder for padded single-point prompts, one mask per prompt.
+
+        Point embeddings are built with arithmetic masks instead of boolean
+        index assignment so the graph exports with a dynamic prompt count.
+        """
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.prompt_encoder = prompt_encoder
+            self.mask_decoder = net.mask_decoder
+
+        def forward(self, embeddings: Any, point_coords: Any, point_labels: Any) -> Any:
+            pe = self.prompt_encoder
+            coords = (point_coords + 0.5) / size
+            sparse = pe.pe_layer._pe_encoding(coords)
+            labels = point_labels.unsqueeze(-1).expand_as(sparse)
+            sparse = sparse * (labels != -1) + pe.not_a_point_embed.weight * (labels == -1)
+            for i in range(pe.num_point_embeddings):
+                sparse = sparse + pe.point_embeddings[i].weight * (labels == i)
+            dense = pe.no_mask_embed.weight.reshape(1, -1, 1, 1).expand(1, -1, embed_h, embed_w)
+            masks, scores = self.mask_decoder(
+                image_embeddings=embeddings,
+                image_pe=pe.get_dense_pe(),
+                sparse_prompt_embeddings=sparse,
+                dense_prompt_embeddings=dense,
+                multimask_output=False,
+            )
+            return masks, scores
+
+    encoder_path.parent.mkdir(parents=True, exist_ok=True)
+    # Export to temporary names first so an interrupted export never looks cached.
+    encoder_tmp = encoder_path.with_name(encoder_path.name + ".tmp")
+    decoder_tmp = decoder_path.with_name(decoder_path.name + ".tmp")
+    image = torch.zeros(1, 3, size, size)
+    with torch.no_grad():
+        embeddings = net.image_encoder(image)
+        torch.onnx.export(
+            net.image_encoder,
+            (image,),
+            str(encoder_tmp),
+            input_names=["image"],
+            output_names=["embeddings"],
+            opset_version=ONNX_OPSET,
+        )
+        torch.onnx.export(
+            PointDecoder(),
+            (embeddings, torch.zeros(1, 2, 2), torch.tensor([[1.0, -1.0]])),
+            str(decoder_tmp),
+            input_names=["embeddings", "point_coords", "point_labels"],
+            output_names=["masks", "scores"],
+            dynamic_axes={
+                "point_coords": {0: "prompts"},
+                "point_labels": {0: "prompts"},
+                "masks": {0: "prompts"},
+                "scores": {0: "prompts"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+    os.replace(encoder_tmp, encoder_path)
+    os.replace(decoder_tmp, decoder_path)
+
+
+class OnnxSamSegmenter(SamSegmenter):
+    """SamSegmenter whose encoder/decoder run in onnxruntime; `model` is the (encoder, decoder) session pair."""
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_ONNX_SAM_MODEL,
+        roi_window: int = 0,
+        roi_max_window: int = DEFAULT_ROI_MAX_WINDOW,
+        threads: int = 0,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise PipelineError(ONNX_EXTRA_HINT) from exc
+
+        encoder_path, decoder_path = onnx_paths(model_name)
+        # True when this run had to export (a slow, one-off step worth reporting).
+        self.exported = not (encoder_path.exists() and decoder_path.exists())
+        if self.exported:
+            export_sam_onnx(model_name, encoder_path, decoder_path)
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+        encoder = ort.InferenceSession(str(encoder_path), options, providers=providers)
+        decoder = ort.InferenceSession(str(decoder_path), options, providers=providers)
+        self.threads = threads
+        self.input_size = int(encoder.get_inputs()[0].shape[-1])
+        super().__init__(model_name, model=(encoder, decoder), roi_window=roi_window, roi_max_window=roi_max_window)
+
+    def _masks(self, source: str | Image.Image, points: list[list[int]]) -> np.ndarray | None:
+        if isinstance(source, Image.Image):
+            image = source.convert("RGB")
+        else:
+            with Image.open(source) as img:
+                image = img.convert("RGB")
+        encoder, decoder = self.model
+        img_w, img_h = image.size
+        scale = min(self.input_size / img_w, self.input_size / img_h)
+        new_w, new_h = int(round(img_w * scale)), int(round(img_h * scale))
+
+        canvas = np.full((self.input_size, self.input_size, 3), PAD_VALUE, dtype=np.float32)
+        canvas[:new_h, :new_w] = np.asarray(image.resize((new_w, new_h), Image.BILINEAR), dtype=np.float32)
+        tensor = np.ascontiguousarray(((canvas - PIXEL_MEAN) / PIXEL_STD).transpose(2, 0, 1)[None])
+        (embeddings,) = encoder.run(["embeddings"], {"image": tensor})
+
+        # Each prompt is one positive point plus the padding point SAM expects without a box.
+        n = len(points)
+        coords = np.zeros((n, 2, 2), dtype=np.float32)
+        coords[:, 0] = np.asarray(points, dtype=np.float32) * scale
+        labels = np.tile(np.array([1.0, -1.0], dtype=np.float32), (n, 1))
+        (logits,) = decoder.run(
+            ["masks"], {"embeddings": embeddings, "point_coords": coords, "point_labels": labels}
+        )
+        logits = logits[:, 0]
+        if len(logits) == 0:
+            return None
+
+        # Crop the low-res logits to the unpadded region, then resize to frame pixels.
+        low_h, low_w = logits.shape[1:]
+        gain = min(low_h / img_h, low_w / img_w)
+        pad_h, pad_w = low_h - img_h * gain, low_w - img_w * gain
+        bottom, right = int(low_h - pad_h), int(low_w - pad_w)
+        masks = np.empty((n, img_h, img_w), dtype=bool)
+        for i, logit in enumerate(logits):
+            resized = Image.fromarray(np.ascontiguousarray(logit[:bottom, :right]))
+            masks[i] = np.asarray(resized.resize((img_w, img_h), Image.BILINEAR)) > MASK_THRESHOLD
+        return masks
+
+    def summary(self) -> str:
+        threads = f"{self.threads} threads" if self.threads else "default threads"
+        return f"{super().summary()} (onnxruntime, {threads})"
@@ -0,0 +1,160 @@
+"""Carry bounding boxes from a labeled keyframe to the following frames.
+
+Each box is tracked frame to frame by normalized cross-correlation template
+matching (numpy, on a downscaled grayscale copy), searching a window around its
+previous position. The propagator gives up, and the caller re-queries the model,
+when any box's match score falls below `min_confidence`, when the frame differs
+too much from the keyframe, or after `max_gap` propagated frames.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image
+
+from shared.utils import BoundingBox, clamp
+
+TRACK_LONG_SIDE = 480
+SEARCH_RADIUS = 24
+MAX_TEMPLATE_SIDE = 48
+MIN_TEMPLATE_SIDE = 4
+DEFAULT_MIN_CONFIDENCE = 0.6
+DEFAULT_MAX_DIFF = 12.0
+DEFAULT_MAX_GAP = 10
+
+
+@dataclass
+class TrackFrame:
+    gray: np.ndarray
+    scale: float  # original pixels per tracking pixel
+    width: int
+    height: int
+
+
+def load_track_frame(frame_path: Path, long_side: int = TRACK_LONG_SIDE) -> TrackFrame:
+    with Image.open(frame_path) as img:
+        width, height = img.size
+        scale = max(1.0, max(width, height) / float(long_side))
+        size = (max(1, round(width / scale)), max(1, round(height / scale)))
+        img.draft("L", size)
+        gray = np.asarray(img.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+    return TrackFrame(gray=gray, scale=width / float(size[0]), width=width, height=height)
+
+
+def match_template(
+    prev: np.ndarray, curr: np.ndarray, x: int, y: int, w: int, h: int, radius: int = SEARCH_RADIUS
+) -> tuple[float, float, float]:
+    """Best (dx, dy, ncc score) for the prev[y:y+h, x:x+w] patch within `radius` px in curr."""
+    stride = max(1, math.ceil(max(w, h) / MAX_TEMPLATE_SIDE))
+    template = prev[y:y + h:stride, x:x + w:stride]
+    centered = template - template.mean()
+    template_norm = float(np.sqrt((centered * centered).sum()))
+    if template_norm < 1e-3:
+        # A flat patch matches everywhere equally; it cannot be tracked.
+        return 0.0, 0.0, 0.0
+
+    rows, cols = curr.shape
+    y0, x0 = max(0, y - radius), max(0, x - radius)
+    y1, x1 = min(rows, y + h + radius), min(cols, x + w + radius)
+    region = curr[y0:y1, x0:x1]
+    if region.shape[0] < h or region.shape[1] < w:
+        return 0.0, 0.0, 0.0
+    windows = sliding_window_view(region, (h, w))[:, :, ::stride, ::stride]
+    windows = windows - windows.mean(axis=(2, 3), keepdims=True)
+    numerator = np.einsum("yxij,ij->yx", windows, centered)
+    window_norm = np.sqrt(np.einsum("yxij,yxij->yx", windows, windows))
+    scores = numerator / np.maximum(window_norm * template_norm, 1e-6)
+    iy, ix = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    # Parabolic sub-pixel refinement keeps rounding from drifting boxes over many frames.
+    sub_x = sub_y = 0.0
+    if 0 < ix < scores.shape[1] - 1:
+        sub_x = _parabolic_offset(scores[iy, ix - 1], scores[iy, ix], scores[iy, ix + 1])
+    if 0 < iy < scores.shape[0] - 1:
+        sub_y = _parabolic_offset(scores[iy - 1, ix], scores[iy, ix], scores[iy + 1, ix])
+    return float(x0 + ix + sub_x - x), float(y0 + iy + sub_y - y), float(scores[iy, ix])
+
+
+def _parabolic_offset(left: float, center: float, right: float) -> float:
+    denominator = left - 2.0 * center + right
+    if abs(denominator) < 1e-9:
+        return 0.0
+    return float(clamp(0.5 * (left - right) / denominator, -0.5, 0.5))
+
+
+def track_box(prev: TrackFrame, curr: TrackFrame, box: BoundingBox) -> tuple[BoundingBox, float]:
+    """Shift `box` (original pixel coords) by its best template match; returns (box, score)."""
+    x = int(round(clamp(box.x / prev.scale, 0, prev.gray.shape[1] - 1)))
+    y = int(round(clamp(box.y / prev.scale, 0, prev.gray.shape[0] - 1)))
+    w = int(round(min(box.width / prev.scale, prev.gray.shape[1] - x)))
+    h = int(round(min(box.height / prev.scale, prev.gray.shape[0] - y)))
+    if w < MIN_TEMPLATE_SIDE or h < MIN_TEMPLATE_SIDE:
+        return box, 0.0
+    dx, dy, score = match_template(prev.gray, curr.gray, x, y, w, h)
+    moved = BoundingBox(
+        class_name=box.class_name,
+        x=clamp(box.x + dx * curr.scale, 0.0, curr.width - box.width),
+        y=clamp(box.y + dy * curr.scale, 0.0, curr.height - box.height),
+        width=box.width,
+        height=box.height,
+    )
+    return moved, score
+
+
+class BoxPropagator:
+    """Tracks the last keyframe's boxes forward; `propagate` returns None when a re-query is due."""
+
+    def __init__(
+        self,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+        max_diff: float = DEFAULT_MAX_DIFF,
+        max_gap: int = DEFAULT_MAX_GAP,
+    ) -> None:
+        self.min_confidence = min_confidence
+        self.max_diff = max_diff
+        self.max_gap = max_gap
+        self._keyframe: TrackFrame | None = None
+        self._previous: TrackFrame | None = None
+        self._boxes: list[BoundingBox] = []
+        self._gap = 0
+        self.keyframes = 0
+        self.propagated = 0
+        self._pending: TrackFrame | None = None
+
+    def reset(self) -> None:
+        self._keyframe = self._previous = self._pending = None
+        self._boxes = []
+        self._gap = 0
+
+    def propagate(self, frame_path: Path) -> list[BoundingBox] | None:
+        curr = load_track_frame(frame_path)
+        self._pending = curr
+        if self._keyframe is None or self._previous is None or self._gap >= self.max_gap:
+            return None
+        if curr.gray.shape != self._keyframe.gray.shape:
+            return None
+        if float(np.abs(curr.gray - self._keyframe.gray).mean()) > self.max_diff:
+            return None
+
+        moved: list[BoundingBox] = []
+        for box in self._boxes:
+            tracked, score = track_box(self._previous, curr, box)
+            if score < self.min_confidence:
+                return None
+            moved.append(tracked)
+        self._previous = curr
+        self._boxes = moved
+        self._gap += 1
+        self.propagated += 1
+        return list(moved)
+
+    def set_keyframe(self, boxes: list[BoundingBox]) -> None:
+        """Record model boxes for the frame last passed to `propagate`."""
+        self._keyframe = self._previous = self._pending
+        self._boxes = list(boxes)
+        self._gap = 0
+        self.keyframes += 1
@@ -0,0 +1,185 @@
+"""Upload profiles: how frames are re-encoded before they are sent to a vision API.
+
+A profile caps the long edge, sets the JPEG quality and can drop color. The
+default `original` profile sends the frame's bytes untouched. Models answer in
+the pixel space of the image they were sent, so callers map boxes and points back
+with `EncodedImage.to_original` / `point_to_original` before writing labels.
+
+`UploadEncoder` encodes each frame once and hands the same payload to every
+request for that frame (one per class in per-class mode).
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, TypeVar
+
+from PIL import Image
+
+from shared.utils import PNG_SIGNATURE, PipelineError, read_image_dimensions
+
+B = TypeVar("B")
+
+DEFAULT_PROFILE = "original"
+DEFAULT_QUALITY = 90
+DEFAULT_CACHE_FRAMES = 64
+
+
+@dataclass(frozen=True)
+class UploadProfile:
+    max_long_edge: int = 0  # 0 keeps the original size
+    quality: int = 0  # 0 keeps the original bytes when nothing else changes
+    grayscale: bool = False
+
+    @property
+    def passthrough(self) -> bool:
+        return self.max_long_edge <= 0 and self.quality <= 0 and not self.grayscale
+
+
+PROFILES: dict[str, UploadProfile] = {
+    "original": UploadProfile(),
+    "hd": UploadProfile(max_long_edge=1280, quality=85),
+    "compact": UploadProfile(max_long_edge=768, quality=80),
+    "gray": UploadProfile(max_long_edge=768, quality=80, grayscale=True),
+}
+
+
+@dataclass(frozen=True)
+class EncodedImage:
+    data: bytes
+    b64: str
+    width: int
+    height: int
+    original_width: int
+    original_height: int
+
+    @property
+    def scale_x(self) -> float:
+        return self.original_width / float(self.width)
+
+    @property
+    def scale_y(self) -> float:
+        return self.original_height / float(self.height)
+
+    @property
+    def mime_type(self) -> str:
+        # Re-encoded payloads are always JPEG; passthrough keeps the frame's own format.
+        return "image/png" if self.data.startswith(PNG_SIGNATURE) else "image/jpeg"
+
+    @property
+    def resized(self) -> bool:
+        return (self.width, self.height) != (self.original_width, self.original_height)
+
+    def to_original(self, box: B) -> B:
+        """A copy of a pixel x/y/width/height box dataclass in original-frame coordinates."""
+        return scale_box(box, self.scale_x, self.scale_y) if self.resized else box
+
+    def point_to_original(self, x: float, y: float) -> tuple[int, int]:
+        return int(round(x * self.scale_x)), int(round(y * self.scale_y))
+
+
+def scale_box(box: B, sx: float, sy: float) -> B:
+    return replace(box, x=box.x * sx, y=box.y * sy, width=box.width * sx, height=box.height * sy)
+
+
+def encode_frame(frame_path: Path, profile: UploadProfile) -> EncodedImage:
+    data = frame_path.read_bytes()
+    width, height = read_image_dimensions(frame_path)
+    if profile.passthrough:
+        return EncodedImage(data, base64.b64encode(data).decode("utf-8"), width, height, width, height)
+
+    size = (width, height)
+    if profile.max_long_edge > 0 and max(width, height) > profile.max_long_edge:
+        scale = profile.max_long_edge / float(max(width, height))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    mode = "L" if profile.grayscale else "RGB"
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG draft mode decodes straight at a reduced scale when shrinking a lot.
+        img.draft(mode, size)
+        image = img.convert(mode)
+    if image.size != size:
+        image = image.resize(size, Image.BICUBIC, reducing_gap=2.0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=profile.quality or DEFAULT_QUALITY)
+    encoded = buffer.getvalue()
+    return EncodedImage(encoded, base64.b64encode(encoded).decode("utf-8"), size[0], size[1], width, height)
+
+
+class UploadEncoder:
+    """Encodes frames under one profile, keeping the last `max_frames` payloads.
+
+    Thread-safe. Every `encode` call counts as one upload for the byte totals.
+    """
+
+    def __init__(self, profile: UploadProfile, name: str = "", max_frames: int = DEFAULT_CACHE_FRAMES) -> None:
+        self.profile = profile
+        self.name = name or "custom"
+        self.max_frames = max(1, max_frames)
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, int], EncodedImage] = OrderedDict()
+        self.encodes = 0
+        self.uploads = 0
+        self.bytes_sent = 0
+        self.original_bytes = 0
+
+    def encode(self, frame_path: Path) -> EncodedImage:
+        stat = frame_path.stat()
+        key = (str(frame_path.resolve()), stat.st_mtime_ns)
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+        if image is None:
+            image = encode_frame(frame_path, self.profile)
+            with self._lock:
+                self.encodes += 1
+                self._cache[key] = image
+                while len(self._cache) > self.max_frames:
+                    self._cache.popitem(last=False)
+        with self._lock:
+            self.uploads += 1
+            self.bytes_sent += len(image.data)
+            self.original_bytes += stat.st_size
+        return image
+
+    def summary(self) -> str:
+        share = self.bytes_sent / self.original_bytes * 100.0 if self.original_bytes else 100.0
+        return (
+            f"'{self.name}' profile, {self.encodes} frames encoded for {self.uploads} uploads, "
+            f"{self.bytes_sent / 1e6:.1f} MB sent ({share:.0f}% of original)"
+        )
+
+
+def encode_for_upload(frame_path: Path, encoder: UploadEncoder | None) -> EncodedImage:
+    if encoder is None:
+        return encode_frame(frame_path, PROFILES[DEFAULT_PROFILE])
+    return encoder.encode(frame_path)
+
+
+def resolve_profile(name: str) -> UploadProfile:
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise PipelineError(f"Unknown upload_profile: {name} (expected one of {', '.join(PROFILES)})")
+    return profile
+
+
+def upload_encoder_from_config(config: dict[str, Any]) -> UploadEncoder:
+    """`upload_profile` picks a preset; `upload_max_edge`, `upload_quality`, `upload_grayscale` override it."""
+    name = str(config.get("upload_profile", DEFAULT_PROFILE)).strip().lower()
+    profile = resolve_profile(name)
+    overrides: dict[str, Any] = {}
+    if "upload_max_edge" in config:
+        overrides["max_long_edge"] = int(config["upload_max_edge"])
+    if "upload_quality" in config:
+        overrides["quality"] = int(config["upload_quality"])
+    if "upload_grayscale" in config:
+        overrides["grayscale"] = bool(config["upload_grayscale"])
+    if overrides:
+        profile = replace(profile, **overrides)
+        name = f"{name}+overrides"
+    return UploadEncoder(profile, name)
@@ -6,8 +6,10 @@ import base64
 import json
 import os
 import re
+import struct
 import subprocess
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -68,8 +70,55 @@ def extract_json_from_text(text: str) -> dict[str, Any]:
             raise PipelineError("Model returned malformed JSON.") from exc
 
 
-def read_image_dimensions(frame_path: Path) -> tuple[int, int]:
-    """Read width/height via ffprobe to avoid extra Python imaging deps."""
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not.
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field.
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+
+def _parse_png_dimensions(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return int(width), int(height)
+
+
+def _parse_jpeg_dimensions(handle: Any) -> tuple[int, int] | None:
+    """Walk JPEG marker segments until the first SOFn, reading only segment headers."""
+    if handle.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        byte = handle.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = handle.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = handle.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code == 0xD9:  # EOI before any frame header
+            return None
+        length_bytes = handle.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if code in JPEG_SOF_MARKERS:
+            header = handle.read(5)
+            if len(header) != 5:
+                return None
+            height, width = struct.unpack(">HH", header[1:5])
+            return (int(width), int(height)) if width and height else None
+        handle.seek(length - 2, os.SEEK_CUR)
+
+
+def _probe_dimensions(frame_path: Path) -> tuple[int, int]:
+    """Read width/height via ffprobe; used for formats the header parser does not handle."""
     cmd = [
         "ffprobe",
         "-v",
@@ -89,3 +138,50 @@ def read_image_dimensions(frame_path: Path) -> tuple[int, int]:
         return int(stream["width"]), int(stream["height"])
     except Exception as exc:  # noqa: BLE001
         raise PipelineError(f"Failed to read dimensions for {frame_path}") from exc
+
+
+def parse_image_header(frame_path: Path) -> tuple[int, int] | None:
+    """Read width/height from the PNG IHDR or JPEG SOF header, or None if not parseable."""
+    try:
+        with frame_path.open("rb") as handle:
+            head = handle.read(24)
+            if head.startswith(PNG_SIGNATURE):
+                return _parse_png_dimensions(head)
+            if head.startswith(b"\xff\xd8"):
+                handle.seek(0)
+                return _parse_jpeg_dimensions(handle)
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+# Dimensions recorded by the frame manifest: absolute path -> (byte size, width, height).
+_known_dimensions: dict[str, tuple[int, int, int]] = {}
+
+
+def remember_image_dimensions(frame_path: Path, byte_size: int, width: int, height: int) -> None:
+    """Record known dimensions; read_image_dimensions uses them while the file keeps `byte_size`."""
+    _known_dimensions[os.path.abspath(frame_path)] = (byte_size, width, height)
+
+
+@lru_cache(maxsize=200_000)
+def _cached_dimensions(path: str, mtime_ns: int, size: int) -> tuple[int, int]:
+    frame_path = Path(path)
+    return parse_image_header(frame_path) or _probe_dimensions(frame_path)
+
+
+def read_image_dimensions(frame_path: Path) -> tuple[int, int]:
+    """Read width/height from the image header in-process, memoized on (path, mtime, size).
+
+    Dimensions recorded by the frame manifest are used without opening the file.
+    Falls back to ffprobe for formats other than JPEG/PNG.
+    """
+    try:
+        stat = frame_path.stat()
+    except OSError as exc:
+        raise PipelineError(f"Failed to read dimensions for {frame_path}") from exc
+    path = os.path.abspath(frame_path)
+    known = _known_dimensions.get(path)
+    if known is not None and known[0] == stat.st_size:
+        return known[1], known[2]
+    return _cached_dimensions(path, stat.st_mtime_ns, stat.st_size)